@@ -23,8 +23,8 @@ st.markdown(
     ### Como usar:
     
     1.  **Navegue para a página `Scraper e Junção`** na barra lateral para começar.
-    2.  **(Primeira vez)** Faça o upload do seu arquivo `plano_de_estudos.csv`.
-    3.  Insira suas credenciais para fazer o scraping de todos os cursos e módulos.
+    2.  Entre com suas credenciais da plataforma.
+    3.  **(Primeira vez)** Faça o upload do seu arquivo `plano_de_estudos.csv` e o scraping de todos os cursos e módulos.
     4.  Após o scraping, clique para gerar os links e status no seu plano.
     5.  **Vá para a página `Dashboard`** para ver seu progresso!
     6.  **Use a página `Cursos da Jornada`** para pesquisar todo o conteúdo da plataforma.
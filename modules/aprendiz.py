@@ -0,0 +1,46 @@
+# modules/aprendiz.py
+
+import streamlit as st
+from . import database_manager as dbm
+from .authenticator import autenticar_jornadadedados
+
+# O aprendiz da sessão é a conta autenticada na página do Scraper: o plano, o progresso e os jobs ficam com
+# `normalize_user(email)` dessa conta, nunca com um nome digitado. As credenciais ficam só na memória da sessão,
+# para os jobs que precisam entrar na plataforma (ver `job_runner.iniciar_job`).
+
+def entrar(email, senha):
+    """
+    Autentica na plataforma e, se der certo, faz da conta o aprendiz da sessão (assumindo o plano local de antes
+    dos vários aprendizes, se ainda ninguém o assumiu). Retorna o `usuario`, ou None se a autenticação falhar.
+    """
+    if not autenticar_jornadadedados(email, senha):
+        return None
+    usuario = dbm.normalize_user(email)
+    dbm.claim_default_user(usuario)
+    st.session_state.usuario = usuario
+    st.session_state.credenciais = {'email': email, 'senha': senha}
+    return usuario
+
+def sair():
+    st.session_state.pop('usuario', None)
+    st.session_state.pop('credenciais', None)
+
+def aprendiz_atual():
+    """
+    O aprendiz da sessão (o e-mail autenticado, normalizado), ou None antes de entrar. A barra lateral de todas
+    as páginas só o exibe: para trocar de aprendiz é preciso sair e entrar com outra conta.
+    """
+    usuario = st.session_state.get('usuario')
+    st.sidebar.text_input(
+        "Aprendiz", value=usuario or "", placeholder="Entre na página do Scraper", disabled=True,
+        help="O catálogo de cursos é compartilhado; o plano de estudos e o progresso são da conta autenticada."
+    )
+    return usuario
+
+def exigir_aprendiz():
+    """Como `aprendiz_atual`, mas interrompe a página com um aviso enquanto ninguém tiver entrado."""
+    usuario = aprendiz_atual()
+    if usuario is None:
+        st.info("Entre com a sua conta da plataforma na página do Scraper para ver o seu plano e o seu progresso.")
+        st.stop()
+    return usuario
@@ -1,10 +1,11 @@
 import requests
 from bs4 import BeautifulSoup
+from .http_transport import criar_sessao
 
-def autenticar_jornadadedados(email, senha):
+def autenticar_jornadadedados(email, senha, **opcoes_transporte):
+    """Faz login na plataforma; `opcoes_transporte` vão para `http_transport.criar_sessao` (pool, tentativas, taxa máxima...)."""
     LOGIN_URL = "https://jornadadedados.alpaclass.com/s/login"
-    session = requests.Session()
-    session.headers.update({'User-Agent': 'Mozilla/5.0'})
+    session = criar_sessao(**opcoes_transporte)
     try:
         response_get = session.get(LOGIN_URL)
         response_get.raise_for_status()
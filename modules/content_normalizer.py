@@ -0,0 +1,94 @@
+# modules/content_normalizer.py
+
+import hashlib
+import os
+import time
+from .db_connection import conexao, transacao
+from .html_extract import html_para_texto, pool_de_processos
+
+# Um núcleo fica para o Streamlit e o scraper; com um núcleo só, a conversão roda no próprio processo
+PROCESSOS_PADRAO = max(0, (os.cpu_count() or 1) - 1)
+MINIMO_PARA_PROCESSOS = 64             # com menos documentos novos, subir o pool custa mais que converter aqui
+DOCUMENTOS_POR_TAREFA = 16             # chunksize do pool: menos idas e voltas entre processos
+VALIDADE_DO_CACHE = 30 * 24 * 60 * 60  # 30 dias sem uso, em segundos
+
+def hash_do_conteudo(html):
+    return hashlib.sha1(html.encode('utf-8')).hexdigest()
+
+class NormalizadorDeConteudo:
+    """
+    Converte o HTML das aulas no texto indexado pela busca.
+
+    O texto de cada documento fica guardado pelo hash do HTML (tabela 'textos_convertidos' do banco),
+    então um conteúdo que não mudou desde a raspagem anterior nunca é analisado de novo. Os documentos
+    novos são convertidos em um pool de `processos` processos, criado no primeiro lote grande e
+    mantido até `encerrar` (use como gerenciador de contexto para reaproveitá-lo entre lotes).
+    `estatisticas` acumula, entre as chamadas, quantos documentos passaram, quantos vieram do cache
+    e o tempo gasto.
+    """
+    def __init__(self, caminho_banco, processos=None):
+        self.caminho_banco = caminho_banco
+        self.processos = PROCESSOS_PADRAO if processos is None else processos
+        self.estatisticas = {'documentos': 0, 'do_cache': 0, 'convertidos': 0, 'segundos': 0.0}
+        self._pool = None
+
+    def encerrar(self):
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.encerrar()
+
+    def converter(self, htmls):
+        """Recebe uma sequência de HTMLs (None vira '') e devolve a lista de textos, na mesma ordem."""
+        inicio = time.perf_counter()
+        chaves = [hash_do_conteudo(html) if isinstance(html, str) and html else None for html in htmls]
+        unicos = {chave: html for chave, html in zip(chaves, htmls) if chave is not None}
+
+        conn = conexao(self.caminho_banco)
+        conn.execute('''
+        CREATE TABLE IF NOT EXISTS textos_convertidos (hash TEXT PRIMARY KEY, texto TEXT, usado_em REAL)
+        ''')
+        textos = self._buscar_no_cache(conn, list(unicos))
+        faltando = [chave for chave in unicos if chave not in textos]
+        novos = dict(zip(faltando, self._converter_documentos([unicos[chave] for chave in faltando])))
+        textos.update(novos)
+
+        agora = time.time()
+        with transacao(self.caminho_banco) as cursor:
+            cursor.executemany("UPDATE textos_convertidos SET usado_em = ? WHERE hash = ?", [(agora, chave) for chave in unicos if chave not in novos])
+            cursor.executemany("INSERT OR REPLACE INTO textos_convertidos VALUES (?, ?, ?)", [(chave, texto, agora) for chave, texto in novos.items()])
+            cursor.execute("DELETE FROM textos_convertidos WHERE usado_em < ?", (agora - VALIDADE_DO_CACHE,))
+
+        self.estatisticas['documentos'] += len(chaves)
+        self.estatisticas['do_cache'] += len(unicos) - len(novos)
+        self.estatisticas['convertidos'] += len(novos)
+        self.estatisticas['segundos'] += time.perf_counter() - inicio
+        return [textos[chave] if chave is not None else '' for chave in chaves]
+
+    def resumo(self):
+        e = self.estatisticas
+        por_segundo = e['documentos'] / e['segundos'] if e['segundos'] else 0.0
+        return (f"{e['documentos']} documentos em {e['segundos']:.2f} s ({por_segundo:.0f} docs/s): "
+                f"{e['do_cache']} do cache, {e['convertidos']} convertidos")
+
+    def _buscar_no_cache(self, conn, chaves):
+        textos = {}
+        for inicio in range(0, len(chaves), 500):
+            lote = chaves[inicio:inicio + 500]
+            marcadores = ', '.join('?' * len(lote))
+            textos.update(conn.execute(f"SELECT hash, texto FROM textos_convertidos WHERE hash IN ({marcadores})", lote))
+        return textos
+
+    def _converter_documentos(self, htmls):
+        # Com o pool já aberto, qualquer lote com mais de uma tarefa compensa; para abri-lo, só lotes grandes
+        minimo = DOCUMENTOS_POR_TAREFA if self._pool is not None else MINIMO_PARA_PROCESSOS
+        if not self.processos or len(htmls) < minimo:
+            return [html_para_texto(html) for html in htmls]
+        if self._pool is None:
+            self._pool = pool_de_processos(self.processos)
+        return list(self._pool.map(html_para_texto, htmls, chunksize=DOCUMENTOS_POR_TAREFA))
@@ -1,8 +1,13 @@
 # modules/data_joiner.py
 
+import hashlib
+import json
+import numpy as np
 import pandas as pd
-from thefuzz import process, fuzz
+from rapidfuzz import fuzz as rf_fuzz, process as rf_process
+from thefuzz import process, fuzz, utils
 from . import database_manager as dbm
+from .scraper import raspar_status_das_aulas
 
 # ... (funções clean_text e encontrar_melhor_match permanecem as mesmas) ...
 def clean_text(text):
@@ -11,6 +16,7 @@ def clean_text(text):
     text = text.replace('|', ' ').replace('"', '').replace("'", "").replace('aula', '').replace('trilha', '').replace('projeto', '').replace('workshop', '')
     return ' '.join(text.split())
 def encontrar_melhor_match(row, df_scraper, scraper_trilhas):
+    """Versão linha a linha da correspondência; o `run_joiner` usa o `IndiceDeCorrespondencia`, que chega ao mesmo resultado."""
     plano_trilha = clean_text(row['Trilha'])
     plano_modulo = clean_text(row['Módulo'])
     melhor_trilha_limpa, score_trilha = process.extractOne(plano_trilha, scraper_trilhas.keys(), scorer=fuzz.token_set_ratio)
@@ -43,12 +49,212 @@ def encontrar_melhor_match(row, df_scraper, scraper_trilhas):
     else:
         return None, None
 
-def run_joiner(log_area):
+# --- Correspondência em lote ---
+# `process.extractOne(consulta, opcoes, scorer=fuzz.token_set_ratio)` do thefuzz processa a consulta duas vezes
+# (full_process sem e com force_ascii) e as opções uma vez (com force_ascii), escolhe a primeira opção de maior
+# nota ainda sem arredondar e só então arredonda a nota. As funções abaixo reproduzem isso com uma matriz de notas
+# (rapidfuzz `cdist`) por vez, em vez de uma chamada por linha do plano.
+
+def _processar_opcao(texto):
+    return utils.full_process(texto, force_ascii=True)
+
+def _processar_consulta(texto):
+    return _processar_opcao(utils.full_process(texto))
+
+def _melhores_opcoes(consultas, opcoes):
+    """Para cada consulta (já processada), o índice da melhor opção (já processada) e a nota arredondada."""
+    notas = rf_process.cdist(consultas, opcoes, scorer=rf_fuzz.token_set_ratio, dtype=np.float64, workers=-1)
+    melhores = notas.argmax(axis=1)  # argmax fica com a primeira ocorrência do máximo, como o extractOne
+    return melhores, [int(round(nota)) for nota in notas[np.arange(len(consultas)), melhores]]
+
+# Notas sem arredondar a partir das quais a nota arredondada passa dos limites da junção:
+# round(nota) >= 80 para a trilha e round(nota) > 65 para módulo e curso
+NOTA_MINIMA_TRILHA = 79.5
+NOTA_MINIMA_OPCAO = 65.5
+
+class IndiceDeBloqueio:
+    """
+    Índice invertido dos nomes (já processados) de uma lista de opções, que separa para cada consulta as poucas
+    opções capazes de atingir uma nota mínima no token_set_ratio, antes de calcular qualquer nota.
+
+    O corte não perde nenhuma opção que chegaria à nota mínima:
+    - quem tem uma palavra em comum com a consulta vem do índice de palavras e é sempre avaliado (pode dar 100);
+    - sem palavra em comum, o token_set_ratio é a similaridade Indel entre as palavras distintas ordenadas de cada
+      lado, 100 * (1 - distância / (l1 + l2)), e a distância Indel é pelo menos a diferença entre os histogramas
+      de caracteres. A nota fica então limitada por 200 * Σ min(h1, h2) / (l1 + l2) (e por 200 * min(l1, l2) / (l1 + l2),
+      o que restringe os comprimentos possíveis a uma faixa contínua das opções ordenadas por tamanho).
+    """
+    def __init__(self, opcoes):
+        self.por_palavra = {}
+        textos = []
+        for indice, opcao in enumerate(opcoes):
+            palavras = set(opcao.split())
+            for palavra in palavras:
+                self.por_palavra.setdefault(palavra, []).append(indice)
+            textos.append(' '.join(sorted(palavras)))
+        self.alfabeto = {caractere: i for i, caractere in enumerate(sorted(set(''.join(textos))))}
+        comprimentos = np.array([len(texto) for texto in textos], dtype=np.int64)
+        self.ordem = np.argsort(comprimentos, kind='stable')
+        self.comprimentos = comprimentos[self.ordem]
+        self.histogramas = np.zeros((len(textos), len(self.alfabeto)), dtype=np.int32)
+        for linha, indice in enumerate(self.ordem):
+            for caractere in textos[indice]:
+                self.histogramas[linha, self.alfabeto[caractere]] += 1
+
+    def candidatas(self, consulta, nota_minima):
+        """Índices (em ordem crescente) das opções que podem ter nota >= `nota_minima` para a consulta."""
+        palavras = set(consulta.split())
+        if not palavras:
+            return []  # o token_set_ratio de uma consulta vazia é 0
+        com_palavra_em_comum = {indice for palavra in palavras for indice in self.por_palavra.get(palavra, ())}
+
+        texto = ' '.join(sorted(palavras))
+        fracao = nota_minima / 200 - 1e-9  # folga para erros de arredondamento: na dúvida, a opção fica
+        # 2 * min(l1, l2) / (l1 + l2) >= 2 * fracao  <=>  l2 entre l1 * f / (1 - f) e l1 * (1 - f) / f
+        inicio = np.searchsorted(self.comprimentos, len(texto) * fracao / (1 - fracao), side='left')
+        fim = np.searchsorted(self.comprimentos, len(texto) * (1 - fracao) / fracao, side='right')
+        histograma = np.zeros(len(self.alfabeto), dtype=np.int32)
+        for caractere in texto:
+            if caractere in self.alfabeto:
+                histograma[self.alfabeto[caractere]] += 1
+        comuns = np.minimum(self.histogramas[inicio:fim], histograma).sum(axis=1)
+        possiveis = self.ordem[inicio:fim][comuns >= fracao * (len(texto) + self.comprimentos[inicio:fim])]
+        return sorted(com_palavra_em_comum.union(possiveis.tolist()))
+
+def _melhores_opcoes_bloqueadas(consultas, opcoes, bloqueio, nota_minima):
+    """
+    Como `_melhores_opcoes`, mas só avalia as candidatas do `bloqueio`. Retorna, para cada consulta, o índice da
+    melhor opção e a nota arredondada, ou (None, 0) quando nenhuma opção chega à `nota_minima`.
+    Quando alguma chega, todas as que ficaram de fora têm nota menor que ela, então a escolha (inclusive o
+    desempate pela primeira opção) é a mesma da avaliação completa.
+    """
+    melhores, notas = [], []
+    for consulta in consultas:
+        candidatas = bloqueio.candidatas(consulta, nota_minima)
+        notas_candidatas = [rf_fuzz.token_set_ratio(consulta, opcoes[indice]) for indice in candidatas]
+        if notas_candidatas and max(notas_candidatas) >= nota_minima:
+            posicao = max(range(len(candidatas)), key=notas_candidatas.__getitem__)  # primeira de maior nota
+            melhores.append(candidatas[posicao])
+            notas.append(int(round(notas_candidatas[posicao])))
+        else:
+            melhores.append(None)
+            notas.append(0)
+    return melhores, notas
+
+def _versao(*partes):
+    return hashlib.sha1(json.dumps(partes, ensure_ascii=False, default=str).encode('utf-8')).hexdigest()
+
+class IndiceDeCorrespondencia:
+    """
+    O catálogo preparado uma única vez para a junção: os nomes limpos e processados das trilhas e, por trilha,
+    os de módulos e cursos, cada um já ligado à (aula_link, aula_concluida) da sua primeira aula.
+    `casar` dá, para todas as linhas do plano de uma vez, o mesmo resultado do `encontrar_melhor_match`,
+    avaliando só as opções que o `IndiceDeBloqueio` de cada lista deixa passar.
+
+    `versao_trilhas` e `versoes_das_trilhas` identificam o que cada correspondência depende do catálogo (a lista
+    de trilhas e, na trilha escolhida, os nomes de módulos e cursos e os links das suas primeiras aulas), para o
+    cache 'plano_matches' saber quando um resultado guardado ainda vale.
+    """
+    def __init__(self, df_scraper):
+        # Mesmas chaves dos dicionários do `encontrar_melhor_match`: a posição vem do primeiro nome com aquela
+        # versão limpa e o valor do último, então a ordem e o conteúdo são montados do mesmo jeito
+        trilhas = {clean_text(trilha): trilha for trilha in df_scraper['trilha_nome'].unique()}
+        self.trilhas = list(trilhas)
+        self.trilhas_processadas = [_processar_opcao(chave) for chave in self.trilhas]
+        self.bloqueio_trilhas = IndiceDeBloqueio(self.trilhas_processadas)
+        self.opcoes = {}
+        for chave, trilha in trilhas.items():
+            df_trilha = df_scraper[df_scraper['trilha_nome'] == trilha]
+            self.opcoes[chave] = {coluna: self._opcoes_da_coluna(df_trilha, coluna) for coluna in ('modulo_nome', 'curso_nome')}
+        self.status_por_link = {link: status for opcoes_trilha in self.opcoes.values()
+                                for _, aulas, _ in opcoes_trilha.values() for link, status in aulas}
+        self.versao_trilhas = _versao(self.trilhas_processadas)
+        self.versoes_das_trilhas = {
+            chave: _versao([(opcoes, [link for link, _ in aulas]) for opcoes, aulas, _ in opcoes_trilha.values()])
+            for chave, opcoes_trilha in self.opcoes.items()
+        }
+
+    @staticmethod
+    def _opcoes_da_coluna(df_trilha, coluna):
+        nomes = {clean_text(nome): nome for nome in df_trilha[coluna].dropna().unique()}
+        primeiras = df_trilha.drop_duplicates(coluna).set_index(coluna)
+        aulas = [(primeiras.at[nome, 'aula_link'], primeiras.at[nome, 'aula_concluida']) for nome in nomes.values()]
+        opcoes = [_processar_opcao(chave) for chave in nomes]
+        return opcoes, aulas, IndiceDeBloqueio(opcoes)
+
+    def casar(self, trilhas_plano, modulos_plano):
+        """Recebe a 'Trilha' e o 'Módulo' de cada linha do plano; retorna uma lista de (aula_link, aula_concluida) ou (None, None)."""
+        consultas_trilha = [_processar_consulta(clean_text(t)) for t in trilhas_plano]
+        consultas_modulo = [_processar_consulta(clean_text(modulo)) for modulo in modulos_plano]
+        return [
+            (resultado['aula_link'], self.status_por_link[resultado['aula_link']]) if resultado['aula_link'] is not None else (None, None)
+            for resultado in self.casar_consultas(consultas_trilha, consultas_modulo)
+        ]
+
+    def casar_consultas(self, consultas_trilha, consultas_modulo):
+        """
+        Como `casar`, mas com os textos já normalizados (`chave_da_linha`) e com o detalhe de cada escolha:
+        {'trilha', 'nota_trilha', 'nota_modulo', 'nota_curso', 'aula_link'}. As notas são 0 quando nenhuma opção
+        chega à nota mínima, e 'trilha' é a chave da trilha casada (None abaixo de 80).
+        """
+        resultados = [
+            {'trilha': None, 'nota_trilha': 0, 'nota_modulo': 0, 'nota_curso': 0, 'aula_link': None}
+            for _ in consultas_trilha
+        ]
+        if not self.trilhas or not resultados:
+            return resultados
+        melhores, notas = _melhores_opcoes_bloqueadas(
+            consultas_trilha, self.trilhas_processadas, self.bloqueio_trilhas, NOTA_MINIMA_TRILHA
+        )
+
+        linhas_por_trilha = {}
+        for linha, (melhor, nota) in enumerate(zip(melhores, notas)):
+            resultados[linha]['nota_trilha'] = nota
+            if melhor is not None and nota >= 80:
+                resultados[linha]['trilha'] = self.trilhas[melhor]
+                linhas_por_trilha.setdefault(self.trilhas[melhor], []).append(linha)
+
+        for trilha, linhas in linhas_por_trilha.items():
+            consultas = [consultas_modulo[linha] for linha in linhas]
+            escolhas = {}
+            for coluna in ('modulo_nome', 'curso_nome'):
+                opcoes, aulas, bloqueio = self.opcoes[trilha][coluna]
+                indices, notas_coluna = _melhores_opcoes_bloqueadas(consultas, opcoes, bloqueio, NOTA_MINIMA_OPCAO)
+                escolhas[coluna] = [
+                    (aulas[i][0], nota) if i is not None and nota > 65 else (None, 0) for i, nota in zip(indices, notas_coluna)
+                ]
+            for posicao, linha in enumerate(linhas):
+                (link_mod, nota_mod), (link_cur, nota_cur) = escolhas['modulo_nome'][posicao], escolhas['curso_nome'][posicao]
+                resultados[linha]['nota_modulo'], resultados[linha]['nota_curso'] = nota_mod, nota_cur
+                if nota_mod >= nota_cur and link_mod is not None:
+                    resultados[linha]['aula_link'] = link_mod
+                elif link_cur is not None:
+                    resultados[linha]['aula_link'] = link_cur
+        return resultados
+
+# Colunas do catálogo usadas na correspondência; o conteúdo das aulas fica no banco
+COLUNAS_DO_CATALOGO = ['trilha_nome', 'curso_nome', 'modulo_nome', 'aula_link', 'aula_concluida']
+# Colunas do plano com links devolvido pelo `run_joiner` (e oferecido para download)
+COLUNAS_DO_PLANO_COM_LINKS = ["id", "Trilha", "Módulo", "Carga Horária (h)", "Objetivo", "aula_link", "aula_concluida"]
+
+def chave_da_linha(trilha, modulo):
+    """Textos normalizados de uma linha do plano, exatamente como entram na correspondência (e chave do cache)."""
+    return _processar_consulta(clean_text(trilha)), _processar_consulta(clean_text(modulo))
+
+def _resultado_vale(guardado, indice):
+    """Um resultado do cache vale se a trilha que ele escolheu (ou a falta dela) ainda leva ao mesmo catálogo."""
+    return guardado['trilha'] is None or guardado['versao_trilha'] == indice.versoes_das_trilhas.get(guardado['trilha'])
+
+def _ou_none(valor):
+    """O pandas guarda valores ausentes como NaN ou None, conforme o tipo da coluna; aqui viram sempre None."""
+    return None if valor is None or (isinstance(valor, float) and np.isnan(valor)) else valor
+
+def run_joiner(log_area, usuario=dbm.USUARIO_PADRAO):
     log_area.text("--- Iniciando o processo de junção de dados ---")
     
-    # Carrega o plano de estudos que contém os IDs e as marcações manuais
-    df_plano_antigo = dbm.load_table_to_df('plano_estudos')
-    df_scraper = dbm.load_table_to_df('cursos')
+    # Carrega o plano de estudos do aprendiz, que contém os IDs e as marcações manuais
+    df_plano_antigo = dbm.load_plan(usuario)
+    df_scraper = dbm.load_table_to_df('cursos', colunas=COLUNAS_DO_CATALOGO)
     
     if df_plano_antigo.empty or df_scraper.empty:
         log_area.error(f"❌ ERRO: Tabelas ('plano_estudos', 'cursos') estão vazias.")
@@ -57,46 +263,124 @@ def run_joiner(log_area):
     log_area.text("✅ Tabelas do banco de dados carregadas com sucesso.")
     
     df_scraper.dropna(subset=['trilha_nome', 'modulo_nome', 'curso_nome', 'aula_link', 'aula_concluida'], inplace=True)
-    scraper_trilhas = {
-        clean_text(trilha): df_scraper[df_scraper['trilha_nome'] == trilha]
-        for trilha in df_scraper['trilha_nome'].unique()
-    }
+    indice = IndiceDeCorrespondencia(df_scraper)
 
-    log_area.text("➡️  Iniciando a correspondência difusa...")
-    
-    df_plano_novo = df_plano_antigo.copy()
+    # Só os pares (Trilha, Módulo) sem resultado válido no cache passam pela correspondência difusa
+    chaves = [chave_da_linha(trilha, modulo) for trilha, modulo in zip(df_plano_antigo['Trilha'], df_plano_antigo['Módulo'])]
+    resultados = {
+        chave: guardado for chave, guardado in dbm.load_plan_matches(indice.versao_trilhas).items()
+        if _resultado_vale(guardado, indice)
+    }
+    pendentes = list(dict.fromkeys(chave for chave in chaves if chave not in resultados))
+    log_area.text(f"➡️  Iniciando a correspondência difusa ({len(pendentes)} de {len(set(chaves))} pares de trilha e módulo a avaliar)...")
 
-    resultados_scraper = df_plano_novo.apply(
-        lambda row: encontrar_melhor_match(row, df_scraper, scraper_trilhas), axis=1
-    )
-    
-    df_plano_novo[['link_scraper', 'status_scraper']] = pd.DataFrame(resultados_scraper.tolist(), index=df_plano_novo.index)
+    if pendentes:
+        novos = indice.casar_consultas([trilha for trilha, _ in pendentes], [modulo for _, modulo in pendentes])
+        for (trilha_texto, modulo_texto), novo in zip(pendentes, novos):
+            novo.update(
+                trilha_texto=trilha_texto, modulo_texto=modulo_texto, versao_trilhas=indice.versao_trilhas,
+                versao_trilha=indice.versoes_das_trilhas.get(novo['trilha'])
+            )
+            resultados[(trilha_texto, modulo_texto)] = novo
+        dbm.save_plan_matches(novos, indice.versao_trilhas)
     
     log_area.text("➡️  Preservando marcações manuais...")
 
-    df_plano_novo['aula_link'] = df_plano_novo['link_scraper']
-    
-    df_plano_novo['aula_concluida'] = df_plano_novo.apply(
-        lambda row: True if df_plano_antigo.loc[row.name, 'aula_concluida'] else row['status_scraper'],
-        axis=1
-    )
-    df_plano_novo['aula_concluida'] = df_plano_novo['aula_concluida'].fillna(False).astype(bool)
+    # Itens já marcados no plano continuam concluídos; os demais recebem o progresso do aprendiz na aula casada
+    links = [resultados[chave]['aula_link'] for chave in chaves]
+    progresso = dbm.load_progress_by_link(usuario)
+    status_scraper = pd.Series([progresso.get(link) for link in links], index=df_plano_antigo.index, dtype=object)
+    marcados = df_plano_antigo['aula_concluida'].astype(bool)
+    concluidas = status_scraper.where(~marcados, True).fillna(False).astype(bool)
+
+    # Só os itens que mudaram são gravados, com UPDATEs no próprio 'plano_estudos'
+    atualizacoes = [
+        (item_id, link, concluida)
+        for item_id, link, concluida, link_antigo, concluida_antiga in zip(
+            df_plano_antigo['id'], links, concluidas, df_plano_antigo['aula_link'], df_plano_antigo['aula_concluida']
+        )
+        if _ou_none(link_antigo) != link or _ou_none(concluida_antiga) is None or bool(concluida_antiga) != concluida
+    ]
 
-    df_plano_novo.drop(columns=['link_scraper', 'status_scraper'], inplace=True)
+    df_plano_novo = df_plano_antigo.copy()
+    df_plano_novo['aula_link'] = links
+    df_plano_novo['aula_concluida'] = concluidas
+    if dbm.update_plan_links(atualizacoes, usuario) is None:
+        log_area.error("❌ ERRO: Falha ao gravar a junção no banco de dados.")
+        return None
     
     # --- MUDANÇA AQUI ---
     # Garante que o DataFrame final tenha as colunas na ordem correta, incluindo o 'id'
-    colunas_ordenadas = ["id", "Trilha", "Módulo", "Carga Horária (h)", "Objetivo", "aula_link", "aula_concluida"]
-    df_plano_final = df_plano_novo[colunas_ordenadas]
+    df_plano_final = df_plano_novo[COLUNAS_DO_PLANO_COM_LINKS]
 
     log_area.text("✅ Correspondência finalizada, preservando IDs e marcações manuais.")
     
-    # Salva o DataFrame final, que agora inclui a coluna 'id'
-    dbm.save_df_to_db(df_plano_final, 'plano_estudos')
-    
     links_encontrados = df_plano_final['aula_link'].notna().sum()
     total_linhas = len(df_plano_final)
-    log_area.success(f"Resultados salvos na tabela 'plano_estudos'.")
+    log_area.success(f"Resultados salvos na tabela 'plano_estudos' ({len(atualizacoes)} itens atualizados).")
     log_area.info(f"Foram encontrados links para {links_encontrados} de {total_linhas} módulos.")
 
-    return df_plano_final
\ No newline at end of file
+    return df_plano_final
+
+def run_progress_sync(session, log_area, usuario=dbm.USUARIO_PADRAO, ao_progredir=None):
+    """
+    Sincroniza apenas o progresso do `usuario` (dono da `session`): busca o status das aulas na plataforma
+    (sem baixar conteúdo), grava o progresso dele em lote e leva as mudanças para o plano dele.
+    """
+    log_area.text("--- Iniciando a sincronização do progresso ---")
+    status_aulas = raspar_status_das_aulas(session, log_area, ao_progredir=ao_progredir)
+    if status_aulas is None:
+        log_area.error("❌ ERRO: Não foi possível ler o status das aulas.")
+        return None
+
+    alteradas = dbm.update_lesson_progress_many(status_aulas, usuario)
+    marcados = dbm.update_plan_status_from_progress(usuario)
+    if alteradas is None or marcados is None:
+        log_area.error("❌ ERRO: Falha ao gravar o progresso no banco de dados.")
+        return None
+
+    log_area.success(f"Progresso sincronizado: {alteradas} aulas mudaram de status, {marcados} itens do plano marcados como concluídos.")
+    return {'aulas_lidas': len(status_aulas), 'aulas_alteradas': alteradas, 'itens_do_plano_marcados': marcados}
+
+# --- Conferência do bloqueio ---
+
+def _conferir_lista(consultas, opcoes, bloqueio, nota_minima, contagem):
+    if not opcoes or not consultas:
+        return
+    notas = rf_process.cdist(consultas, opcoes, scorer=rf_fuzz.token_set_ratio, dtype=np.float64, workers=-1)
+    for consulta, notas_consulta in zip(consultas, notas):
+        candidatas = set(bloqueio.candidatas(consulta, nota_minima))
+        necessarias = set(np.flatnonzero(notas_consulta >= nota_minima).tolist())
+        contagem['consultas'] += 1
+        contagem['opcoes'] += len(opcoes)
+        contagem['avaliadas'] += len(candidatas)
+        contagem['perdidas'] += len(necessarias - candidatas)
+
+def conferir_bloqueio(df_scraper, df_plano):
+    """
+    Confere, contra a avaliação completa (todas as notas via `cdist`), que o bloqueio nunca descarta uma opção
+    capaz de passar da nota mínima, para as trilhas e para os módulos e cursos de cada trilha casada.
+    Retorna {'consultas', 'opcoes', 'avaliadas', 'perdidas'}; 'perdidas' precisa ser 0.
+    """
+    df_scraper = df_scraper.dropna(subset=['trilha_nome', 'modulo_nome', 'curso_nome', 'aula_link', 'aula_concluida'])
+    indice = IndiceDeCorrespondencia(df_scraper)
+    contagem = {'consultas': 0, 'opcoes': 0, 'avaliadas': 0, 'perdidas': 0}
+    consultas_trilha = [_processar_consulta(clean_text(t)) for t in df_plano['Trilha']]
+    consultas_modulo = [_processar_consulta(clean_text(m)) for m in df_plano['Módulo']]
+    _conferir_lista(consultas_trilha, indice.trilhas_processadas, indice.bloqueio_trilhas, NOTA_MINIMA_TRILHA, contagem)
+    if indice.trilhas:
+        melhores, notas = _melhores_opcoes(consultas_trilha, indice.trilhas_processadas)
+        for trilha in indice.trilhas:
+            consultas = [c for c, melhor, nota in zip(consultas_modulo, melhores, notas) if indice.trilhas[melhor] == trilha and nota >= 80]
+            for opcoes, _, bloqueio in indice.opcoes[trilha].values():
+                _conferir_lista(consultas, opcoes, bloqueio, NOTA_MINIMA_OPCAO, contagem)
+    return contagem
+
+if __name__ == '__main__':
+    # Uso: python -m modules.data_joiner  (confere o bloqueio com o plano e o catálogo do banco)
+    contagem = conferir_bloqueio(dbm.load_table_to_df('cursos', colunas=COLUNAS_DO_CATALOGO), dbm.load_table_to_df('plano_estudos'))
+    if contagem['consultas']:
+        print(f"{contagem['consultas']} consultas: {contagem['avaliadas'] / contagem['consultas']:.1f} opções avaliadas "
+              f"em média, de {contagem['opcoes'] / contagem['consultas']:.1f}; {contagem['perdidas']} opções perdidas")
+    else:
+        print("Nada a conferir: o plano ou o catálogo está vazio.")
@@ -4,43 +4,225 @@ import sqlite3
 import pandas as pd
 import os
 import re
-from bs4 import BeautifulSoup
+import json
+import time
+import functools
+import threading
+import unicodedata
+from contextlib import contextmanager
+from .content_normalizer import NormalizadorDeConteudo
+from .db_connection import conexao, transacao
 
 DB_PATH = 'dados/jornada_data.db'
 
+def _conexao():
+    """Conexão ajustada e reaproveitada da thread atual (ver `db_connection`)."""
+    return conexao(DB_PATH)
+
+@contextmanager
+def _transacao():
+    """`transacao` no banco do app; depois do COMMIT da mais externa, as gerações que ela alterou são relidas (ver `data_generation`)."""
+    try:
+        with transacao(DB_PATH) as cursor:
+            yield cursor
+    finally:
+        if not _conexao().in_transaction:
+            _publicar_geracoes()
+
+# O catálogo ('cursos', com o conteúdo e o FTS) é um só por instalação; o plano de estudos e o progresso
+# nas aulas são de cada aprendiz, identificado pelo `usuario` (o e-mail, ver `normalize_user`).
+# Bancos de antes da separação, com um único aprendiz, ficam com o USUARIO_PADRAO.
+USUARIO_PADRAO = ''
+
+def normalize_user(usuario):
+    """Identificador do aprendiz: o e-mail sem espaços e em minúsculas; vazio é o USUARIO_PADRAO."""
+    return (usuario or USUARIO_PADRAO).strip().lower()
+
+COLUNAS_CURSOS = [
+    'trilha_nome', 'curso_nome', 'curso_link', 'modulo_id', 'modulo_nome', 'aula_id', 'aula_nome', 'aula_slug',
+    'aula_link', 'aula_concluida', 'aula_sumario', 'aula_conteudo_html', 'aula_fingerprint', 'aula_conteudo',
+    'aula_baixada_em',
+]
+
+# 'aula_conteudo_html' guarda o HTML da aula (exibido no explorador) e 'aula_conteudo' o texto indexado pelo FTS. O 'cursos_fts' é uma tabela de conteúdo
+# externo: o nome e o valor das suas colunas precisam existir em 'cursos' para o 'rebuild' funcionar.
+_SQL_TABELA_CURSOS = '''
+CREATE TABLE IF NOT EXISTS {nome} (
+    trilha_nome TEXT, curso_nome TEXT, curso_link TEXT, modulo_id INTEGER,
+    modulo_nome TEXT, aula_id INTEGER PRIMARY KEY, aula_nome TEXT, aula_slug TEXT,
+    aula_link TEXT, aula_concluida BOOLEAN, aula_sumario TEXT, aula_conteudo_html TEXT,
+    aula_fingerprint TEXT, aula_conteudo TEXT, aula_baixada_em REAL
+)'''
+
+_SQL_GATILHOS_CURSOS = [
+'''CREATE TRIGGER IF NOT EXISTS cursos_ai AFTER INSERT ON cursos BEGIN
+  INSERT INTO cursos_fts(rowid, trilha_nome, curso_nome, modulo_nome, aula_nome, aula_sumario, aula_conteudo)
+  VALUES (new.aula_id, new.trilha_nome, new.curso_nome, new.modulo_nome, new.aula_nome, new.aula_sumario, new.aula_conteudo);
+END''',
+'''CREATE TRIGGER IF NOT EXISTS cursos_ad AFTER DELETE ON cursos BEGIN
+  INSERT INTO cursos_fts(cursos_fts, rowid, trilha_nome, curso_nome, modulo_nome, aula_nome, aula_sumario, aula_conteudo)
+  VALUES ('delete', old.aula_id, old.trilha_nome, old.curso_nome, old.modulo_nome, old.aula_nome, old.aula_sumario, old.aula_conteudo);
+END''',
+'''CREATE TRIGGER IF NOT EXISTS cursos_au
+AFTER UPDATE OF trilha_nome, curso_nome, modulo_nome, aula_nome, aula_sumario, aula_conteudo ON cursos BEGIN
+  INSERT INTO cursos_fts(cursos_fts, rowid, trilha_nome, curso_nome, modulo_nome, aula_nome, aula_sumario, aula_conteudo)
+  VALUES ('delete', old.aula_id, old.trilha_nome, old.curso_nome, old.modulo_nome, old.aula_nome, old.aula_sumario, old.aula_conteudo);
+  INSERT INTO cursos_fts(rowid, trilha_nome, curso_nome, modulo_nome, aula_nome, aula_sumario, aula_conteudo)
+  VALUES (new.aula_id, new.trilha_nome, new.curso_nome, new.modulo_nome, new.aula_nome, new.aula_sumario, new.aula_conteudo);
+END''',
+]
+
+# Índice da busca: prefixos de 2 a 4 caracteres indexados (toda busca é por prefixo, `termo*`) e acentos
+# ignorados ("regressao" encontra "regressão"). Bancos com o índice antigo são migrados pelo `_criar_tabelas`.
+_SQL_TABELA_FTS = '''
+CREATE VIRTUAL TABLE IF NOT EXISTS cursos_fts USING fts5(
+    trilha_nome, curso_nome, modulo_nome, aula_nome, aula_sumario, aula_conteudo,
+    content='cursos', content_rowid='aula_id', prefix='2 3 4', tokenize='unicode61 remove_diacritics 2'
+)'''
+
+# Índice opcional de trigramas dos nomes, para achar um trecho no meio de uma palavra ("gressão" em "Regressão").
+# Ocupa bem mais espaço que o 'cursos_fts', por isso só existe com USAR_INDICE_TRIGRAMAS ligado.
+USAR_INDICE_TRIGRAMAS = False
+
+_SQL_TABELA_TRIGRAMAS = '''
+CREATE VIRTUAL TABLE IF NOT EXISTS cursos_trigramas USING fts5(
+    curso_nome, modulo_nome, aula_nome, content='cursos', content_rowid='aula_id', tokenize='trigram'
+)'''
+
+_SQL_GATILHOS_TRIGRAMAS = [
+'''CREATE TRIGGER IF NOT EXISTS cursos_trigramas_ai AFTER INSERT ON cursos BEGIN
+  INSERT INTO cursos_trigramas(rowid, curso_nome, modulo_nome, aula_nome) VALUES (new.aula_id, new.curso_nome, new.modulo_nome, new.aula_nome);
+END''',
+'''CREATE TRIGGER IF NOT EXISTS cursos_trigramas_ad AFTER DELETE ON cursos BEGIN
+  INSERT INTO cursos_trigramas(cursos_trigramas, rowid, curso_nome, modulo_nome, aula_nome)
+  VALUES ('delete', old.aula_id, old.curso_nome, old.modulo_nome, old.aula_nome);
+END''',
+'''CREATE TRIGGER IF NOT EXISTS cursos_trigramas_au AFTER UPDATE OF curso_nome, modulo_nome, aula_nome ON cursos BEGIN
+  INSERT INTO cursos_trigramas(cursos_trigramas, rowid, curso_nome, modulo_nome, aula_nome)
+  VALUES ('delete', old.aula_id, old.curso_nome, old.modulo_nome, old.aula_nome);
+  INSERT INTO cursos_trigramas(rowid, curso_nome, modulo_nome, aula_nome) VALUES (new.aula_id, new.curso_nome, new.modulo_nome, new.aula_nome);
+END''',
+]
+
+def _tem_indice_trigramas(cursor):
+    return cursor.execute("SELECT 1 FROM sqlite_master WHERE name = 'cursos_trigramas'").fetchone() is not None
+
+def _criar_gatilhos_cursos(cursor):
+    for gatilho in _SQL_GATILHOS_CURSOS + (_SQL_GATILHOS_TRIGRAMAS if _tem_indice_trigramas(cursor) else []):
+        cursor.execute(gatilho)
+
+def _reconstruir_indices_fts(cursor):
+    cursor.execute("INSERT INTO cursos_fts(cursos_fts) VALUES('rebuild')")
+    if _tem_indice_trigramas(cursor):
+        cursor.execute("INSERT INTO cursos_trigramas(cursos_trigramas) VALUES('rebuild')")
+
+# O resumo guarda, por aprendiz e trilha, as linhas do plano, as que têm módulo, as concluídas e as horas ainda pendentes.
+# Cada linha entra (+1) ou sai (-1) do resumo; um UPDATE é a saída da linha antiga e a entrada da nova.
+def _contribuicao_plano(linha, sinal):
+    concluida = f'(COALESCE({linha}."aula_concluida", 0) <> 0)'
+    horas = f'''(CASE WHEN typeof({linha}."Carga Horária (h)") IN ('integer', 'real') THEN {linha}."Carga Horária (h)" ELSE 0 END)'''
+    return f'''
+  INSERT INTO plano_resumo (usuario, trilha, linhas, com_modulo, concluidas, horas_pendentes)
+  VALUES ({linha}."usuario", COALESCE({linha}."Trilha", ''), {sinal}1, {sinal}({linha}."Módulo" IS NOT NULL), {sinal}{concluida},
+          {sinal}(CASE WHEN {concluida} THEN 0 ELSE {horas} END))
+  ON CONFLICT (usuario, trilha) DO UPDATE SET
+    linhas = linhas + excluded.linhas, com_modulo = com_modulo + excluded.com_modulo,
+    concluidas = concluidas + excluded.concluidas, horas_pendentes = horas_pendentes + excluded.horas_pendentes;'''
+
+_SQL_GATILHOS_PLANO_RESUMO = [
+    f'''CREATE TRIGGER IF NOT EXISTS plano_resumo_ai AFTER INSERT ON plano_estudos BEGIN{_contribuicao_plano('new', '+')}
+END''',
+    f'''CREATE TRIGGER IF NOT EXISTS plano_resumo_ad AFTER DELETE ON plano_estudos BEGIN{_contribuicao_plano('old', '-')}
+END''',
+    f'''CREATE TRIGGER IF NOT EXISTS plano_resumo_au
+AFTER UPDATE OF "usuario", "Trilha", "Módulo", "Carga Horária (h)", "aula_concluida" ON plano_estudos BEGIN{_contribuicao_plano('old', '-')}{_contribuicao_plano('new', '+')}
+END''',
+]
+
+def _adicionar_coluna_se_faltar(cursor, tabela, coluna, tipo):
+    """Migração de bancos antigos: cria a coluna se a tabela ainda não a tiver. Retorna True se criou."""
+    if coluna in {info[1] for info in cursor.execute(f"PRAGMA table_info({tabela})")}:
+        return False
+    cursor.execute(f"ALTER TABLE {tabela} ADD COLUMN {coluna} {tipo}")
+    return True
+
 def init_db():
-    os.makedirs('dados', exist_ok=True)
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
+    os.makedirs(os.path.dirname(DB_PATH) or '.', exist_ok=True)
+    with _transacao() as cursor:
+        _criar_tabelas(cursor)
 
+def _criar_tabelas(cursor):
     # ... (código da tabela 'cursos' e FTS não muda) ...
+    cursor.execute(_SQL_TABELA_CURSOS.format(nome='cursos'))
+    # Bancos criados antes da raspagem incremental não têm a coluna de impressão digital
+    _adicionar_coluna_se_faltar(cursor, 'cursos', 'aula_fingerprint', 'TEXT')
+    # Bancos sem a data do download do conteúdo: conta a partir da migração (ver `load_lesson_fingerprints`)
+    if _adicionar_coluna_se_faltar(cursor, 'cursos', 'aula_baixada_em', 'REAL'):
+        cursor.execute("UPDATE cursos SET aula_baixada_em = ? WHERE modulo_id IS NOT NULL", (time.time(),))
+    # Bancos antigos indexavam 'aula_conteudo_html' no FTS sem ter a coluna 'aula_conteudo' em 'cursos'
+    reindexar_fts = _adicionar_coluna_se_faltar(cursor, 'cursos', 'aula_conteudo', 'TEXT')
+    if reindexar_fts:
+        cursor.execute("UPDATE cursos SET aula_conteudo = aula_conteudo_html")
+    # Índice criado antes dos prefixos e da remoção de acentos: é recriado e reconstruído a partir de 'cursos'
+    fts_atual = cursor.execute("SELECT sql FROM sqlite_master WHERE name = 'cursos_fts'").fetchone()
+    if fts_atual and 'remove_diacritics' not in fts_atual[0]:
+        cursor.execute("DROP TABLE cursos_fts")
+        reindexar_fts = True
+    cursor.execute(_SQL_TABELA_FTS)
+    if USAR_INDICE_TRIGRAMAS and not _tem_indice_trigramas(cursor):
+        cursor.execute(_SQL_TABELA_TRIGRAMAS)
+        reindexar_fts = True
+    elif not USAR_INDICE_TRIGRAMAS and _tem_indice_trigramas(cursor):
+        for nome in ('ai', 'ad', 'au'):
+            cursor.execute(f"DROP TRIGGER IF EXISTS cursos_trigramas_{nome}")
+        cursor.execute("DROP TABLE cursos_trigramas")
+    # Gatilhos antigos: o de UPDATE disparava em qualquer UPDATE (inclusive de status) e todos liam 'aula_conteudo_html'
+    for nome, sql in cursor.execute("SELECT name, sql FROM sqlite_master WHERE type = 'trigger' AND tbl_name = 'cursos'").fetchall():
+        if 'aula_conteudo_html' in sql or (nome == 'cursos_au' and 'UPDATE OF' not in sql):
+            cursor.execute(f"DROP TRIGGER {nome}")
+    _criar_gatilhos_cursos(cursor)
+    if reindexar_fts:
+        _reconstruir_indices_fts(cursor)
+
+    # Raspagem completa com checkpoint: um job por curso e as linhas já raspadas numa tabela de
+    # carga, que só substitui 'cursos' quando todos os cursos terminarem (ver `publish_scraped_courses`).
     cursor.execute('''
-    CREATE TABLE IF NOT EXISTS cursos (
+    CREATE TABLE IF NOT EXISTS raspagem_cursos (
+        curso_link TEXT PRIMARY KEY, ordem INTEGER, trilha_nome TEXT, curso_nome TEXT,
+        status TEXT NOT NULL DEFAULT 'pendente', tentativas INTEGER NOT NULL DEFAULT 0, atualizado_em REAL
+    )''')
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS cursos_carga (
+        ordem_curso INTEGER, ordem_aula INTEGER,
         trilha_nome TEXT, curso_nome TEXT, curso_link TEXT, modulo_id INTEGER,
-        modulo_nome TEXT, aula_id INTEGER PRIMARY KEY, aula_nome TEXT, aula_slug TEXT,
-        aula_link TEXT, aula_concluida BOOLEAN, aula_sumario TEXT, aula_conteudo_html TEXT
+        modulo_nome TEXT, aula_id INTEGER, aula_nome TEXT, aula_slug TEXT,
+        aula_link TEXT, aula_concluida BOOLEAN, aula_sumario TEXT, aula_conteudo_html TEXT,
+        aula_fingerprint TEXT, aula_conteudo TEXT, aula_baixada_em REAL
     )''')
+    _adicionar_coluna_se_faltar(cursor, 'cursos_carga', 'aula_conteudo', 'TEXT')
+    _adicionar_coluna_se_faltar(cursor, 'cursos_carga', 'aula_baixada_em', 'REAL')
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_cursos_carga_link ON cursos_carga (curso_link)")
+
+    # Jobs em segundo plano (raspagem, sincronização e junção; ver `job_runner`) e os eventos do log de cada um.
+    # O índice parcial garante um único job ativo por trava ('raspagem', 'juncao:<usuario>'...).
     cursor.execute('''
-    CREATE VIRTUAL TABLE IF NOT EXISTS cursos_fts USING fts5(
-        trilha_nome, curso_nome, modulo_nome, aula_nome, aula_sumario, aula_conteudo,
-        content='cursos', content_rowid='aula_id', tokenize = 'unicode61'
+    CREATE TABLE IF NOT EXISTS jobs (
+        id INTEGER PRIMARY KEY AUTOINCREMENT, tipo TEXT NOT NULL, trava TEXT NOT NULL, usuario TEXT NOT NULL DEFAULT '',
+        parametros TEXT, status TEXT NOT NULL DEFAULT 'na_fila', pid INTEGER, cancelar INTEGER NOT NULL DEFAULT 0,
+        feitos INTEGER NOT NULL DEFAULT 0, total INTEGER, aulas INTEGER NOT NULL DEFAULT 0, resultado TEXT, erro TEXT,
+        criado_em REAL, iniciado_em REAL, batimento REAL, terminado_em REAL
     )''')
-    cursor.executescript('''
-    CREATE TRIGGER IF NOT EXISTS cursos_ai AFTER INSERT ON cursos BEGIN
-      INSERT INTO cursos_fts(rowid, trilha_nome, curso_nome, modulo_nome, aula_nome, aula_sumario, aula_conteudo)
-      VALUES (new.aula_id, new.trilha_nome, new.curso_nome, new.modulo_nome, new.aula_nome, new.aula_sumario, new.aula_conteudo_html);
-    END;
-    CREATE TRIGGER IF NOT EXISTS cursos_ad AFTER DELETE ON cursos BEGIN
-      INSERT INTO cursos_fts(cursos_fts, rowid, trilha_nome, curso_nome, modulo_nome, aula_nome, aula_sumario, aula_conteudo)
-      VALUES ('delete', old.aula_id, old.trilha_nome, old.curso_nome, old.modulo_nome, old.aula_nome, old.aula_sumario, old.aula_conteudo_html);
-    END;
-    CREATE TRIGGER IF NOT EXISTS cursos_au AFTER UPDATE ON cursos BEGIN
-      INSERT INTO cursos_fts(cursos_fts, rowid, trilha_nome, curso_nome, modulo_nome, aula_nome, aula_sumario, aula_conteudo)
-      VALUES ('delete', old.aula_id, old.trilha_nome, old.curso_nome, old.modulo_nome, old.aula_nome, old.aula_sumario, old.aula_conteudo_html);
-      INSERT INTO cursos_fts(rowid, trilha_nome, curso_nome, modulo_nome, aula_nome, aula_sumario, aula_conteudo)
-      VALUES (new.aula_id, new.trilha_nome, new.curso_nome, new.modulo_nome, new.aula_nome, new.aula_sumario, new.aula_conteudo_html);
-    END;
-    ''')
+    cursor.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_jobs_trava_ativa ON jobs (trava) WHERE status IN ('na_fila', 'em_andamento')")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_jobs_tipo ON jobs (tipo, usuario, id)")
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS jobs_eventos (
+        id INTEGER PRIMARY KEY AUTOINCREMENT, job_id INTEGER NOT NULL, momento REAL, nivel TEXT, texto TEXT
+    )''')
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_jobs_eventos_job ON jobs_eventos (job_id, id)")
+
+    # Metadados baratos de consultar (contagens, datas e geração dos dados), mantidos por `_atualizar_meta`
+    cursor.execute("CREATE TABLE IF NOT EXISTS meta (chave TEXT PRIMARY KEY, valor)")
+    cursor.execute("CREATE TABLE IF NOT EXISTS meta_trilhas (trilha_nome TEXT PRIMARY KEY, aulas INTEGER)")
 
     # --- MUDANÇA AQUI ---
     # Adicionamos a coluna "Dias Necessários". Usamos TEXT para ser mais flexível.
@@ -53,81 +235,1099 @@ def init_db():
         "Dias Necessários" TEXT,
         "Objetivo" TEXT,
         "aula_link" TEXT,
-        "aula_concluida" BOOLEAN
+        "aula_concluida" BOOLEAN,
+        "usuario" TEXT NOT NULL DEFAULT ''
     )''')
+    # Bancos de antes dos vários aprendizes: o plano existente fica com o USUARIO_PADRAO
+    _adicionar_coluna_se_faltar(cursor, 'plano_estudos', 'usuario', "TEXT NOT NULL DEFAULT ''")
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_plano_estudos_usuario ON plano_estudos ("usuario", "Trilha")')
 
-    conn.commit()
-    conn.close()
+    # Progresso de cada aprendiz nas aulas do catálogo ('cursos.aula_concluida' fica só com o que a última
+    # raspagem leu, para quem a fez). Bancos antigos: esse status vira o progresso do USUARIO_PADRAO.
+    progresso_existia = cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'progresso_aulas'").fetchone()
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS progresso_aulas (
+        usuario TEXT NOT NULL, aula_id INTEGER NOT NULL, concluida BOOLEAN NOT NULL,
+        PRIMARY KEY (usuario, aula_id)
+    ) WITHOUT ROWID''')
+    if not progresso_existia:
+        _copiar_progresso_do_catalogo(cursor, USUARIO_PADRAO)
+
+    # Cache da junção (ver `data_joiner.run_joiner`): o resultado de cada par (Trilha, Módulo) normalizado,
+    # válido enquanto a lista de trilhas e a trilha escolhida do catálogo não mudarem
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS plano_matches (
+        trilha_texto TEXT, modulo_texto TEXT, versao_trilhas TEXT, trilha TEXT, versao_trilha TEXT,
+        aula_link TEXT, nota_trilha INTEGER, nota_modulo INTEGER, nota_curso INTEGER,
+        PRIMARY KEY (trilha_texto, modulo_texto)
+    )''')
 
-def save_df_to_db(df, table_name):
+    # Resumo do progresso por trilha, mantido pelos gatilhos de 'plano_estudos' (ver `get_progress_summary`)
+    resumo_existia = cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'plano_resumo'").fetchone()
+    if resumo_existia and 'usuario' not in {info[1] for info in cursor.execute("PRAGMA table_info(plano_resumo)")}:
+        # Resumo de antes dos vários aprendizes (uma linha por trilha): tabela e gatilhos são recriados
+        for nome in ('ai', 'ad', 'au'):
+            cursor.execute(f"DROP TRIGGER IF EXISTS plano_resumo_{nome}")
+        cursor.execute("DROP TABLE plano_resumo")
+        resumo_existia = None
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS plano_resumo (
+        usuario TEXT NOT NULL, trilha TEXT NOT NULL, linhas INTEGER NOT NULL DEFAULT 0, com_modulo INTEGER NOT NULL DEFAULT 0,
+        concluidas INTEGER NOT NULL DEFAULT 0, horas_pendentes REAL NOT NULL DEFAULT 0,
+        PRIMARY KEY (usuario, trilha)
+    )''')
+    for gatilho in _SQL_GATILHOS_PLANO_RESUMO:
+        cursor.execute(gatilho)
+    if not resumo_existia:
+        _reconstruir_plano_resumo(cursor)
+
+    # Bancos anteriores à tabela 'meta': as contagens são calculadas uma vez a partir das tabelas
+    for tabela in TABELAS_COM_META:
+        if cursor.execute("SELECT 1 FROM meta WHERE chave = ?", (f'linhas_{tabela}',)).fetchone() is None:
+            _atualizar_meta(cursor, tabela)
+
+# --- Metadados ---
+# 'meta' guarda linhas_<tabela>, geracao_<tabela> e geracao (contadores que sobem a cada escrita) e a
+# data (epoch) dos eventos 'ultima_raspagem', 'ultima_juncao' e 'ultima_sincronizacao'; 'meta_trilhas'
+# guarda quantas aulas cada trilha tem. Tudo é atualizado na mesma transação da escrita.
+
+TABELAS_COM_META = ('cursos', 'plano_estudos')
+
+def _definir_meta(cursor, chave, valor):
+    cursor.execute(
+        "INSERT INTO meta (chave, valor) VALUES (?, ?) ON CONFLICT (chave) DO UPDATE SET valor = excluded.valor",
+        (chave, valor)
+    )
+
+def _atualizar_meta(cursor, tabela, recontar=True, evento=None):
     """
-    Salva um DataFrame no banco de dados. Usa DELETE + APPEND para preservar a estrutura da tabela (como a chave primária 'id').
+    Registra, dentro da transação que alterou `tabela`, as novas contagens (se `recontar`), a data
+    do `evento` e uma nova geração dos dados. Escritas que só mudam status usam `recontar=False`.
     """
+    if recontar:
+        _definir_meta(cursor, f'linhas_{tabela}', cursor.execute(f"SELECT COUNT(*) FROM {tabela}").fetchone()[0])
+        if tabela == 'cursos':
+            cursor.execute("DELETE FROM meta_trilhas")
+            cursor.execute('''
+                INSERT INTO meta_trilhas (trilha_nome, aulas)
+                SELECT trilha_nome, SUM(modulo_id IS NOT NULL) FROM cursos
+                WHERE trilha_nome IS NOT NULL GROUP BY trilha_nome
+            ''')
+    if evento is not None:
+        _definir_meta(cursor, evento, time.time())
+    for chave in ('geracao', f'geracao_{tabela}'):
+        cursor.execute(
+            "INSERT INTO meta (chave, valor) VALUES (?, 1) ON CONFLICT (chave) DO UPDATE SET valor = valor + 1", (chave,)
+        )
+    _marcar_geracoes('geracao', f'geracao_{tabela}')
+
+def get_meta():
+    """Retorna o dicionário de metadados (contagens, datas dos eventos e gerações), ou {} sem banco."""
+    if not os.path.exists(DB_PATH): return {}
     try:
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        
-        # Limpa a tabela antes de inserir novos dados
-        cursor.execute(f"DELETE FROM {table_name}")
-        conn.commit()
-        
-        if table_name == 'cursos' and 'aula_conteudo_html' in df.columns:
-            df['aula_conteudo_html'] = df['aula_conteudo_html'].fillna('').apply(
-                lambda x: BeautifulSoup(x, 'html.parser').get_text(separator=' ', strip=True)
-            )
-        
-        # Insere os dados do DataFrame. Se o DF não tiver 'id', o DB vai gerar. Se tiver, ele vai usar.
-        df.to_sql(table_name, conn, if_exists='append', index=False)
-        
-        conn.close()
+        return dict(_conexao().execute("SELECT chave, valor FROM meta").fetchall())
+    except sqlite3.Error:
+        return {}
+
+def get_trilha_lesson_counts():
+    """Retorna {trilha_nome: número de aulas} do catálogo raspado."""
+    if not os.path.exists(DB_PATH): return {}
+    try:
+        return dict(_conexao().execute("SELECT trilha_nome, aulas FROM meta_trilhas ORDER BY trilha_nome").fetchall())
+    except sqlite3.Error:
+        return {}
+
+# As gerações ficam na memória do processo: `data_generation` é consultada a cada busca e a cada execução das
+# páginas, e ir ao banco toda vez custaria uma consulta por chamada. As escritas feitas por este processo relêem
+# as gerações que alteraram logo depois do COMMIT; as dos jobs (outro processo, ver `job_runner`) são relidas
+# quando o processo do job termina (`track_writer_process`) ou quando alguém chama `refresh_generations`.
+_geracoes = {}
+_geracoes_lock = threading.Lock()
+_geracoes_alteradas = threading.local()
+_processos_escritores = []
+
+def _marcar_geracoes(*chaves):
+    """Registra, na transação aberta pela thread, gerações a reler depois do COMMIT."""
+    _geracoes_alteradas.__dict__.setdefault('chaves', set()).update(chaves)
+
+def _publicar_geracoes():
+    chaves = _geracoes_alteradas.__dict__.pop('chaves', None)
+    if not chaves:
+        return
+    # Uma transação desfeita não alterou nada: reler dá o mesmo valor
+    with _geracoes_lock:
+        try:
+            linhas = _conexao().execute(
+                "SELECT chave, valor FROM meta WHERE chave IN (SELECT value FROM json_each(?))", (json.dumps(sorted(chaves)),)
+            ).fetchall()
+        except sqlite3.Error:
+            _geracoes.clear()
+            return
+        _geracoes.update(linhas)
+
+def track_writer_process(processo):
+    """Acompanha um processo (`subprocess.Popen`) que escreve no banco: quando ele terminar, as gerações são relidas."""
+    with _geracoes_lock:
+        _processos_escritores.append(processo)
+
+def refresh_generations():
+    """Descarta as gerações guardadas na memória; a próxima `data_generation` as lê do banco de novo."""
+    with _geracoes_lock:
+        _geracoes.clear()
+
+def data_generation(tabela=None):
+    """
+    Contador que muda a cada escrita (em `tabela`, ou em qualquer tabela se None). Serve de chave
+    para caches que precisam ser invalidados quando os dados mudam. Vem da memória do processo;
+    o banco só é consultado na primeira chamada e depois que um job termina.
+    """
+    if not os.path.exists(DB_PATH): return 0
+    chave = f'geracao_{tabela}' if tabela else 'geracao'
+    with _geracoes_lock:
+        if _processos_escritores:
+            # `poll` só pergunta ao sistema se o processo acabou, sem ir ao banco
+            ativos = [processo for processo in _processos_escritores if processo.poll() is None]
+            if len(ativos) < len(_processos_escritores):
+                _processos_escritores[:] = ativos
+                _geracoes.clear()
+        if chave not in _geracoes:
+            try:
+                linha = _conexao().execute("SELECT valor FROM meta WHERE chave = ?", (chave,)).fetchone()
+            except sqlite3.Error:
+                return 0
+            _geracoes[chave] = linha[0] if linha else 0
+        return _geracoes[chave]
+
+# --- Resumo do progresso ---
+
+def _reconstruir_plano_resumo(cursor):
+    cursor.execute("DELETE FROM plano_resumo")
+    cursor.execute('''
+        INSERT INTO plano_resumo (usuario, trilha, linhas, com_modulo, concluidas, horas_pendentes)
+        SELECT "usuario", COALESCE("Trilha", ''), COUNT(*), COUNT("Módulo"), SUM(COALESCE("aula_concluida", 0) <> 0),
+               SUM(CASE WHEN COALESCE("aula_concluida", 0) <> 0 THEN 0
+                        WHEN typeof("Carga Horária (h)") IN ('integer', 'real') THEN "Carga Horária (h)" ELSE 0 END)
+        FROM plano_estudos GROUP BY 1, 2
+    ''')
+
+def get_progress_summary(trilhas=None, usuario=USUARIO_PADRAO):
+    """
+    Totais do plano do `usuario` calculados no banco, a partir de 'plano_resumo' (uma linha por trilha):
+    {'total_aulas', 'aulas_concluidas', 'aulas_pendentes', 'horas_restantes', 'progresso_percentual',
+     'trilhas': [{'Trilha', 'total_aulas', 'aulas_concluidas', 'progresso_%'}]}.
+    Os totais gerais consideram o plano inteiro; `trilhas` filtra só a lista por trilha.
+    """
+    resumo = {'total_aulas': 0, 'aulas_concluidas': 0, 'aulas_pendentes': 0, 'horas_restantes': 0.0,
+              'progresso_percentual': 0.0, 'trilhas': []}
+    if not os.path.exists(DB_PATH): return resumo
+    try:
+        linhas = _conexao().execute(
+            "SELECT trilha, linhas, com_modulo, concluidas, horas_pendentes FROM plano_resumo "
+            "WHERE usuario = ? AND linhas > 0 ORDER BY trilha", (usuario,)
+        ).fetchall()
+    except sqlite3.Error:
+        return resumo
+    filtro = set(trilhas) if trilhas is not None else None
+    for trilha, total, com_modulo, concluidas, horas_pendentes in linhas:
+        resumo['total_aulas'] += total
+        resumo['aulas_concluidas'] += concluidas
+        resumo['horas_restantes'] += horas_pendentes
+        # Linhas sem trilha contam no total, mas não formam uma trilha (como no groupby do pandas)
+        if trilha != '' and (filtro is None or trilha in filtro):
+            resumo['trilhas'].append({
+                'Trilha': trilha, 'total_aulas': com_modulo, 'aulas_concluidas': concluidas,
+                'progresso_%': round(concluidas / com_modulo * 100, 1) if com_modulo > 0 else 0.0,
+            })
+    resumo['aulas_pendentes'] = resumo['total_aulas'] - resumo['aulas_concluidas']
+    if resumo['total_aulas'] > 0:
+        resumo['progresso_percentual'] = resumo['aulas_concluidas'] / resumo['total_aulas'] * 100
+    return resumo
+
+def _preparar_linhas_cursos(df, normalizador=None):
+    """
+    Preenche 'aula_conteudo' com o texto do HTML das aulas, que fica como veio da plataforma.
+    Deve rodar antes de abrir a transação de escrita: o cache do normalizador grava no mesmo banco.
+    Quem quiser o resumo da conversão (`normalizador.resumo()`) passa o seu próprio `normalizador`.
+    """
+    df = df.copy()
+    if 'aula_conteudo_html' in df.columns:
+        if normalizador is None:
+            with NormalizadorDeConteudo(DB_PATH) as normalizador:
+                df['aula_conteudo'] = normalizador.converter(df['aula_conteudo_html'].tolist())
+        else:
+            df['aula_conteudo'] = normalizador.converter(df['aula_conteudo_html'].tolist())
+    return df
+
+def _inserir_linhas(cursor, df, table_name):
+    """Insere as linhas do DataFrame pelo cursor recebido, sem fazer commit (ao contrário do `to_sql`)."""
+    colunas = ', '.join(f'"{coluna}"' for coluna in df.columns)
+    marcadores = ', '.join('?' * len(df.columns))
+    linhas = df.astype(object).where(df.notna(), None).itertuples(index=False, name=None)
+    cursor.executemany(f'INSERT INTO {table_name} ({colunas}) VALUES ({marcadores})', linhas)
+
+def _substituir_cursos(preencher):
+    """
+    Carga em massa de 'cursos': `preencher(cursor, tabela)` grava as linhas numa tabela nova, sem
+    gatilhos, que toma o lugar de 'cursos'; os índices FTS são reconstruídos uma única vez com 'rebuild'.
+
+    Tudo acontece em uma transação, então quem lê o banco enquanto isso vê a tabela antiga
+    inteira até o COMMIT e a nova inteira depois, nunca uma tabela vazia ou pela metade.
+    Retorna o número de linhas carregadas.
+    """
+    with _transacao() as cursor:
+        cursor.execute("DROP TABLE IF EXISTS cursos_novo")
+        cursor.execute(_SQL_TABELA_CURSOS.format(nome='cursos_novo'))
+        preencher(cursor, 'cursos_novo')
+        carregadas = cursor.execute("SELECT COUNT(*) FROM cursos_novo").fetchone()[0]
+        cursor.execute("DROP TABLE cursos")  # os gatilhos vão junto com a tabela
+        cursor.execute("ALTER TABLE cursos_novo RENAME TO cursos")
+        _criar_gatilhos_cursos(cursor)
+        _reconstruir_indices_fts(cursor)
+        _atualizar_meta(cursor, 'cursos', evento='ultima_raspagem')
+    return carregadas
+
+def save_df_to_db(df, table_name, evento=None):
+    """
+    Salva um DataFrame no banco de dados. Usa DELETE + APPEND na mesma transação para preservar a estrutura da tabela (como a chave primária 'id').
+    Para 'cursos' a carga é em massa (ver `_substituir_cursos`), sem manter o FTS linha a linha.
+    `evento` (por exemplo 'ultima_juncao') tem a data registrada nos metadados.
+    """
+    try:
+        if table_name == 'cursos':
+            df_cursos = _preparar_linhas_cursos(df)
+            _substituir_cursos(lambda cursor, tabela: _inserir_linhas(cursor, df_cursos, tabela))
+            return True
+
+        with _transacao() as cursor:
+            # Limpa a tabela antes de inserir novos dados
+            cursor.execute(f"DELETE FROM {table_name}")
+            # Insere os dados do DataFrame. Se o DF não tiver 'id', o DB vai gerar. Se tiver, ele vai usar.
+            _inserir_linhas(cursor, df, table_name)
+            if table_name in TABELAS_COM_META:
+                _atualizar_meta(cursor, table_name, evento=evento)
         return True
     except Exception as e:
         print(f"Erro ao salvar no banco de dados: {e}")
         return False
 
+# --- Carga do plano ---
+# O plano é casado com o que já está no banco pela chave natural (Trilha, Módulo): primeiro os itens idênticos,
+# depois os que só mudaram de carga, dias ou objetivo. Quando uma chave se repete, a n-ésima repetição no
+# arquivo corresponde à n-ésima no banco (por id). Itens casados mantêm id, link e status.
+
+COLUNAS_PLANO = ['Trilha', 'Módulo', 'Carga Horária (h)', 'Dias Necessários', 'Objetivo']
+TAMANHO_LOTE_PLANO = 5000
+
+def _sql_chave_plano(colunas, ordem):
+    colunas = ', '.join(f'"{coluna}"' for coluna in colunas)
+    return f'json_array({colunas}, ROW_NUMBER() OVER (PARTITION BY {colunas} ORDER BY {ordem}))'
+
+def _lotes_do_plano(fonte, tamanho_lote):
+    """Lê o plano (DataFrame, ou caminho/arquivo CSV lido aos poucos) em lotes com as `COLUNAS_PLANO` e a carga horária numérica."""
+    if isinstance(fonte, pd.DataFrame):
+        lotes = (fonte.iloc[inicio:inicio + tamanho_lote] for inicio in range(0, len(fonte), tamanho_lote))
+    else:
+        lotes = pd.read_csv(fonte, chunksize=tamanho_lote)
+    for lote in lotes:
+        if 'Trilha' not in lote.columns or 'Módulo' not in lote.columns:
+            raise ValueError("o plano precisa das colunas 'Trilha' e 'Módulo'")
+        lote = lote.reindex(columns=COLUNAS_PLANO)
+        carga = lote['Carga Horária (h)']
+        if not pd.api.types.is_numeric_dtype(carga):
+            # Aceita a vírgula decimal ("1,5"); o que não for número fica vazio, como no dashboard
+            carga = carga.astype(object).where(carga.isna(), carga.astype(str).str.replace(',', '.', regex=False))
+        lote['Carga Horária (h)'] = pd.to_numeric(carga, errors='coerce')
+        yield lote
+
+def merge_plan(fonte, usuario=USUARIO_PADRAO, tamanho_lote=TAMANHO_LOTE_PLANO):
+    """
+    Carrega o plano de estudos `fonte` (DataFrame, ou caminho/arquivo CSV) como o plano do `usuario`, sem apagar o
+    que já existe: em uma única transação, insere os itens novos, atualiza os que mudaram e remove os que saíram do plano.
+    Itens que continuam no plano mantêm id, 'aula_link' e 'aula_concluida'.
+    Retorna {'inseridas', 'atualizadas', 'removidas', 'inalteradas'}, ou None se falhar.
+    """
+    colunas = ', '.join(f'"{coluna}"' for coluna in COLUNAS_PLANO)
+    diferente = ' OR '.join(f'plano_estudos."{coluna}" IS NOT c."{coluna}"' for coluna in COLUNAS_PLANO[2:])
+    try:
+        with _transacao() as cursor:
+            cursor.execute('''
+                CREATE TEMP TABLE IF NOT EXISTS _plano_carga (
+                    ordem INTEGER PRIMARY KEY, "Trilha" TEXT, "Módulo" TEXT, "Carga Horária (h)" REAL,
+                    "Dias Necessários" TEXT, "Objetivo" TEXT
+                )''')
+            cursor.execute("DELETE FROM _plano_carga")
+            ordem = 0
+            for lote in _lotes_do_plano(fonte, tamanho_lote):
+                lote.insert(0, 'ordem', range(ordem, ordem + len(lote)))
+                _inserir_linhas(cursor, lote, '_plano_carga')
+                ordem += len(lote)
+
+            # Pares (id no banco, ordem no arquivo) dos itens com a mesma chave
+            cursor.execute("CREATE TEMP TABLE IF NOT EXISTS _plano_pares (id INTEGER PRIMARY KEY, ordem INTEGER UNIQUE)")
+            cursor.execute("DELETE FROM _plano_pares")
+            for chave in (COLUNAS_PLANO, COLUNAS_PLANO[:2]):
+                cursor.execute(f'''
+                    INSERT INTO _plano_pares (id, ordem)
+                    WITH atuais AS (SELECT "id", {_sql_chave_plano(chave, '"id"')} AS chave FROM plano_estudos
+                                    WHERE "usuario" = ? AND "id" NOT IN (SELECT id FROM _plano_pares)),
+                         novas AS (SELECT ordem, {_sql_chave_plano(chave, 'ordem')} AS chave FROM _plano_carga
+                                   WHERE ordem NOT IN (SELECT ordem FROM _plano_pares))
+                    SELECT atuais."id", novas.ordem FROM atuais JOIN novas ON novas.chave = atuais.chave
+                ''', (usuario,))
+            pares = cursor.execute("SELECT COUNT(*) FROM _plano_pares").fetchone()[0]
+
+            cursor.execute('DELETE FROM plano_estudos WHERE "usuario" = ? AND "id" NOT IN (SELECT id FROM _plano_pares)', (usuario,))
+            removidas = cursor.rowcount
+            cursor.execute(f'''
+                UPDATE plano_estudos SET {', '.join(f'"{coluna}" = c."{coluna}"' for coluna in COLUNAS_PLANO[2:])}
+                FROM _plano_pares AS p JOIN _plano_carga AS c ON c.ordem = p.ordem
+                WHERE plano_estudos."id" = p.id AND ({diferente})
+            ''')
+            atualizadas = cursor.rowcount
+            cursor.execute(f'''
+                INSERT INTO plano_estudos ({colunas}, "aula_link", "aula_concluida", "usuario")
+                SELECT {colunas}, NULL, 0, ? FROM _plano_carga
+                WHERE ordem NOT IN (SELECT ordem FROM _plano_pares) ORDER BY ordem
+            ''', (usuario,))
+            inseridas = cursor.rowcount
+            if inseridas or atualizadas or removidas:
+                _atualizar_meta(cursor, 'plano_estudos')
+        return {'inseridas': inseridas, 'atualizadas': atualizadas, 'removidas': removidas,
+                'inalteradas': pares - atualizadas}
+    except Exception as e:
+        print(f"Erro ao carregar o plano de estudos: {e}")
+        return None
+
+def load_plan(usuario=USUARIO_PADRAO):
+    """O plano de estudos do `usuario`, na ordem dos ids (sem a coluna 'usuario')."""
+    if not os.path.exists(DB_PATH): return pd.DataFrame()
+    colunas = ', '.join(f'"{coluna}"' for coluna in ['id'] + COLUNAS_PLANO + ['aula_link', 'aula_concluida'])
+    try:
+        return pd.read_sql_query(
+            f'SELECT {colunas} FROM plano_estudos WHERE "usuario" = ? ORDER BY "id"', _conexao(), params=(usuario,)
+        )
+    except pd.io.sql.DatabaseError: return pd.DataFrame()
+
+# A impressão digital de uma aula vem do texto do seu item na lista do módulo (ver `html_extract.impressao_digital_aula`):
+# ela percebe aulas novas, renomeadas ou movidas, mas não mudanças só no corpo, no sumário ou no slug, que exigiriam
+# baixar cada aula. Por isso o conteúdo também vence: cada aula é baixada de novo depois de IDADE_MAXIMA_CONTEUDO.
+IDADE_MAXIMA_CONTEUDO = 30 * 24 * 60 * 60      # 30 dias, em segundos
+
+def load_lesson_fingerprints(idade_maxima=IDADE_MAXIMA_CONTEUDO):
+    """
+    Retorna {curso_link: {aula_id: (modulo_id, aula_fingerprint)}} com as aulas já salvas, para a raspagem incremental.
+    Aulas com o conteúdo vencido entram sem impressão digital e são baixadas de novo. Cada aula vence entre `idade_maxima`
+    e o dobro dela, conforme o id, para que as aulas de uma mesma raspagem completa não sejam rebaixadas todas de uma vez.
+    """
+    if not os.path.exists(DB_PATH): return {}
+    linhas = _conexao().execute(
+        """SELECT curso_link, aula_id, modulo_id,
+                  CASE WHEN aula_baixada_em >= ? - ? * (aula_id % 10) / 10.0 THEN aula_fingerprint END
+           FROM cursos WHERE modulo_id IS NOT NULL""",
+        (time.time() - idade_maxima, idade_maxima)
+    ).fetchall()
+    aulas_conhecidas = {}
+    for curso_link, aula_id, modulo_id, fingerprint in linhas:
+        aulas_conhecidas.setdefault(curso_link, {})[aula_id] = (modulo_id, fingerprint)
+    return aulas_conhecidas
+
+def _preencher_tabela_temporaria(cursor, tabela, coluna, valores):
+    """(Re)cria uma tabela temporária de uma coluna; como a conexão é reaproveitada, limpa o que sobrou da chamada anterior."""
+    cursor.execute(f"CREATE TEMP TABLE IF NOT EXISTS {tabela} ({coluna} PRIMARY KEY)")
+    cursor.execute(f"DELETE FROM {tabela}")
+    cursor.executemany(f"INSERT OR IGNORE INTO {tabela} VALUES (?)", [(valor,) for valor in valores])
+
+def apply_incremental_scrape(resultado, normalizador=None):
+    """
+    Aplica o resultado de `scraper.run_incremental_scraper` na tabela 'cursos' em uma única transação:
+    remove cursos e aulas que sumiram da plataforma, regrava as aulas novas ou alteradas e atualiza o
+    status das inalteradas. Aulas de cursos ou módulos cuja raspagem falhou são mantidas, assim como
+    as aulas que continuam listadas mas cujo detalhe não veio (a linha antiga fica como estava).
+    O conteúdo das aulas novas é convertido em texto pelo `normalizador` (ver `_preparar_linhas_cursos`).
+    """
+    try:
+        df_novas = resultado['novas']
+        if not df_novas.empty:
+            df_novas = _preparar_linhas_cursos(df_novas, normalizador)
+        with _transacao() as cursor:
+            _preencher_tabela_temporaria(cursor, '_links_catalogo', 'curso_link TEXT', resultado['links_catalogo'])
+            _preencher_tabela_temporaria(cursor, '_aulas_listadas', 'aula_id INTEGER', resultado['listadas'])
+            _preencher_tabela_temporaria(cursor, '_modulos_com_falha', 'modulo_id INTEGER', resultado['modulos_com_falha'])
+
+            # Cursos que não aparecem mais na página de conteúdos
+            cursor.execute("DELETE FROM cursos WHERE curso_link NOT IN (SELECT curso_link FROM _links_catalogo)")
+            removidas = cursor.rowcount
+            # Aulas que sumiram dos cursos raspados com sucesso (e linhas de aulas que serão regravadas)
+            cursos_raspados = resultado['cursos_raspados']
+            for inicio in range(0, len(cursos_raspados), 500):
+                lote = cursos_raspados[inicio:inicio + 500]
+                marcadores = ', '.join('?' * len(lote))
+                cursor.execute(f'''
+                    DELETE FROM cursos
+                    WHERE curso_link IN ({marcadores})
+                      AND aula_id NOT IN (SELECT aula_id FROM _aulas_listadas)
+                      AND (modulo_id IS NULL OR modulo_id NOT IN (SELECT modulo_id FROM _modulos_com_falha))
+                ''', lote)
+                removidas += cursor.rowcount
+            if not df_novas.empty:
+                ids_novos = [(int(aula_id),) for aula_id in df_novas['aula_id'].dropna()]
+                cursor.executemany("DELETE FROM cursos WHERE aula_id = ?", ids_novos)
+                _inserir_linhas(cursor, df_novas, 'cursos')
+
+            cursor.executemany(
+                "UPDATE cursos SET aula_concluida = ? WHERE aula_id = ?",
+                [(aula['concluida'], aula['id']) for aula in resultado['inalteradas']]
+            )
+            _atualizar_meta(cursor, 'cursos', evento='ultima_raspagem')
+        return {'gravadas': len(df_novas), 'inalteradas': len(resultado['inalteradas']), 'removidas': removidas}
+    except Exception as e:
+        print(f"Erro ao aplicar a raspagem incremental: {e}")
+        return None
+
+# --- Raspagem completa com checkpoint ---
+# Status dos jobs: 'pendente' -> 'em_andamento' -> 'concluido'; 'falhou' quando o curso esgotou as
+# tentativas (fica gravado só com a linha de marcação, como a raspagem completa sempre fez).
+
+def start_scrape_jobs(cursos, retomar=True):
+    """
+    Registra os jobs de uma raspagem completa para a lista [(trilha, curso, link)] da página de conteúdos.
+
+    Com `retomar=True` e uma raspagem anterior inacabada, os cursos já gravados são mantidos e os
+    demais voltam para 'pendente'; cursos que saíram do catálogo são descartados. Caso contrário
+    tudo recomeça do zero. Retorna o conjunto de links que não precisam ser raspados de novo.
+    """
+    with _transacao() as cursor:
+        if not retomar:
+            cursor.execute("DELETE FROM raspagem_cursos")
+        _preencher_tabela_temporaria(cursor, '_links_catalogo', 'curso_link TEXT', [link for _, _, link in cursos])
+        cursor.execute("DELETE FROM raspagem_cursos WHERE curso_link NOT IN (SELECT curso_link FROM _links_catalogo)")
+        cursor.execute("DELETE FROM cursos_carga WHERE curso_link NOT IN (SELECT curso_link FROM raspagem_cursos)")
+        agora = time.time()
+        cursor.executemany('''
+            INSERT INTO raspagem_cursos (curso_link, ordem, trilha_nome, curso_nome, status, tentativas, atualizado_em)
+            VALUES (?, ?, ?, ?, 'pendente', 0, ?)
+            ON CONFLICT (curso_link) DO UPDATE SET
+                ordem = excluded.ordem, trilha_nome = excluded.trilha_nome, curso_nome = excluded.curso_nome,
+                status = CASE WHEN status IN ('concluido', 'falhou') THEN status ELSE 'pendente' END
+        ''', [(link, ordem, nome_trilha, nome_curso, agora) for ordem, (nome_trilha, nome_curso, link) in enumerate(cursos)])
+        # As linhas de um curso na carga seguem a ordem atual dele na página de conteúdos
+        cursor.execute('''
+            UPDATE cursos_carga SET ordem_curso = (SELECT ordem FROM raspagem_cursos r WHERE r.curso_link = cursos_carga.curso_link)
+        ''')
+        return {link for (link,) in cursor.execute("SELECT curso_link FROM raspagem_cursos WHERE status IN ('concluido', 'falhou')")}
+
+def mark_scrape_job_running(curso_link):
+    """Marca o job como 'em_andamento' e conta uma tentativa."""
+    _conexao().execute(
+        "UPDATE raspagem_cursos SET status = 'em_andamento', tentativas = tentativas + 1, atualizado_em = ? WHERE curso_link = ?",
+        (time.time(), curso_link)
+    )
+
+def record_scrape_failure(curso_link, max_tentativas):
+    """
+    Registra a falha de um curso. Retorna True se ele esgotou as `max_tentativas` (quem chamou
+    deve gravá-lo com `save_scraped_course(..., status='falhou')`); senão ele volta para 'pendente'
+    e será raspado de novo na próxima execução.
+    """
+    with _transacao() as cursor:
+        cursor.execute(
+            "UPDATE raspagem_cursos SET status = 'pendente', atualizado_em = ? WHERE curso_link = ?",
+            (time.time(), curso_link)
+        )
+        linha = cursor.execute("SELECT tentativas FROM raspagem_cursos WHERE curso_link = ?", (curso_link,)).fetchone()
+    return linha is None or linha[0] >= max_tentativas
+
+def save_scraped_course(curso_link, linhas, status='concluido', normalizador=None):
+    """
+    Grava as linhas de um curso na tabela de carga e fecha o seu job, na mesma transação:
+    se o processo cair logo depois, o curso não é raspado de novo. Um `NormalizadorDeConteudo`
+    compartilhado entre os cursos evita abrir um pool de conversão a cada chamada.
+    """
+    df = _preparar_linhas_cursos(pd.DataFrame(linhas, columns=COLUNAS_CURSOS), normalizador)
+    with _transacao() as cursor:
+        ordem_curso = cursor.execute("SELECT ordem FROM raspagem_cursos WHERE curso_link = ?", (curso_link,)).fetchone()
+        df.insert(0, 'ordem_aula', range(len(df)))
+        df.insert(0, 'ordem_curso', ordem_curso[0] if ordem_curso else None)
+        cursor.execute("DELETE FROM cursos_carga WHERE curso_link = ?", (curso_link,))
+        _inserir_linhas(cursor, df, 'cursos_carga')
+        cursor.execute(
+            "UPDATE raspagem_cursos SET status = ?, atualizado_em = ? WHERE curso_link = ?",
+            (status, time.time(), curso_link)
+        )
+
+def scrape_jobs_summary():
+    """Retorna {status: quantidade} dos jobs da raspagem completa em andamento ({} se não houver nenhuma)."""
+    if not os.path.exists(DB_PATH): return {}
+    try:
+        return dict(_conexao().execute("SELECT status, COUNT(*) FROM raspagem_cursos GROUP BY status").fetchall())
+    except sqlite3.Error:
+        return {}
+
+def publish_scraped_courses():
+    """
+    Substitui o conteúdo de 'cursos' pela tabela de carga, na ordem da página de conteúdos, e encerra
+    a raspagem. Só publica se nenhum job estiver pendente. Retorna o número de linhas gravadas, ou None.
+    """
+    colunas = ', '.join(COLUNAS_CURSOS)
+    def preencher(cursor, tabela):
+        cursor.execute(f"INSERT INTO {tabela} ({colunas}) SELECT {colunas} FROM cursos_carga ORDER BY ordem_curso, ordem_aula")
+        cursor.execute("DELETE FROM cursos_carga")
+        cursor.execute("DELETE FROM raspagem_cursos")
+
+    try:
+        with _transacao() as cursor:
+            pendentes = cursor.execute("SELECT COUNT(*) FROM raspagem_cursos WHERE status NOT IN ('concluido', 'falhou')").fetchone()[0]
+            if pendentes:
+                return None
+            return _substituir_cursos(preencher)
+    except Exception as e:
+        print(f"Erro ao publicar a raspagem no banco de dados: {e}")
+        return None
+
+# --- Jobs em segundo plano ---
+# Status: 'na_fila' -> 'em_andamento' -> 'concluido' | 'falhou' | 'cancelado'. O processo do job renova o
+# 'batimento' a cada poucos segundos; um job ativo sem batimento há JOB_SEM_BATIMENTO_MAXIMO segundos
+# (processo morto) passa a 'falhou' e libera a trava.
+
+JOB_STATUS_ATIVOS = ('na_fila', 'em_andamento')
+JOB_SEM_BATIMENTO_MAXIMO = 120
+JOBS_COM_EVENTOS = 20                   # jobs mais recentes que mantêm o log guardado
+
+_COLUNAS_JOB = ['id', 'tipo', 'trava', 'usuario', 'parametros', 'status', 'pid', 'cancelar', 'feitos', 'total', 'aulas',
+                'resultado', 'erro', 'criado_em', 'iniciado_em', 'batimento', 'terminado_em']
+
+def _job_da_linha(linha):
+    if linha is None: return None
+    job = dict(zip(_COLUNAS_JOB, linha))
+    for coluna in ('parametros', 'resultado'):
+        job[coluna] = json.loads(job[coluna]) if job[coluna] is not None else None
+    return job
+
+def _expirar_jobs_parados(cursor):
+    cursor.execute(f'''
+        UPDATE jobs SET status = 'falhou', erro = 'O processo do job parou de responder.', terminado_em = ?
+        WHERE status IN {JOB_STATUS_ATIVOS} AND batimento < ?
+    ''', (time.time(), time.time() - JOB_SEM_BATIMENTO_MAXIMO))
+
+def create_job(tipo, trava, usuario=USUARIO_PADRAO, parametros=None):
+    """
+    Registra um job 'na_fila'. Só um job por `trava` fica ativo de cada vez: se já houver um, ele é devolvido.
+    Retorna (job, criado), ou (None, False) se falhar.
+    """
+    try:
+        with _transacao() as cursor:
+            _expirar_jobs_parados(cursor)
+            ativo = cursor.execute(
+                f"SELECT {', '.join(_COLUNAS_JOB)} FROM jobs WHERE trava = ? AND status IN {JOB_STATUS_ATIVOS}", (trava,)
+            ).fetchone()
+            if ativo is not None:
+                return _job_da_linha(ativo), False
+            agora = time.time()
+            cursor.execute(
+                "INSERT INTO jobs (tipo, trava, usuario, parametros, criado_em, batimento) VALUES (?, ?, ?, ?, ?, ?)",
+                (tipo, trava, usuario, json.dumps(parametros or {}), agora, agora)
+            )
+            job_id = cursor.lastrowid
+            cursor.execute(
+                "DELETE FROM jobs_eventos WHERE job_id NOT IN (SELECT id FROM jobs ORDER BY id DESC LIMIT ?)", (JOBS_COM_EVENTOS,)
+            )
+            return _job_da_linha(cursor.execute(f"SELECT {', '.join(_COLUNAS_JOB)} FROM jobs WHERE id = ?", (job_id,)).fetchone()), True
+    except Exception as e:
+        print(f"Erro ao registrar o job: {e}")
+        return None, False
+
+def get_job(job_id):
+    """O job como dict (com 'parametros' e 'resultado' já decodificados), ou None."""
+    if not os.path.exists(DB_PATH): return None
+    consulta = f"SELECT {', '.join(_COLUNAS_JOB)} FROM jobs WHERE id = ?"
+    try:
+        job = _job_da_linha(_conexao().execute(consulta, (job_id,)).fetchone())
+        if job is not None and job['status'] in JOB_STATUS_ATIVOS and job['batimento'] < time.time() - JOB_SEM_BATIMENTO_MAXIMO:
+            with _transacao() as cursor:
+                _expirar_jobs_parados(cursor)
+            job = _job_da_linha(_conexao().execute(consulta, (job_id,)).fetchone())
+        return job
+    except sqlite3.Error:
+        return None
+
+def latest_job(tipo, usuario=None):
+    """O job mais recente do `tipo` (do `usuario`, se informado), ou None."""
+    if not os.path.exists(DB_PATH): return None
+    sql, params = "SELECT id FROM jobs WHERE tipo = ?", [tipo]
+    if usuario is not None:
+        sql, params = sql + " AND usuario = ?", params + [usuario]
+    try:
+        linha = _conexao().execute(sql + " ORDER BY id DESC LIMIT 1", params).fetchone()
+    except sqlite3.Error:
+        return None
+    return get_job(linha[0]) if linha else None
+
+def start_job(job_id, pid):
+    """Passa o job de 'na_fila' para 'em_andamento' no processo `pid`. Retorna False se ele não estava mais na fila."""
+    agora = time.time()
+    with _transacao() as cursor:
+        cursor.execute(
+            "UPDATE jobs SET status = 'em_andamento', pid = ?, iniciado_em = ?, batimento = ? WHERE id = ? AND status = 'na_fila'",
+            (pid, agora, agora, job_id)
+        )
+        return cursor.rowcount == 1
+
+def heartbeat_job(job_id):
+    """Renova o batimento do job e responde se o cancelamento foi pedido."""
+    with _transacao() as cursor:
+        cursor.execute("UPDATE jobs SET batimento = ? WHERE id = ?", (time.time(), job_id))
+        linha = cursor.execute("SELECT cancelar FROM jobs WHERE id = ?", (job_id,)).fetchone()
+    return bool(linha and linha[0])
+
+def update_job_progress(job_id, feitos, total, aulas):
+    with _transacao() as cursor:
+        cursor.execute("UPDATE jobs SET feitos = ?, total = ?, aulas = ? WHERE id = ?", (feitos, total, aulas, job_id))
+
+def add_job_event(job_id, nivel, texto):
+    with _transacao() as cursor:
+        cursor.execute(
+            "INSERT INTO jobs_eventos (job_id, momento, nivel, texto) VALUES (?, ?, ?, ?)", (job_id, time.time(), nivel, texto)
+        )
+
+def get_job_events(job_id, limite=50):
+    """Os últimos `limite` eventos do job, do mais antigo para o mais novo, como [(momento, nivel, texto)]."""
+    if not os.path.exists(DB_PATH): return []
+    try:
+        linhas = _conexao().execute(
+            "SELECT momento, nivel, texto FROM jobs_eventos WHERE job_id = ? ORDER BY id DESC LIMIT ?", (job_id, limite)
+        ).fetchall()
+    except sqlite3.Error:
+        return []
+    return linhas[::-1]
+
+def finish_job(job_id, status, resultado=None, erro=None):
+    """Encerra o job com `status` ('concluido', 'falhou' ou 'cancelado'), se ele ainda estiver ativo."""
+    try:
+        with _transacao() as cursor:
+            cursor.execute(
+                f"UPDATE jobs SET status = ?, resultado = ?, erro = ?, terminado_em = ? WHERE id = ? AND status IN {JOB_STATUS_ATIVOS}",
+                (status, json.dumps(resultado) if resultado is not None else None, erro, time.time(), job_id)
+            )
+        return True
+    except Exception as e:
+        print(f"Erro ao encerrar o job: {e}")
+        return False
+
+def request_job_cancel(job_id):
+    """Pede o cancelamento do job; o processo dele atende no próximo batimento."""
+    try:
+        with _transacao() as cursor:
+            cursor.execute(f"UPDATE jobs SET cancelar = 1 WHERE id = ? AND status IN {JOB_STATUS_ATIVOS}", (job_id,))
+        return True
+    except Exception as e:
+        print(f"Erro ao pedir o cancelamento do job: {e}")
+        return False
+
+# --- Progresso de cada aprendiz ---
+
+def _copiar_progresso_do_catalogo(cursor, usuario):
+    """Grava como progresso do `usuario` o status que a raspagem leu para ele ('cursos.aula_concluida')."""
+    cursor.execute('''
+        INSERT INTO progresso_aulas (usuario, aula_id, concluida)
+        SELECT ?, aula_id, aula_concluida <> 0 FROM cursos WHERE modulo_id IS NOT NULL AND aula_concluida IS NOT NULL
+        ON CONFLICT (usuario, aula_id) DO UPDATE SET concluida = excluded.concluida
+    ''', (usuario,))
+    return cursor.rowcount
+
+def import_catalog_progress(usuario=USUARIO_PADRAO):
+    """
+    Depois de uma raspagem de conteúdo, leva o status das aulas lido nela para o progresso do `usuario` que a fez.
+    Retorna quantas aulas foram gravadas, ou None se falhar.
+    """
+    try:
+        with _transacao() as cursor:
+            gravadas = _copiar_progresso_do_catalogo(cursor, usuario)
+            _atualizar_meta(cursor, 'progresso_aulas', recontar=False)
+            return gravadas
+    except Exception as e:
+        print(f"Erro ao importar o progresso da raspagem: {e}")
+        return None
+
+def claim_default_user(usuario):
+    """
+    Bancos de antes dos vários aprendizes: o primeiro aprendiz a entrar sem plano nem progresso próprios assume
+    o plano e o progresso do USUARIO_PADRAO, que ninguém mais acessa. Retorna quantos itens do plano passaram
+    para ele (0 se não havia o que assumir), ou None se falhar.
+    """
+    if usuario == USUARIO_PADRAO:
+        return 0
+    try:
+        with _transacao() as cursor:
+            tem_dados = cursor.execute(
+                'SELECT EXISTS (SELECT 1 FROM plano_estudos WHERE "usuario" = ?) OR EXISTS (SELECT 1 FROM progresso_aulas WHERE usuario = ?)',
+                (usuario, usuario)
+            ).fetchone()[0]
+            if tem_dados:
+                return 0
+            cursor.execute('UPDATE plano_estudos SET "usuario" = ? WHERE "usuario" = ?', (usuario, USUARIO_PADRAO))
+            itens = cursor.rowcount
+            cursor.execute("UPDATE progresso_aulas SET usuario = ? WHERE usuario = ?", (usuario, USUARIO_PADRAO))
+            if itens:
+                _atualizar_meta(cursor, 'plano_estudos', recontar=False)
+            return itens
+    except Exception as e:
+        print(f"Erro ao assumir o plano local: {e}")
+        return None
+
+def update_lesson_progress_many(status_aulas, usuario=USUARIO_PADRAO):
+    """
+    Grava o progresso do `usuario` nas aulas em lote, numa única transação, sem tocar no catálogo compartilhado.
+    Recebe uma lista de {'id', 'concluida'} e retorna quantas aulas mudaram de status.
+    """
+    try:
+        with _transacao() as cursor:
+            cursor.executemany(
+                '''INSERT INTO progresso_aulas (usuario, aula_id, concluida) VALUES (?, ?, ?)
+                   ON CONFLICT (usuario, aula_id) DO UPDATE SET concluida = excluded.concluida
+                   WHERE concluida IS NOT excluded.concluida''',
+                [(usuario, aula['id'], bool(aula['concluida'])) for aula in status_aulas]
+            )
+            alteradas = cursor.rowcount
+            _atualizar_meta(cursor, 'progresso_aulas', recontar=False, evento='ultima_sincronizacao')
+            return alteradas
+    except Exception as e:
+        print(f"Erro ao atualizar o status das aulas: {e}")
+        return None
+
+def get_lesson_progress(aula_ids, usuario=USUARIO_PADRAO):
+    """Retorna {aula_id: concluida} do `usuario` para as `aula_ids` pedidas (as que ele nunca sincronizou ficam de fora)."""
+    if not os.path.exists(DB_PATH): return {}
+    try:
+        return {aula_id: bool(concluida) for aula_id, concluida in _conexao().execute(
+            "SELECT aula_id, concluida FROM progresso_aulas WHERE usuario = ? AND aula_id IN (SELECT value FROM json_each(?))",
+            (usuario, json.dumps([int(aula_id) for aula_id in aula_ids]))
+        )}
+    except sqlite3.Error:
+        return {}
+
+def load_progress_by_link(usuario=USUARIO_PADRAO):
+    """Retorna {aula_link: concluida} do `usuario`, para a junção do plano dele."""
+    if not os.path.exists(DB_PATH): return {}
+    try:
+        return {aula_link: bool(concluida) for aula_link, concluida in _conexao().execute(
+            "SELECT c.aula_link, p.concluida FROM progresso_aulas AS p JOIN cursos AS c ON c.aula_id = p.aula_id "
+            "WHERE p.usuario = ? AND c.aula_link IS NOT NULL", (usuario,)
+        )}
+    except sqlite3.Error:
+        return {}
+
+def update_plan_status_from_progress(usuario=USUARIO_PADRAO):
+    """
+    Leva o progresso do `usuario` nas aulas para o plano dele pelo 'aula_link', como o `run_joiner` faz:
+    itens já marcados como concluídos continuam concluídos. Retorna quantos itens foram marcados.
+    """
+    try:
+        with _transacao() as cursor:
+            cursor.execute('''
+                UPDATE plano_estudos SET "aula_concluida" = 1
+                WHERE "usuario" = ? AND COALESCE("aula_concluida", 0) = 0
+                  AND "aula_link" IN (
+                      SELECT c.aula_link FROM progresso_aulas AS p JOIN cursos AS c ON c.aula_id = p.aula_id
+                      WHERE p.usuario = ? AND p.concluida = 1
+                  )
+            ''', (usuario, usuario))
+            marcados = cursor.rowcount
+            _atualizar_meta(cursor, 'plano_estudos', recontar=False)
+            return marcados
+    except Exception as e:
+        print(f"Erro ao atualizar o status do plano: {e}")
+        return None
+
 # --- MUDANÇA AQUI ---
 # A função agora usa o 'id' para ser mais precisa e eficiente
-def update_aula_status(item_id, novo_status):
+def update_aula_status(item_id, novo_status, usuario=USUARIO_PADRAO):
     """
-    Atualiza o status de 'aula_concluida' para um item específico do plano usando seu ID.
+    Atualiza o status de 'aula_concluida' para um item específico do plano do `usuario` usando seu ID.
     """
     try:
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        query = 'UPDATE plano_estudos SET "aula_concluida" = ? WHERE "id" = ?'
-        cursor.execute(query, (novo_status, item_id))
-        conn.commit()
-        conn.close()
+        query = 'UPDATE plano_estudos SET "aula_concluida" = ? WHERE "id" = ? AND "usuario" = ?'
+        with _transacao() as cursor:
+            cursor.execute(query, (novo_status, item_id, usuario))
+            _atualizar_meta(cursor, 'plano_estudos', recontar=False)
         return True
     except Exception as e:
         print(f"Erro ao atualizar status da aula: {e}")
         return False
+
+COLUNAS_PLANO_MATCHES = ['trilha_texto', 'modulo_texto', 'versao_trilhas', 'trilha', 'versao_trilha',
+                         'aula_link', 'nota_trilha', 'nota_modulo', 'nota_curso']
+
+def load_plan_matches(versao_trilhas):
+    """Resultados guardados da junção para a lista de trilhas `versao_trilhas`, como {(trilha_texto, modulo_texto): dict}."""
+    if not os.path.exists(DB_PATH): return {}
+    try:
+        linhas = _conexao().execute(
+            f"SELECT {', '.join(COLUNAS_PLANO_MATCHES)} FROM plano_matches WHERE versao_trilhas = ?", (versao_trilhas,)
+        ).fetchall()
+    except sqlite3.Error:
+        return {}
+    return {(linha[0], linha[1]): dict(zip(COLUNAS_PLANO_MATCHES, linha)) for linha in linhas}
+
+def save_plan_matches(resultados, versao_trilhas):
+    """
+    Grava (ou substitui) os resultados da junção (dicts com as `COLUNAS_PLANO_MATCHES`) e descarta os de outras
+    listas de trilhas, que não voltam a valer.
+    """
+    try:
+        with _transacao() as cursor:
+            cursor.execute("DELETE FROM plano_matches WHERE versao_trilhas <> ?", (versao_trilhas,))
+            cursor.executemany(
+                f"INSERT OR REPLACE INTO plano_matches ({', '.join(COLUNAS_PLANO_MATCHES)}) "
+                f"VALUES ({', '.join('?' * len(COLUNAS_PLANO_MATCHES))})",
+                [tuple(resultado[coluna] for coluna in COLUNAS_PLANO_MATCHES) for resultado in resultados]
+            )
+        return True
+    except Exception as e:
+        print(f"Erro ao salvar o cache da junção: {e}")
+        return False
+
+def update_plan_links(atualizacoes, usuario=USUARIO_PADRAO):
+    """
+    Aplica o resultado da junção no plano do `usuario`: `atualizacoes` é uma lista de (id, aula_link, aula_concluida),
+    só com os itens que mudaram, gravados em uma transação. Retorna quantos itens foram atualizados, ou None se falhar.
+    """
+    try:
+        with _transacao() as cursor:
+            cursor.executemany(
+                'UPDATE plano_estudos SET "aula_link" = ?, "aula_concluida" = ? WHERE "id" = ? AND "usuario" = ?',
+                [(aula_link, bool(concluida), int(item_id), usuario) for item_id, aula_link, concluida in atualizacoes]
+            )
+            _atualizar_meta(cursor, 'plano_estudos', recontar=False, evento='ultima_juncao')
+        return len(atualizacoes)
+    except Exception as e:
+        print(f"Erro ao aplicar a junção no plano: {e}")
+        return None
+
+def update_status_many(ids, statuses, usuario=USUARIO_PADRAO):
+    """
+    Atualiza 'aula_concluida' de vários itens do plano do `usuario` (pares `ids[i]` -> `statuses[i]`) em uma única
+    transação. Retorna o novo `get_progress_summary()` dele, ou None se a gravação falhar.
+    """
+    # Os valores costumam vir de DataFrames (numpy.int64 / numpy.bool_), que o sqlite3 não sabe gravar
+    trios = [(bool(status), int(item_id), usuario) for item_id, status in zip(ids, statuses)]
+    try:
+        if trios:
+            with _transacao() as cursor:
+                cursor.executemany('UPDATE plano_estudos SET "aula_concluida" = ? WHERE "id" = ? AND "usuario" = ?', trios)
+                _atualizar_meta(cursor, 'plano_estudos', recontar=False)
+        return get_progress_summary(usuario=usuario)
+    except Exception as e:
+        print(f"Erro ao atualizar o status das aulas do plano: {e}")
+        return None
         
 # ... (o resto das funções, search_courses, load_table_to_df, etc., permanecem iguais) ...
-def search_courses(query):
-    conn = sqlite3.connect(DB_PATH)
-    sql_query = """
-    SELECT c.*, fts.rank
-    FROM cursos AS c
-    JOIN cursos_fts AS fts ON c.aula_id = fts.rowid
-    WHERE fts.cursos_fts MATCH ?
-    ORDER BY fts.rank;
-    """
-    sanitized_query = re.sub(r'[^a-zA-Z0-9\s\u00C0-\u017F]', '', query, re.UNICODE).strip()
+def _sem_acentos(texto):
+    return ''.join(c for c in unicodedata.normalize('NFKD', texto) if not unicodedata.combining(c))
+
+def _consulta_fts(query):
+    """
+    Transforma o texto digitado em uma consulta FTS5 de prefixos (`termo*`), ou None se não sobrar nenhum termo.
+    Caixa e acentos já são ignorados pelo índice; tirá-los aqui faz "Regressão" e "regressao" virarem a mesma
+    consulta (e a mesma entrada do cache de buscas).
+    """
+    query = _sem_acentos(query.lower())
+    sanitized_query = re.sub(r'[^a-zA-Z0-9\s\u00C0-\u017F]', '', query).strip()
     if not sanitized_query:
-        conn.close()
-        return pd.DataFrame()
-    fts_query = ' '.join([f'{term}*' for term in sanitized_query.split()])
-    df = pd.read_sql_query(sql_query, conn, params=(fts_query,))
-    conn.close()
-    return df
-def load_table_to_df(table_name):
+        return None
+    return ' '.join([f'{term}*' for term in sanitized_query.split()])
+
+# Peso de cada coluna do 'cursos_fts' no bm25 (na ordem das colunas): um termo no nome da aula vale mais que no conteúdo
+PESOS_BM25 = {
+    'trilha_nome': 1.0, 'curso_nome': 2.0, 'modulo_nome': 2.0,
+    'aula_nome': 5.0, 'aula_sumario': 2.0, 'aula_conteudo': 1.0,
+}
+BUSCAS_EM_CACHE = 128
+
+def _expressao_rank(pesos=None):
+    """`bm25(...)` com os pesos de `PESOS_BM25`, sobrepostos pelos de `pesos` ({coluna: peso})."""
+    pesos = {**PESOS_BM25, **(pesos or {})}
+    return f"bm25(cursos_fts, {', '.join(repr(float(pesos[coluna])) for coluna in PESOS_BM25)})"
+
+def search_courses(query, trilhas=None, limite=None, apos=None, pesos=None):
+    """
+    Os `limite` melhores resultados da busca, do mais para o menos relevante pelo bm25 com `pesos`, filtrados por
+    `trilhas` no próprio SQL. Como na listagem, as páginas seguem por chave: `apos` é o ('rank', 'aula_id') da
+    última linha da página anterior (None para a primeira). Traz as colunas da listagem, o 'rank', o nome da aula
+    com os termos destacados ('aula_nome_destacado') e um trecho do conteúdo onde eles aparecem ('trecho').
+    Resultados repetidos (mesma consulta normalizada, filtros, chave e geração dos dados) vêm do cache, sem ir ao banco.
+    """
+    fts_query = _consulta_fts(query)
+    if fts_query is None or not os.path.exists(DB_PATH):
+        return pd.DataFrame(columns=COLUNAS_LISTAGEM + _INDICADORES_DE_CORPO + ['rank', 'aula_nome_destacado', 'trecho'])
+    resultado = _buscar(
+        fts_query, tuple(sorted(trilhas)) if trilhas is not None else None, limite or TAMANHO_PAGINA_PADRAO,
+        (float(apos[0]), int(apos[1])) if apos is not None else None,
+        tuple(sorted((pesos or {}).items())), data_generation('cursos')
+    )
+    # O DataFrame do cache é compartilhado; quem chama recebe uma cópia para poder alterá-la
+    return resultado.copy()
+
+@functools.lru_cache(maxsize=BUSCAS_EM_CACHE)
+def _buscar(fts_query, trilhas, limite, apos, pesos, geracao):
+    sql, params, ordem = _consulta_listagem(trilhas, fts_query, dict(pesos), ja_normalizada=True)
+    if apos is not None:
+        sql += f" AND ({', '.join(ordem)}) > (?, ?)"
+        params = params + list(apos)
+    sql_query = f"""
+    SELECT {_colunas_listagem(ordem[0])},
+           highlight(cursos_fts, 3, '**', '**') AS aula_nome_destacado,
+           snippet(cursos_fts, 5, '**', '**', '…', 16) AS trecho
+    {sql}
+    ORDER BY {', '.join(ordem)}
+    LIMIT ?
+    """
+    return pd.read_sql_query(sql_query, _conexao(), params=params + [limite])
+
+def search_substring(texto, trilhas=None, limite=None):
+    """
+    Aulas cujo nome (da aula, do módulo ou do curso) contém `texto` em qualquer posição, pelo índice de
+    trigramas, com as mesmas colunas de `search_courses` (sem 'rank' nem 'trecho'). Exige USAR_INDICE_TRIGRAMAS
+    e pelo menos 3 caracteres; fora disso retorna um DataFrame vazio.
+    """
+    vazio = pd.DataFrame(columns=COLUNAS_LISTAGEM + _INDICADORES_DE_CORPO + ['rank', 'aula_nome_destacado', 'trecho'])
+    texto = ' '.join(texto.split())
+    if len(texto) < 3 or not USAR_INDICE_TRIGRAMAS or not os.path.exists(DB_PATH):
+        return vazio
+    # Uma frase entre aspas no índice de trigramas equivale a procurar o trecho, sem diferenciar maiúsculas
+    sql, params = "cursos_trigramas MATCH ?", ['"' + texto.replace('"', '""') + '"']
+    if trilhas is not None:
+        sql += " AND c.trilha_nome IN (SELECT value FROM json_each(?))"
+        params.append(json.dumps(list(trilhas)))
+    sql_query = f"""
+    SELECT {_colunas_listagem('NULL')}, c.aula_nome AS aula_nome_destacado, NULL AS trecho
+    FROM cursos AS c JOIN cursos_trigramas ON c.aula_id = cursos_trigramas.rowid
+    WHERE {sql}
+    ORDER BY c.aula_id
+    LIMIT ?
+    """
+    try:
+        return pd.read_sql_query(sql_query, _conexao(), params=params + [limite or TAMANHO_PAGINA_PADRAO])
+    except (pd.io.sql.DatabaseError, sqlite3.Error): return vazio
+
+# --- Listagem paginada do explorador ---
+# As páginas são percorridas por chave (keyset): cada página começa depois da última linha da anterior,
+# então o custo de uma página não depende de quantas vêm antes. Sem busca a ordem é a do 'aula_id';
+# com busca, a da relevância (bm25 com `PESOS_BM25`, desempatado pelo 'aula_id'). Só se chega a uma página
+# pela anterior (ou voltando a uma já vista, cuja chave quem chama guardou): não há salto por OFFSET.
+
+# O status de conclusão não faz parte da listagem: é de cada aprendiz (ver `get_lesson_progress`), e assim as
+# buscas em cache servem a todos
+COLUNAS_LISTAGEM = ['aula_id', 'trilha_nome', 'curso_nome', 'modulo_nome', 'aula_nome', 'aula_link']
+TAMANHO_PAGINA_PADRAO = 50
+_INDICADORES_DE_CORPO = ['tem_sumario', 'tem_conteudo_html']
+
+def _consulta_listagem(trilhas, busca, pesos=None, ja_normalizada=False):
+    """
+    Monta o FROM/WHERE da listagem. Retorna (sql, parâmetros, ordem), ou None se a busca não tiver termos.
+    Com busca, o primeiro item da ordem é a expressão do bm25.
+    """
+    condicoes, params = [], []
+    if busca:
+        fts_query = busca if ja_normalizada else _consulta_fts(busca)
+        if fts_query is None:
+            return None
+        sql = "FROM cursos AS c JOIN cursos_fts ON c.aula_id = cursos_fts.rowid"
+        condicoes.append("cursos_fts MATCH ?")
+        params.append(fts_query)
+        ordem = (_expressao_rank(pesos), 'c.aula_id')
+    else:
+        sql = "FROM cursos AS c"
+        ordem = ('c.aula_id',)
+    if trilhas is not None:
+        # A lista de trilhas vai como um único parâmetro JSON, sem limite de variáveis na consulta
+        condicoes.append("c.trilha_nome IN (SELECT value FROM json_each(?))")
+        params.append(json.dumps(list(trilhas)))
+    if condicoes:
+        sql += " WHERE " + " AND ".join(condicoes)
+    return sql, params, ordem
+
+def _colunas_listagem(rank=None):
+    colunas = [f'c.{coluna}' for coluna in COLUNAS_LISTAGEM]
+    colunas += [f"COALESCE(TRIM(c.{coluna}), '') <> '' AS tem_{coluna[5:]}" for coluna in ('aula_sumario', 'aula_conteudo_html')]
+    if rank:
+        colunas.append(f'{rank} AS rank')
+    return ', '.join(colunas)
+
+def list_lessons_page(trilhas=None, busca=None, apos=None, tamanho=TAMANHO_PAGINA_PADRAO):
+    """
+    Uma página da listagem de aulas, só com as `COLUNAS_LISTAGEM`, os indicadores 'tem_sumario' e
+    'tem_conteudo_html' (para saber se há o que abrir com `get_lesson_body`) e 'rank' quando há busca.
+    `trilhas` None não filtra; `apos` é a chave da última linha da página anterior: o 'aula_id' ou, com busca, ('rank', 'aula_id').
+    """
+    vazio = pd.DataFrame(columns=COLUNAS_LISTAGEM + _INDICADORES_DE_CORPO + (['rank'] if busca else []))
+    if not os.path.exists(DB_PATH): return vazio
+    consulta = _consulta_listagem(trilhas, busca)
+    if consulta is None: return vazio
+    sql, params, ordem = consulta
+    if apos is not None:
+        # Comparação de valores de linha: (rank, aula_id) > (?, ?) ou aula_id > ?
+        chave = apos if isinstance(apos, (tuple, list)) else (apos,)
+        sql += (" AND " if " WHERE " in sql else " WHERE ") + f"({', '.join(ordem)}) > ({', '.join('?' * len(ordem))})"
+        params = params + list(chave)
+    sql = f"SELECT {_colunas_listagem(ordem[0] if busca else None)} {sql} ORDER BY {', '.join(ordem)} LIMIT ?"
+    try:
+        return pd.read_sql_query(sql, _conexao(), params=params + [tamanho])
+    except (pd.io.sql.DatabaseError, sqlite3.Error): return vazio
+
+def count_lessons(trilhas=None, busca=None, pesos=None):
+    """
+    Total de aulas da listagem e, com busca, o melhor e o pior 'rank' (para a escala de relevância):
+    {'total', 'rank_min', 'rank_max'}. Fica no mesmo cache das buscas.
+    """
+    resultado = {'total': 0, 'rank_min': None, 'rank_max': None}
+    if not os.path.exists(DB_PATH): return resultado
+    fts_query = _consulta_fts(busca) if busca else None
+    if busca and fts_query is None: return resultado
+    try:
+        return dict(_contar(
+            fts_query, tuple(sorted(trilhas)) if trilhas is not None else None,
+            tuple(sorted((pesos or {}).items())), data_generation('cursos')
+        ))
+    except sqlite3.Error:
+        return resultado
+
+@functools.lru_cache(maxsize=BUSCAS_EM_CACHE)
+def _contar(fts_query, trilhas, pesos, geracao):
+    sql, params, ordem = _consulta_listagem(trilhas, fts_query, dict(pesos), ja_normalizada=True)
+    # O bm25 não pode ser chamado dentro de uma agregação: o rank é calculado em uma CTE materializada
+    # (uma subconsulta comum seria achatada de volta na agregação pelo SQLite)
+    rank = ordem[0] if fts_query else 'NULL'
+    total, rank_min, rank_max = _conexao().execute(
+        f"WITH resultados AS MATERIALIZED (SELECT {rank} AS rank {sql}) SELECT COUNT(*), MIN(rank), MAX(rank) FROM resultados",
+        params
+    ).fetchone()
+    return {'total': total, 'rank_min': rank_min, 'rank_max': rank_max}
+
+# O sumário e o HTML das aulas só saem do banco quando alguém abre a aula. Um LRU limitado guarda os
+# últimos abertos; a geração de 'cursos' entra na chave, então uma nova raspagem invalida o que estava guardado.
+AULAS_EM_CACHE = 256
+
+@functools.lru_cache(maxsize=AULAS_EM_CACHE)
+def _corpo_da_aula(aula_id, geracao):
+    return _conexao().execute(
+        "SELECT aula_sumario, aula_conteudo_html FROM cursos WHERE aula_id = ?", (aula_id,)
+    ).fetchone()
+
+def get_lesson_body(aula_id):
+    """Retorna (aula_sumario, aula_conteudo_html) da aula, ou None se ela não existir."""
+    if not os.path.exists(DB_PATH): return None
+    return _corpo_da_aula(int(aula_id), data_generation('cursos'))
+def load_table_to_df(table_name, limite=None, colunas=None):
+    """Carrega a tabela (ou só as `colunas` pedidas, para não trazer o conteúdo das aulas quando ele não é usado)."""
     if not os.path.exists(DB_PATH): return pd.DataFrame()
     try:
-        conn = sqlite3.connect(DB_PATH)
-        df = pd.read_sql_query(f"SELECT * FROM {table_name}", conn)
-        conn.close()
-        return df
+        projecao = ', '.join(f'"{coluna}"' for coluna in colunas) if colunas else '*'
+        sql = f"SELECT {projecao} FROM {table_name}" + (" LIMIT ?" if limite is not None else "")
+        return pd.read_sql_query(sql, _conexao(), params=(limite,) if limite is not None else None)
     except pd.io.sql.DatabaseError: return pd.DataFrame()
 def table_exists_and_has_data(table_name):
-    return not load_table_to_df(table_name).empty
\ No newline at end of file
+    """Responde pelos metadados, sem ler a tabela; tabelas sem contagem em 'meta' são testadas com LIMIT 1."""
+    linhas = get_meta().get(f'linhas_{table_name}')
+    if linhas is not None:
+        return linhas > 0
+    return not load_table_to_df(table_name, limite=1).empty
@@ -0,0 +1,118 @@
+# modules/db_connection.py
+
+import sqlite3
+import threading
+import weakref
+from contextlib import contextmanager
+
+# Ajustes aplicados a toda conexão nova. Em WAL os leitores não esperam pelo escritor (e vice-versa),
+# e synchronous=NORMAL é seguro nesse modo: só os checkpoints fazem fsync.
+PRAGMAS = (
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA busy_timeout = 30000",      # ms esperando um escritor antes de 'database is locked'
+    "PRAGMA cache_size = -65536",       # 64 MB de cache de páginas por conexão
+    "PRAGMA mmap_size = 268435456",     # 256 MB do arquivo lidos por mmap
+    "PRAGMA temp_store = MEMORY",
+)
+INSTRUCOES_PREPARADAS = 256             # instruções compiladas guardadas por conexão
+MAX_CONEXOES_OCIOSAS = 8                # conexões guardadas por banco à espera da próxima thread
+
+_por_thread = threading.local()
+_ociosas = {}                           # {caminho: [conexões devolvidas por threads que terminaram]}
+_ociosas_lock = threading.Lock()
+
+class _Emprestimo:
+    """Conexões em uso por uma thread. Quando a thread termina, o objeto é coletado e elas voltam ao pool."""
+    def __init__(self):
+        self.conexoes = {}
+        weakref.finalize(self, _devolver, self.conexoes)
+
+def _devolver(conexoes):
+    for caminho, conn in conexoes.items():
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            conn.close()
+            continue
+        with _ociosas_lock:
+            livres = _ociosas.setdefault(caminho, [])
+            if len(livres) < MAX_CONEXOES_OCIOSAS:
+                livres.append(conn)
+                continue
+        conn.close()
+    conexoes.clear()
+
+def _abrir(caminho):
+    with _ociosas_lock:
+        livres = _ociosas.get(caminho)
+        if livres:
+            return livres.pop()
+    # Sem afinidade de thread: a conexão passa de uma thread para outra pelo pool, nunca é usada por duas ao mesmo tempo
+    conn = sqlite3.connect(
+        caminho, timeout=30, isolation_level=None, cached_statements=INSTRUCOES_PREPARADAS, check_same_thread=False
+    )
+    for pragma in PRAGMAS:
+        conn.execute(pragma)
+    return conn
+
+def conexao(caminho):
+    """
+    Conexão da thread atual para o banco em `caminho`, tirada do pool (ou criada) na primeira chamada.
+
+    As conexões ficam em modo autocommit (isolation_level=None): escritas que precisam ser
+    atômicas usam `transacao`. Cada thread fica com a mesma conexão até terminar; então ela volta
+    ao pool e é reaproveitada pela próxima thread (o Streamlit roda cada execução da página numa
+    thread nova). Assim os PRAGMAs são aplicados uma vez por conexão e o cache de instruções
+    preparadas do `sqlite3` vale entre as execuções.
+    """
+    emprestimo = _por_thread.__dict__.get('emprestimo')
+    if emprestimo is None:
+        emprestimo = _por_thread.emprestimo = _Emprestimo()
+    conn = emprestimo.conexoes.get(caminho)
+    if conn is None:
+        conn = emprestimo.conexoes[caminho] = _abrir(caminho)
+    return conn
+
+@contextmanager
+def transacao(caminho):
+    """
+    Abre uma transação de escrita (BEGIN IMMEDIATE) na conexão da thread e entrega um cursor:
+    COMMIT ao sair normalmente, ROLLBACK se houver exceção. Dentro de outra transação, vira um SAVEPOINT.
+    """
+    conn = conexao(caminho)
+    cursor = conn.cursor()
+    if conn.in_transaction:
+        cursor.execute("SAVEPOINT transacao_interna")
+        try:
+            yield cursor
+        except BaseException:
+            cursor.execute("ROLLBACK TO transacao_interna")
+            cursor.execute("RELEASE transacao_interna")
+            raise
+        cursor.execute("RELEASE transacao_interna")
+        return
+    cursor.execute("BEGIN IMMEDIATE")
+    try:
+        yield cursor
+    except BaseException:
+        cursor.execute("ROLLBACK")
+        raise
+    cursor.execute("COMMIT")
+
+def fechar_conexoes():
+    """
+    Fecha as conexões da thread atual e as ociosas do pool (por exemplo, antes de apagar ou substituir
+    o arquivo do banco). Conexões em uso por outras threads voltam ao pool normalmente quando elas terminam.
+    """
+    emprestimo = _por_thread.__dict__.pop('emprestimo', None)
+    if emprestimo is not None:
+        for conn in emprestimo.conexoes.values():
+            conn.close()
+        emprestimo.conexoes.clear()
+    with _ociosas_lock:
+        for livres in _ociosas.values():
+            for conn in livres:
+                conn.close()
+        _ociosas.clear()
@@ -0,0 +1,313 @@
+# modules/html_extract.py
+
+import hashlib
+import json
+import multiprocessing
+import os
+import sys
+import time
+import zlib
+from html import unescape
+from html.parser import HTMLParser
+from concurrent.futures import ProcessPoolExecutor
+from bs4 import BeautifulSoup
+from bs4.dammit import EntitySubstitution
+
+# O scraper só precisa de poucos atributos de cada documento: o csrf-token, os 'wire:initial-data'
+# dos componentes Livewire e, nos itens de aula, 'wire:key', 'x-data' e o texto visível.
+# Os extratores abaixo devolvem exatamente isso, lendo cada documento uma única vez.
+
+class DocumentoLivewire:
+    """Resultado da leitura de um documento: csrf-token, 'wire:initial-data' das divs e itens de aula (wire:key, x-data, texto)."""
+    __slots__ = ('csrf_token', 'initial_data', 'itens_aula')
+
+    def __init__(self, csrf_token, initial_data, itens_aula):
+        self.csrf_token = csrf_token
+        self.initial_data = initial_data
+        self.itens_aula = itens_aula
+
+    def como_tupla(self):
+        return (self.csrf_token, self.initial_data, self.itens_aula)
+
+def _eh_item_de_aula(wire_key):
+    return bool(wire_key) and 'lesson.' in wire_key
+
+class ExtratorBeautifulSoup:
+    """Implementação de referência: a mesma árvore `html.parser` que o scraper sempre montou."""
+    nome = 'beautifulsoup'
+
+    def analisar(self, html):
+        soup = BeautifulSoup(html, 'html.parser')
+        meta = soup.find('meta', {'name': 'csrf-token'})
+        csrf_token = meta.get('content') if meta else None
+        initial_data = [div['wire:initial-data'] for div in soup.find_all("div", attrs={"wire:initial-data": True})]
+        itens_aula = [
+            (li["wire:key"], li.get('x-data', '{}'), li.get_text(' ', strip=True))
+            for li in soup.find_all("li", attrs={"wire:key": _eh_item_de_aula})
+        ]
+        return DocumentoLivewire(csrf_token, initial_data, itens_aula)
+
+# Tags vazias (sem fechamento) e tags cujo texto o BeautifulSoup não considera em get_text()
+_TAGS_VAZIAS = {
+    'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'keygen', 'link', 'menuitem',
+    'meta', 'param', 'source', 'track', 'wbr', 'basefont', 'bgsound', 'command', 'frame',
+    'image', 'isindex', 'nextid', 'spacer',
+}
+_TAGS_SEM_TEXTO = {'script', 'style', 'template', 'rt', 'rp'}
+
+class _LeitorStreaming(HTMLParser):
+    def __init__(self):
+        # Referências no texto são resolvidas como no BeautifulSoup (handle_charref/handle_entityref)
+        super().__init__(convert_charrefs=False)
+        self.csrf_token = None
+        self.initial_data = []
+        self.itens_aula = []
+        self._pilha = []              # tags abertas, como na árvore do BeautifulSoup
+        self._sem_texto = 0           # quantas tags de _TAGS_SEM_TEXTO estão abertas
+        self._itens_abertos = []      # (posição na pilha, índice em itens_aula, textos)
+        self._texto = []
+
+    def _fechar_texto(self):
+        if self._texto:
+            if self._itens_abertos and not self._sem_texto:
+                texto = ''.join(self._texto).strip()
+                if texto:
+                    for _, _, textos in self._itens_abertos:
+                        textos.append(texto)
+            self._texto = []
+
+    def handle_starttag(self, tag, attrs):
+        self._fechar_texto()
+        if tag == 'div' or tag == 'li' or tag == 'meta':
+            atributos = {nome: ('' if valor is None else valor) for nome, valor in attrs}
+            if tag == 'div' and 'wire:initial-data' in atributos:
+                self.initial_data.append(atributos['wire:initial-data'])
+            elif tag == 'meta' and self.csrf_token is None and atributos.get('name') == 'csrf-token':
+                self.csrf_token = atributos.get('content')
+            elif tag == 'li' and _eh_item_de_aula(atributos.get('wire:key')):
+                self.itens_aula.append((atributos['wire:key'], atributos.get('x-data', '{}')))
+                self._itens_abertos.append((len(self._pilha), len(self.itens_aula) - 1, []))
+        if tag in _TAGS_VAZIAS:
+            return
+        self._pilha.append(tag)
+        if tag in _TAGS_SEM_TEXTO:
+            self._sem_texto += 1
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs)
+        if tag not in _TAGS_VAZIAS:
+            self.handle_endtag(tag)
+
+    def handle_endtag(self, tag):
+        self._fechar_texto()
+        if tag not in self._pilha:
+            return
+        # Como o BeautifulSoup: fecha tudo até a última tag aberta com esse nome
+        while self._pilha:
+            aberta = self._pilha.pop()
+            if aberta in _TAGS_SEM_TEXTO:
+                self._sem_texto -= 1
+            while self._itens_abertos and self._itens_abertos[-1][0] >= len(self._pilha):
+                _, indice, textos = self._itens_abertos.pop()
+                self.itens_aula[indice] += (' '.join(textos),)
+            if aberta == tag:
+                break
+
+    def handle_data(self, data):
+        self._texto.append(data)
+
+    def handle_charref(self, name):
+        self._texto.append(unescape(f'&#{name};'))
+
+    def handle_entityref(self, name):
+        self._texto.append(EntitySubstitution.HTML_ENTITY_TO_CHARACTER.get(name, f'&{name}'))
+
+    def handle_comment(self, data):
+        self._fechar_texto()
+
+    def handle_decl(self, decl):
+        self._fechar_texto()
+
+    def handle_pi(self, data):
+        self._fechar_texto()
+
+    def unknown_decl(self, data):
+        self._fechar_texto()
+
+    def close(self):
+        super().close()
+        self._fechar_texto()
+        while self._itens_abertos:
+            _, indice, textos = self._itens_abertos.pop()
+            self.itens_aula[indice] += (' '.join(textos),)
+
+class ExtratorStreaming:
+    """
+    Lê o documento em uma única passada com o tokenizador do `html.parser`, sem montar a árvore:
+    guarda só os atributos que interessam e o texto dos itens de aula.
+    """
+    nome = 'streaming'
+
+    def analisar(self, html):
+        leitor = _LeitorStreaming()
+        leitor.feed(html)
+        leitor.close()
+        return DocumentoLivewire(leitor.csrf_token, leitor.initial_data, leitor.itens_aula)
+
+EXTRATORES = {extrator.nome: extrator for extrator in (ExtratorBeautifulSoup(), ExtratorStreaming())}
+_extrator_atual = EXTRATORES['streaming']
+
+def definir_extrator(nome):
+    """Escolhe a implementação usada por `analisar` ('streaming' ou 'beautifulsoup')."""
+    global _extrator_atual
+    _extrator_atual = EXTRATORES[nome]
+
+def analisar(html):
+    return _extrator_atual.analisar(html)
+
+# --- Análise das respostas do scraper ---
+# Funções puras (texto -> estruturas simples) executadas no pool de processos do scraper,
+# fora das threads de I/O. Por isso ficam neste módulo leve, importado pelos processos filhos.
+
+def componentes_modulos(initial_data):
+    """Filtra, entre os 'wire:initial-data' de um documento, os dados de inicialização dos componentes de módulo."""
+    dados_dos_modulos = []
+    for bruto in initial_data:
+        try:
+            dados = json.loads(unescape(bruto))
+            if dados.get('fingerprint', {}).get('name') == 'v2.portal.course-module-card':
+                id_modulo = dados.get('serverMemo', {}).get('dataMeta', {}).get('models', {}).get('module', {}).get('id')
+                if id_modulo:
+                    dados['id_modulo'] = id_modulo
+                    dados_dos_modulos.append(dados)
+        except Exception:
+            pass
+    return dados_dos_modulos
+
+def componente_aula_ativa(initial_data):
+    for bruto in initial_data:
+        dados = json.loads(unescape(bruto))
+        if dados.get('fingerprint', {}).get('name') == 'v2.portal.active-lesson-component':
+            return dados
+    return None
+
+def impressao_digital_aula(texto_do_item):
+    """
+    Gera a impressão digital de uma aula a partir do texto visível do seu item na lista do módulo. Ela não cobre o
+    corpo, o sumário nem o slug da aula (que só vêm no 'loadLesson'); o conteúdo vence com o tempo em vez disso
+    (ver `database_manager.load_lesson_fingerprints`).
+    """
+    return hashlib.sha1(texto_do_item.encode('utf-8')).hexdigest()
+
+def aulas_com_status(itens_aula):
+    """Converte os itens de aula (wire:key, x-data, texto) em {'id', 'concluida', 'fingerprint'}."""
+    aulas = []
+    for wire_key, x_data, texto in itens_aula:
+        try:
+            lesson_id = int(wire_key.split("lesson.")[1])
+            status_concluida = "finished:true" in x_data.replace(" ", "").replace("\n", "")
+            fingerprint = impressao_digital_aula(texto)
+            aulas.append({'id': lesson_id, 'concluida': status_concluida, 'fingerprint': fingerprint})
+        except (ValueError, IndexError):
+            continue
+    return aulas
+
+def analisar_pagina_curso(texto):
+    """Página do curso -> (csrf-token, dados do componente learning-center ou None)."""
+    documento = analisar(texto)
+    if not documento.initial_data:
+        return documento.csrf_token, None
+    return documento.csrf_token, json.loads(unescape(documento.initial_data[0]))
+
+def analisar_resposta_init(texto):
+    """Resposta da chamada 'init' -> (componentes de módulo, componente da aula ativa), ou None se vier vazia ou inválida."""
+    try:
+        html = json.loads(texto).get('effects', {}).get('html', '')
+        if not html:
+            return None
+        documento = analisar(html)
+        return componentes_modulos(documento.initial_data), componente_aula_ativa(documento.initial_data)
+    except Exception:
+        return None
+
+def analisar_resposta_modulo(texto):
+    """Resposta do 'loadLessons' -> lista de aulas com status, ou None se a resposta for inválida."""
+    try:
+        html = json.loads(texto).get('effects', {}).get('html', '')
+    except (ValueError, AttributeError):
+        return None
+    return aulas_com_status(analisar(html).itens_aula)
+
+def analisar_resposta_aula(texto):
+    """Resposta do 'loadLesson' -> detalhes da aula emitidos em 'setActiveLesson', ou None."""
+    try:
+        for emit in json.loads(texto).get('effects', {}).get('emits', []):
+            if emit.get('event') == 'setActiveLesson':
+                return emit['params'][0]
+    except (ValueError, AttributeError, LookupError):
+        pass
+    return None
+
+def html_para_texto(html):
+    """Texto visível do conteúdo de uma aula, como o banco sempre guardou para a busca."""
+    if not html:
+        return ''
+    return BeautifulSoup(html, 'html.parser').get_text(separator=' ', strip=True)
+
+def pool_de_processos(processos):
+    """
+    Pool de `processos` processos para as funções deste módulo (o estágio de análise do scraper e o
+    normalizador de conteúdo). Usa 'spawn', que evita herdar, via fork, locks presos pelas threads do
+    Streamlit e do scraper.
+    """
+    return ProcessPoolExecutor(max_workers=processos, mp_context=multiprocessing.get_context('spawn'))
+
+# --- Micro-benchmark ---
+
+def documentos_do_cache(diretorio):
+    """Lê as respostas gravadas pelo `http_cache` e devolve os documentos HTML (páginas e 'effects.html' do Livewire)."""
+    documentos = []
+    for raiz, _, arquivos in os.walk(diretorio):
+        for arquivo in arquivos:
+            if arquivo == 'indice.db':
+                continue
+            try:
+                with open(os.path.join(raiz, arquivo), 'rb') as f:
+                    corpo = zlib.decompress(f.read()).decode('utf-8')
+            except (OSError, zlib.error, UnicodeDecodeError):
+                continue
+            try:
+                html = json.loads(corpo).get('effects', {}).get('html')
+            except (ValueError, AttributeError):
+                html = corpo
+            if html:
+                documentos.append(html)
+    return documentos
+
+def benchmark(documentos, repeticoes=3):
+    """
+    Mede cada extrator nos documentos recebidos e confere se todos produzem o mesmo resultado
+    que o BeautifulSoup. Retorna {nome: segundos por passada} e a lista de documentos divergentes.
+    """
+    referencia = [EXTRATORES['beautifulsoup'].analisar(html).como_tupla() for html in documentos]
+    tempos, divergentes = {}, []
+    for nome, extrator in EXTRATORES.items():
+        inicio = time.perf_counter()
+        for _ in range(repeticoes):
+            resultados = [extrator.analisar(html).como_tupla() for html in documentos]
+        tempos[nome] = (time.perf_counter() - inicio) / repeticoes
+        divergentes += [(nome, indice) for indice, resultado in enumerate(resultados) if resultado != referencia[indice]]
+    return tempos, divergentes
+
+if __name__ == '__main__':
+    # Uso: python -m modules.html_extract [diretório do cache HTTP]
+    from .http_cache import DIRETORIO_CACHE
+    documentos = documentos_do_cache(sys.argv[1] if len(sys.argv) > 1 else DIRETORIO_CACHE)
+    if not documentos:
+        sys.exit("Nenhum documento gravado no cache. Rode o scraper com o cache ligado primeiro.")
+    tamanho_mb = sum(len(html) for html in documentos) / 1024 ** 2
+    tempos, divergentes = benchmark(documentos)
+    print(f"{len(documentos)} documentos, {tamanho_mb:.1f} MB")
+    for nome, segundos in tempos.items():
+        print(f"  {nome:>14}: {segundos * 1000:8.1f} ms por passada ({tamanho_mb / segundos:6.1f} MB/s)")
+    print(f"  divergências em relação ao BeautifulSoup: {len(divergentes)}")
@@ -0,0 +1,188 @@
+# modules/http_cache.py
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+import requests
+
+DIRETORIO_CACHE = 'dados/cache_http'
+TTL_PADRAO = 7 * 24 * 60 * 60          # 7 dias, em segundos
+TAMANHO_MAXIMO_PADRAO = 1024 ** 3      # 1 GB em disco
+# Chamadas Livewire cujo resultado não depende do estado do aprendiz e podem ser reaproveitadas online:
+# o corpo de uma aula ('loadLesson'). Página de conteúdos, páginas dos cursos (com o csrf-token) e 'loadLessons'
+# (com o status de conclusão) sempre vão à plataforma; ficam no cache só para o reprocessamento offline.
+METODOS_REAPROVEITAVEIS = frozenset({'loadLesson'})
+
+class CacheHTTP:
+    """
+    Cache em disco das respostas da plataforma, com validade (TTL) e limite de tamanho.
+
+    Cada resposta fica comprimida em um arquivo próprio; um índice SQLite guarda a chave, o tamanho
+    e o último acesso. Quando o total passa de `tamanho_maximo`, as entradas menos usadas
+    recentemente são apagadas (LRU).
+    """
+    def __init__(self, diretorio=DIRETORIO_CACHE, ttl=TTL_PADRAO, tamanho_maximo=TAMANHO_MAXIMO_PADRAO):
+        self.diretorio = diretorio
+        self.ttl = ttl
+        self.tamanho_maximo = tamanho_maximo
+        self._lock = threading.Lock()
+        os.makedirs(diretorio, exist_ok=True)
+        self._conn = sqlite3.connect(os.path.join(diretorio, 'indice.db'), check_same_thread=False)
+        self._conn.execute('''
+        CREATE TABLE IF NOT EXISTS respostas (
+            chave TEXT PRIMARY KEY, arquivo TEXT, tamanho INTEGER, criado_em REAL, acessado_em REAL
+        )''')
+        self._conn.commit()
+
+    def _caminho(self, chave):
+        return os.path.join(self.diretorio, chave[:2], chave)
+
+    def obter(self, chave, ignorar_ttl=False):
+        """Retorna o corpo guardado para a chave, ou None se não existir ou estiver vencido."""
+        with self._lock:
+            linha = self._conn.execute("SELECT arquivo, criado_em FROM respostas WHERE chave = ?", (chave,)).fetchone()
+            if not linha:
+                return None
+            arquivo, criado_em = linha
+            if not ignorar_ttl and time.time() - criado_em > self.ttl:
+                self._remover(chave, arquivo)
+                self._conn.commit()
+                return None
+            try:
+                with open(arquivo, 'rb') as f:
+                    corpo = zlib.decompress(f.read())
+            except (OSError, zlib.error):
+                self._remover(chave, arquivo)
+                self._conn.commit()
+                return None
+            self._conn.execute("UPDATE respostas SET acessado_em = ? WHERE chave = ?", (time.time(), chave))
+            self._conn.commit()
+            return corpo
+
+    def guardar(self, chave, corpo):
+        dados = zlib.compress(corpo)
+        arquivo = self._caminho(chave)
+        os.makedirs(os.path.dirname(arquivo), exist_ok=True)
+        with self._lock:
+            with open(arquivo, 'wb') as f:
+                f.write(dados)
+            agora = time.time()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO respostas VALUES (?, ?, ?, ?, ?)",
+                (chave, arquivo, len(dados), agora, agora)
+            )
+            self._despejar()
+            self._conn.commit()
+
+    def limpar(self):
+        with self._lock:
+            for chave, arquivo in self._conn.execute("SELECT chave, arquivo FROM respostas").fetchall():
+                self._remover(chave, arquivo)
+            self._conn.commit()
+
+    def tamanho_total(self):
+        with self._lock:
+            return self._conn.execute("SELECT COALESCE(SUM(tamanho), 0) FROM respostas").fetchone()[0]
+
+    def _remover(self, chave, arquivo):
+        self._conn.execute("DELETE FROM respostas WHERE chave = ?", (chave,))
+        try:
+            os.remove(arquivo)
+        except OSError:
+            pass
+
+    def _despejar(self):
+        """Apaga as entradas usadas há mais tempo até o cache voltar a caber no limite."""
+        total = self._conn.execute("SELECT COALESCE(SUM(tamanho), 0) FROM respostas").fetchone()[0]
+        if total <= self.tamanho_maximo:
+            return
+        for chave, arquivo, tamanho in self._conn.execute(
+            "SELECT chave, arquivo, tamanho FROM respostas ORDER BY acessado_em"
+        ).fetchall():
+            if total <= self.tamanho_maximo:
+                break
+            self._remover(chave, arquivo)
+            total -= tamanho
+
+def chave_livewire(url, payload, escopo=''):
+    """
+    Chave de uma chamada Livewire: endpoint + fingerprint do componente (sem o id aleatório da
+    renderização) + modelos do componente + métodos e parâmetros chamados.
+    """
+    fingerprint = payload.get('fingerprint', {})
+    componente = [fingerprint.get('name'), fingerprint.get('path'), fingerprint.get('locale')]
+    modelos = payload.get('serverMemo', {}).get('dataMeta', {})
+    chamadas = [
+        [update.get('payload', {}).get('method'), update.get('payload', {}).get('params')]
+        for update in payload.get('updates', [])
+    ]
+    bruto = json.dumps([escopo, url, componente, modelos, chamadas], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(bruto.encode('utf-8')).hexdigest()
+
+def metodos_livewire(payload):
+    return {update.get('payload', {}).get('method') for update in payload.get('updates', [])}
+
+def chave_get(url, escopo=''):
+    bruto = json.dumps([escopo, 'GET', url], ensure_ascii=False)
+    return hashlib.sha256(bruto.encode('utf-8')).hexdigest()
+
+def _resposta_do_cache(url, corpo):
+    resposta = requests.Response()
+    resposta.status_code = 200
+    resposta.url = url
+    resposta.encoding = 'utf-8'
+    resposta._content = corpo
+    return resposta
+
+class SessaoComCache:
+    """
+    Envolve a sessão autenticada do scraper e grava as respostas de sucesso no `CacheHTTP`.
+
+    Online, só as chamadas Livewire cujos métodos estão todos em `reaproveitar` são atendidas pelo cache
+    (por padrão o 'loadLesson', de conteúdo estável); o resto vai sempre à plataforma e só é gravado.
+    As chaves levam o `escopo` (a conta autenticada), para que um aprendiz nunca receba respostas de outro.
+    Com `offline=True` nenhuma requisição chega à plataforma: as respostas vêm do cache mesmo vencidas,
+    e uma chave ausente vira `requests.ConnectionError`, tratada pelo scraper como qualquer falha de rede.
+    Assim a extração e a carga no banco podem ser refeitas a partir das respostas gravadas.
+    """
+    def __init__(self, session, cache, offline=False, escopo='', reaproveitar=METODOS_REAPROVEITAVEIS):
+        self.session = session
+        self.cache = cache
+        self.offline = offline
+        self.escopo = escopo
+        self.reaproveitar = frozenset(reaproveitar)
+        self.acertos = 0
+        self.faltas = 0
+
+    def __getattr__(self, nome):
+        # Atributos que o cache não conhece (headers, estatisticas...) vêm da sessão envolvida
+        return getattr(self.session, nome)
+
+    def get(self, url, **kwargs):
+        return self._requisitar(chave_get(url, self.escopo), False, url, self.session.get, url, **kwargs)
+
+    def post(self, url, **kwargs):
+        payload = kwargs.get('json')
+        if payload is None:
+            return self.session.post(url, **kwargs)
+        metodos = metodos_livewire(payload)
+        reaproveitavel = bool(metodos) and metodos <= self.reaproveitar
+        return self._requisitar(chave_livewire(url, payload, self.escopo), reaproveitavel, url, self.session.post, url, **kwargs)
+
+    def _requisitar(self, chave, reaproveitavel, url, metodo, *args, **kwargs):
+        if self.offline or reaproveitavel:
+            corpo = self.cache.obter(chave, ignorar_ttl=self.offline)
+            if corpo is not None:
+                self.acertos += 1
+                return _resposta_do_cache(url, corpo)
+            self.faltas += 1
+        if self.offline:
+            raise requests.exceptions.ConnectionError(f"Resposta não encontrada no cache (modo offline): {url}")
+        resposta = metodo(*args, **kwargs)
+        if 200 <= resposta.status_code < 300:
+            self.cache.guardar(chave, resposta.content)
+        return resposta
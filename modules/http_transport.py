@@ -0,0 +1,218 @@
+# modules/http_transport.py
+
+import threading
+import time
+from collections import deque
+from email.utils import parsedate_to_datetime
+import requests
+from requests.adapters import HTTPAdapter
+
+MAX_CONEXOES_PADRAO = 32          # teto de requisições simultâneas (e de workers HTTP do scraper)
+CONCORRENCIA_INICIAL = 8          # ponto de partida do controle adaptativo
+TAXA_MAXIMA_PADRAO = None         # requisições por segundo; None = sem teto fixo
+TENTATIVAS_PADRAO = 3             # novas tentativas depois da primeira falha
+BACKOFF_PADRAO = 0.5              # segundos; dobra a cada nova tentativa
+TIMEOUT_PADRAO = 60
+STATUS_PARA_RETENTAR = {429, 500, 502, 503, 504}
+
+class EstatisticasTransporte:
+    """Contadores de uma execução: requisições feitas, quantas precisaram de nova tentativa e quantas se perderam."""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.zerar()
+
+    def zerar(self):
+        with self._lock:
+            self.requisicoes = 0
+            self.retentadas = 0
+            self.tentativas_extras = 0
+            self.perdidas = 0
+
+    def registrar(self, tentativas_extras, perdida):
+        with self._lock:
+            self.requisicoes += 1
+            self.tentativas_extras += tentativas_extras
+            if tentativas_extras:
+                self.retentadas += 1
+            if perdida:
+                self.perdidas += 1
+
+    def resumo(self):
+        with self._lock:
+            return (f"{self.requisicoes} requisições, {self.retentadas} precisaram de nova tentativa "
+                    f"({self.tentativas_extras} tentativas extras), {self.perdidas} perdidas")
+
+def segundos_retry_after(valor):
+    """Converte o cabeçalho Retry-After (segundos ou data HTTP) em segundos de espera."""
+    if not valor:
+        return None
+    try:
+        return max(0.0, float(valor))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(valor).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+class ControladorAdaptativo:
+    """
+    Controla quantas requisições ficam em voo ao mesmo tempo, compartilhado por todas as threads do scraper.
+
+    Segue o esquema AIMD: enquanto a latência se mantém estável o limite cresce aos poucos
+    (+1 a cada `limite` respostas); com 429/5xx, erro de rede ou p95 da latência acima de
+    `limiar_latencia` vezes o melhor p95 observado, o limite cai pela metade (no máximo uma vez
+    por `intervalo_reducao` segundos, para uma rajada de erros não derrubá-lo até o mínimo).
+    Um Retry-After pausa todas as requisições até o prazo pedido, e um balde de fichas
+    (`taxa_maxima` por segundo) impõe um teto fixo de vazão.
+    """
+    def __init__(self, inicial=CONCORRENCIA_INICIAL, minimo=1, maximo=MAX_CONEXOES_PADRAO, taxa_maxima=TAXA_MAXIMA_PADRAO,
+                 janela=50, fator_reducao=0.5, limiar_latencia=2.0, intervalo_reducao=1.0):
+        self.minimo = minimo
+        self.maximo = maximo
+        self.limite = float(min(max(inicial, minimo), maximo))
+        self.taxa_maxima = taxa_maxima
+        self.fator_reducao = fator_reducao
+        self.limiar_latencia = limiar_latencia
+        self.intervalo_reducao = intervalo_reducao
+        self.em_voo = 0
+        self.reducoes = 0
+        self.p95_base = None
+        self._latencias = deque(maxlen=janela)
+        self._pausa_ate = 0.0
+        self._ultima_reducao = 0.0
+        self._fichas = float(taxa_maxima or 0)
+        self._ultima_reposicao = time.monotonic()
+        self._cond = threading.Condition()
+
+    def adquirir(self):
+        """Bloqueia até haver vaga no limite atual, ficha no balde e nenhuma pausa de Retry-After em curso."""
+        with self._cond:
+            while True:
+                agora = time.monotonic()
+                if agora < self._pausa_ate:
+                    self._cond.wait(self._pausa_ate - agora)
+                    continue
+                if self.em_voo >= int(self.limite):
+                    self._cond.wait()
+                    continue
+                espera = self._consumir_ficha(agora)
+                if espera:
+                    self._cond.wait(espera)
+                    continue
+                self.em_voo += 1
+                return
+
+    def liberar(self, latencia, status=None, retry_after=None):
+        """Registra o fim de uma requisição (status None = erro de rede) e ajusta o limite."""
+        with self._cond:
+            agora = time.monotonic()
+            self.em_voo -= 1
+            if retry_after:
+                self._pausa_ate = max(self._pausa_ate, agora + retry_after)
+            if status is None or status == 429 or status >= 500:
+                self._reduzir(agora)
+            else:
+                self._latencias.append(latencia)
+                p95 = self._p95()
+                if p95 is not None:
+                    # A referência acompanha o melhor p95 e sobe devagar, para se adaptar a mudanças duradouras
+                    self.p95_base = p95 if self.p95_base is None else min(p95, self.p95_base * 1.001)
+                if p95 is not None and p95 > self.p95_base * self.limiar_latencia:
+                    self._reduzir(agora)
+                else:
+                    self.limite = min(self.maximo, self.limite + 1 / self.limite)
+            self._cond.notify_all()
+
+    def resumo(self):
+        with self._cond:
+            p95 = self._p95()
+            texto_p95 = f"{p95 * 1000:.0f} ms" if p95 is not None else "n/d"
+            return f"limite de concorrência {int(self.limite)}, p95 {texto_p95}, {self.reducoes} reduções"
+
+    def _p95(self):
+        if len(self._latencias) < 20:
+            return None
+        ordenadas = sorted(self._latencias)
+        return ordenadas[int(0.95 * (len(ordenadas) - 1))]
+
+    def _reduzir(self, agora):
+        if agora - self._ultima_reducao < self.intervalo_reducao:
+            return
+        self.limite = max(float(self.minimo), self.limite * self.fator_reducao)
+        self._ultima_reducao = agora
+        self._latencias.clear()
+        self.reducoes += 1
+
+    def _consumir_ficha(self, agora):
+        """Retira uma ficha do balde; retorna 0 se conseguiu ou quantos segundos faltam para a próxima."""
+        if not self.taxa_maxima:
+            return 0
+        self._fichas = min(float(self.taxa_maxima), self._fichas + (agora - self._ultima_reposicao) * self.taxa_maxima)
+        self._ultima_reposicao = agora
+        if self._fichas >= 1:
+            self._fichas -= 1
+            return 0
+        return (1 - self._fichas) / self.taxa_maxima
+
+def eh_idempotente(method, url):
+    """GETs e as chamadas Livewire de leitura do scraper (init, loadLessons, loadLesson) podem ser repetidas sem efeito colateral."""
+    return method.upper() in ('GET', 'HEAD', 'OPTIONS') or '/livewire/message/' in url
+
+class SessaoResiliente(requests.Session):
+    """
+    Sessão HTTP do scraper: pool de conexões do tamanho do número de workers, keep-alive e
+    compressão (padrões do `requests`) e novas tentativas com backoff exponencial para falhas
+    de rede e respostas 429/5xx em requisições idempotentes. Toda tentativa passa pelo
+    `ControladorAdaptativo` da sessão, que decide quantas podem estar em voo.
+    """
+    def __init__(self, max_conexoes=None, tentativas=None, backoff=None, concorrencia_inicial=None, taxa_maxima=TAXA_MAXIMA_PADRAO):
+        super().__init__()
+        self.max_conexoes = max_conexoes or MAX_CONEXOES_PADRAO
+        self.tentativas = TENTATIVAS_PADRAO if tentativas is None else tentativas
+        self.backoff = BACKOFF_PADRAO if backoff is None else backoff
+        self.estatisticas = EstatisticasTransporte()
+        self.controlador = ControladorAdaptativo(
+            inicial=concorrencia_inicial or CONCORRENCIA_INICIAL, maximo=self.max_conexoes, taxa_maxima=taxa_maxima
+        )
+        self.ajustar_pool(self.max_conexoes)
+
+    def ajustar_pool(self, max_conexoes):
+        """Dimensiona o pool de conexões por host para o número de workers que vão usar a sessão."""
+        self.max_conexoes = max_conexoes
+        if hasattr(self, 'controlador'):
+            self.controlador.maximo = max_conexoes
+        # pool_block=True faz as threads excedentes esperarem por uma conexão livre em vez de abrir e descartar conexões extras
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=max_conexoes, pool_block=True, max_retries=0)
+        self.mount('https://', adapter)
+        self.mount('http://', adapter)
+
+    def request(self, method, url, *args, **kwargs):
+        kwargs.setdefault('timeout', TIMEOUT_PADRAO)
+        tentativas = self.tentativas if eh_idempotente(method, url) else 0
+        for tentativa in range(tentativas + 1):
+            ultima = tentativa == tentativas
+            self.controlador.adquirir()
+            inicio = time.monotonic()
+            status, retry_after = None, None
+            try:
+                resposta = super().request(method, url, *args, **kwargs)
+                status = resposta.status_code
+                retry_after = segundos_retry_after(resposta.headers.get('Retry-After'))
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+                if ultima:
+                    self.estatisticas.registrar(tentativa, perdida=True)
+                    raise
+            else:
+                if resposta.status_code not in STATUS_PARA_RETENTAR or ultima:
+                    self.estatisticas.registrar(tentativa, perdida=resposta.status_code >= 400)
+                    return resposta
+                resposta.close()
+            finally:
+                self.controlador.liberar(time.monotonic() - inicio, status, retry_after)
+            time.sleep(self.backoff * (2 ** tentativa))
+
+def criar_sessao(max_conexoes=None, tentativas=None, backoff=None, concorrencia_inicial=None, taxa_maxima=TAXA_MAXIMA_PADRAO):
+    session = SessaoResiliente(max_conexoes, tentativas, backoff, concorrencia_inicial, taxa_maxima)
+    session.headers.update({'User-Agent': 'Mozilla/5.0'})
+    return session
@@ -0,0 +1,204 @@
+# modules/job_runner.py
+
+import json
+import os
+import signal
+import subprocess
+import sys
+import threading
+import time
+import requests
+from . import database_manager as dbm
+from .authenticator import autenticar_jornadadedados
+from .content_normalizer import NormalizadorDeConteudo
+from .http_cache import CacheHTTP, SessaoComCache, METODOS_REAPROVEITAVEIS
+from .scraper import run_full_scraper, run_incremental_scraper
+from .data_joiner import run_joiner, run_progress_sync
+
+# Raspagem, sincronização do progresso e junção rodam em um processo próprio (`python -m modules.job_runner <id>`),
+# independente da sessão do Streamlit: recarregar a página ou perder a conexão não interrompe o job. O estado,
+# o progresso e o log ficam no banco (ver "Jobs em segundo plano" no `database_manager`), de onde a página os lê.
+
+INTERVALO_BATIMENTO = 2                 # segundos entre os batimentos (e as checagens de cancelamento)
+RAIZ_DO_PROJETO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+class FalhaDoJob(Exception):
+    """Falha esperada de um job (credenciais, página de conteúdos...), com a mensagem para o usuário."""
+
+def abrir_sessao(email, senha, usar_cache, offline, reaproveitar=METODOS_REAPROVEITAVEIS, taxa_maxima=None):
+    """
+    Autentica na plataforma (exceto no modo offline) e coloca o cache HTTP na frente da sessão. As respostas
+    ficam no escopo da conta (`normalize_user(email)`); online, o cache só atende as chamadas em `reaproveitar`.
+    `taxa_maxima` (requisições por segundo, None para nenhuma) é o teto fixo de vazão do `ControladorAdaptativo`.
+    """
+    escopo = dbm.normalize_user(email)
+    if offline:
+        return SessaoComCache(requests.Session(), CacheHTTP(), offline=True, escopo=escopo)
+    session = autenticar_jornadadedados(email, senha, taxa_maxima=taxa_maxima)
+    if session and usar_cache:
+        return SessaoComCache(session, CacheHTTP(), escopo=escopo, reaproveitar=reaproveitar)
+    return session
+
+def trava_do_job(tipo, usuario):
+    """A raspagem atualiza o catálogo compartilhado: uma por instalação. Os demais jobs são um por aprendiz."""
+    return tipo if tipo == 'raspagem' else f'{tipo}:{usuario}'
+
+def iniciar_job(tipo, usuario=dbm.USUARIO_PADRAO, parametros=None, credenciais=None):
+    """
+    Registra o job e dispara o processo que o executa. As `credenciais` ({'email', 'senha'}) vão pela entrada
+    padrão do processo e nunca são gravadas. Se já houver um job ativo com a mesma trava, nada é disparado.
+    Retorna (job, criado), como `database_manager.create_job`.
+    """
+    job, criado = dbm.create_job(tipo, trava_do_job(tipo, usuario), usuario, parametros)
+    if not criado:
+        return job, criado
+    ambiente = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [RAIZ_DO_PROJETO, os.environ.get('PYTHONPATH')])))
+    try:
+        # Em uma sessão própria, o job (e os processos de análise dele) não recebe os sinais do Streamlit
+        processo = subprocess.Popen(
+            [sys.executable, '-m', 'modules.job_runner', str(job['id'])],
+            stdin=subprocess.PIPE, env=ambiente, start_new_session=True
+        )
+        processo.stdin.write(json.dumps(credenciais or {}).encode('utf-8'))
+        processo.stdin.close()
+        # As escritas do job acontecem em outro processo: as gerações deste são relidas quando ele terminar
+        dbm.track_writer_process(processo)
+    except OSError as e:
+        dbm.finish_job(job['id'], 'falhou', erro=f"Não foi possível iniciar o processo do job: {e}")
+        return dbm.get_job(job['id']), False
+    return job, True
+
+class LogDoJob:
+    """
+    Faz as vezes do elemento de log do Streamlit (`text`, `info`, `success`, `warning`, `error`) e grava cada mensagem
+    como evento do job. Os avisos também ficam em `avisos`, que vão para o resultado do job (o log guarda só os últimos eventos).
+    """
+    def __init__(self, job_id):
+        self.job_id = job_id
+        self.avisos = []
+
+    def _registrar(self, nivel, mensagem):
+        dbm.add_job_event(self.job_id, nivel, str(mensagem).strip())
+
+    def text(self, mensagem): self._registrar('text', mensagem)
+    def info(self, mensagem): self._registrar('info', mensagem)
+    def success(self, mensagem): self._registrar('success', mensagem)
+    def warning(self, mensagem):
+        self.avisos.append(str(mensagem).strip())
+        self._registrar('warning', mensagem)
+    def error(self, mensagem): self._registrar('error', mensagem)
+
+def _ao_progredir(job_id):
+    """Callback `ao_progredir` do scraper: acumula as aulas processadas e grava o progresso do job."""
+    aulas = 0
+    def progredir(cursos_processados, total_cursos, aulas_do_curso):
+        nonlocal aulas
+        aulas += aulas_do_curso
+        dbm.update_job_progress(job_id, cursos_processados, total_cursos, aulas)
+    return progredir
+
+def _sessao_do_job(job, credenciais, log, reaproveitar=METODOS_REAPROVEITAVEIS):
+    parametros = job['parametros']
+    if dbm.normalize_user(credenciais.get('email')) != job['usuario']:
+        raise FalhaDoJob("As credenciais recebidas não são da conta do job.")
+    log.text("Iniciando autenticação...")
+    session = abrir_sessao(
+        credenciais.get('email'), credenciais.get('senha'),
+        parametros.get('usar_cache', False), parametros.get('offline', False), reaproveitar, parametros.get('taxa_maxima')
+    )
+    if not session:
+        raise FalhaDoJob("Falha na autenticação! Verifique suas credenciais.")
+    log.success("Autenticação bem-sucedida!")
+    return session
+
+def _executar_raspagem(job, credenciais, log):
+    incremental = job['parametros'].get('incremental')
+    # A incremental existe para enxergar o que mudou: nem o conteúdo das aulas vem do cache
+    session = _sessao_do_job(job, credenciais, log, frozenset() if incremental else METODOS_REAPROVEITAVEIS)
+    if incremental:
+        resultado = run_incremental_scraper(session, log, dbm.load_lesson_fingerprints(), ao_progredir=_ao_progredir(job['id']))
+        contagem = None
+        if resultado is not None:
+            with NormalizadorDeConteudo(dbm.DB_PATH) as normalizador:
+                contagem = dbm.apply_incremental_scrape(resultado, normalizador)
+            if normalizador.estatisticas['documentos']:
+                log.text(f"🧹 Conteúdo das aulas convertido em texto: {normalizador.resumo()}.")
+        if contagem is None:
+            raise FalhaDoJob("A raspagem incremental falhou. Verifique o log de atividade.")
+        # O status lido na raspagem é o progresso de quem a fez
+        dbm.import_catalog_progress(job['usuario'])
+        return {'incremental': True, **contagem}
+    resumo = run_full_scraper(session, log, retomar=job['parametros'].get('retomar', True), ao_progredir=_ao_progredir(job['id']))
+    if resumo is None:
+        raise FalhaDoJob("A raspagem não retornou nenhum dado. Verifique o log de atividade.")
+    if resumo['publicado']:
+        dbm.import_catalog_progress(job['usuario'])
+    return {'incremental': False, **resumo}
+
+def _executar_sincronizacao(job, credenciais, log):
+    # O progresso precisa vir da plataforma: o cache só grava as respostas (para o reprocessamento offline)
+    session = _sessao_do_job(job, credenciais, log, frozenset())
+    resultado = run_progress_sync(session, log, job['usuario'], ao_progredir=_ao_progredir(job['id']))
+    if resultado is None:
+        raise FalhaDoJob("A sincronização do progresso falhou. Verifique o log de atividade.")
+    return resultado
+
+def _executar_juncao(job, credenciais, log):
+    df_plano = run_joiner(log, job['usuario'])
+    if df_plano is None:
+        raise FalhaDoJob("A junção falhou. Verifique o log da junção.")
+    return {'itens': len(df_plano), 'com_link': int(df_plano['aula_link'].notna().sum())}
+
+EXECUTORES = {
+    'raspagem': _executar_raspagem,
+    'sincronizacao': _executar_sincronizacao,
+    'juncao': _executar_juncao,
+}
+
+def _encerrar_processo():
+    """Encerra o job na hora, com os processos de análise que ele abriu (o grupo criado por `start_new_session`)."""
+    if hasattr(os, 'killpg'):
+        os.killpg(os.getpgrp(), signal.SIGKILL)
+    os._exit(1)
+
+def _vigiar(job_id):
+    """
+    Thread de batimentos. Quando o cancelamento é pedido, o job é marcado como 'cancelado' e o processo é encerrado:
+    as escritas são todas transacionais (uma interrompida é desfeita) e a raspagem completa retoma do último curso gravado.
+    """
+    while True:
+        try:
+            cancelar = dbm.heartbeat_job(job_id)
+        except Exception as e:
+            print(f"Erro ao registrar o batimento do job {job_id}: {e}")
+            cancelar = False
+        if cancelar:
+            dbm.add_job_event(job_id, 'warning', "⏹️ Job cancelado.")
+            dbm.finish_job(job_id, 'cancelado')
+            _encerrar_processo()
+        time.sleep(INTERVALO_BATIMENTO)
+
+def executar_job(job_id, credenciais):
+    """Executa o job `job_id` neste processo, do 'na_fila' até 'concluido', 'falhou' ou 'cancelado'."""
+    job = dbm.get_job(job_id)
+    if job is None or not dbm.start_job(job_id, os.getpid()):
+        return
+    threading.Thread(target=_vigiar, args=(job_id,), daemon=True).start()
+    log = LogDoJob(job_id)
+    try:
+        resultado = EXECUTORES[job['tipo']](job, credenciais, log)
+    except FalhaDoJob as e:
+        log.error(str(e))
+        dbm.finish_job(job_id, 'falhou', erro=str(e))
+        return
+    except Exception as e:
+        log.error(f"❌ Erro inesperado: {e}")
+        dbm.finish_job(job_id, 'falhou', erro=str(e))
+        return
+    if log.avisos:
+        resultado = {**resultado, 'avisos': log.avisos}
+    dbm.finish_job(job_id, 'concluido', resultado=resultado)
+
+if __name__ == '__main__':
+    # Uso interno: python -m modules.job_runner <job_id>, com as credenciais em JSON na entrada padrão
+    executar_job(int(sys.argv[1]), json.loads(sys.stdin.read() or '{}'))
@@ -1,97 +1,183 @@
 import requests
 from bs4 import BeautifulSoup
 import json
+import os
+import threading
 import time
 import html as html_parser
 import pandas as pd
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import ThreadPoolExecutor, Future, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from . import html_extract
+from . import database_manager as dbm
+from .content_normalizer import NormalizadorDeConteudo
+from .html_extract import (
+    componentes_modulos, aulas_com_status,
+    analisar_pagina_curso, analisar_resposta_init, analisar_resposta_modulo, analisar_resposta_aula,
+)
+from .http_transport import MAX_CONEXOES_PADRAO
+
+# Cursos raspados ao mesmo tempo e limite global de requisições HTTP simultâneas
+MAX_CURSOS_SIMULTANEOS = 4
+MAX_REQUISICOES_SIMULTANEAS = MAX_CONEXOES_PADRAO
+# Tentativas de um curso na raspagem completa (somadas entre execuções retomadas) antes de desistir dele
+MAX_TENTATIVAS_POR_CURSO = 3
+# Processos que analisam as respostas (um núcleo fica para as threads de I/O e o Streamlit)
+PROCESSOS_DE_ANALISE = max(1, (os.cpu_count() or 2) - 1)
 
 # --- Funções de Extração ---
+# A leitura dos documentos fica em `html_extract`, que também é o que roda no estágio de análise.
 
 def extrair_componentes_modulos(html):
     """Extrai os dados de inicialização de todos os componentes de módulo."""
-    soup = BeautifulSoup(html, 'html.parser')
-    dados_dos_modulos = []
-    divs_componentes = soup.find_all("div", attrs={"wire:initial-data": True})
-    for div in divs_componentes:
-        try:
-            dados = json.loads(html_parser.unescape(div['wire:initial-data']))
-            if dados.get('fingerprint', {}).get('name') == 'v2.portal.course-module-card':
-                id_modulo = dados.get('serverMemo', {}).get('dataMeta', {}).get('models', {}).get('module', {}).get('id')
-                if id_modulo:
-                    dados['id_modulo'] = id_modulo
-                    dados_dos_modulos.append(dados)
-        except Exception:
-            pass
-    return dados_dos_modulos
+    return componentes_modulos(html_extract.analisar(html).initial_data)
 
 def extrair_aulas_com_status(html):
-    """Extrai uma lista de dicionários, cada um com o ID da aula e seu status de conclusão."""
-    soup = BeautifulSoup(html, 'html.parser')
-    aulas = []
-    for li in soup.find_all("li", attrs={"wire:key": lambda k: k and 'lesson.' in k}):
-        try:
-            lesson_id = int(li["wire:key"].split("lesson.")[1])
-            x_data = li.get('x-data', '{}')
-            status_concluida = "finished:true" in x_data.replace(" ", "").replace("\n", "")
-            aulas.append({'id': lesson_id, 'concluida': status_concluida})
-        except (ValueError, IndexError):
-            continue
-    return aulas
+    """Extrai uma lista de dicionários, cada um com o ID da aula, seu status de conclusão e sua impressão digital."""
+    return aulas_com_status(html_extract.analisar(html).itens_aula)
 
 # --- Funções de Chamada de API ---
 
-def chamar_learning_center_init(session, csrf_token, link_curso):
-    """Carrega a página e chama o método 'init' para obter o HTML completo do curso."""
+def _payload_learning_center_init(dados_learning_center):
+    return {"fingerprint": dados_learning_center['fingerprint'], "serverMemo": dados_learning_center['serverMemo'], "updates": [{"type": "callMethod", "payload": {"id": dados_learning_center['fingerprint']['id'], "method": "init", "params": []}}]}
+
+def _payload_course_module_card(dados_componente_card):
+    return {"fingerprint": dados_componente_card['fingerprint'], "serverMemo": dados_componente_card['serverMemo'], "updates": [{"type": "callMethod", "payload": {"id": dados_componente_card['fingerprint']['id'], "method": "loadLessons", "params": []}}, {"type": "callMethod", "payload": {"id": dados_componente_card['fingerprint']['id'], "method": "$set", "params": ["expanded", True]}}]}
+
+def _payload_active_lesson(dados_lesson_component, lesson_id):
+    return {"fingerprint": dados_lesson_component['fingerprint'], "serverMemo": dados_lesson_component['serverMemo'], "updates": [{"type": "callMethod", "payload": {"id": dados_lesson_component['fingerprint']['id'], "method": "loadLesson", "params": [int(lesson_id)]}}]}
+
+def _post_livewire(session, componente, csrf_token, link_curso, payload):
+    """Chama um componente Livewire e devolve o corpo cru da resposta (o JSON é lido depois, no estágio de análise)."""
+    headers = {"accept": "application/json", "content-type": "application/json", "x-csrf-token": csrf_token, "x-livewire": "true", "Referer": link_curso, "User-Agent": "Mozilla/5.0"}
+    url = f"https://jornadadedados.alpaclass.com/livewire/message/{componente}"
+    resp = session.post(url, headers=headers, json=payload, timeout=60)
+    resp.raise_for_status()
+    return resp.text
+
+def _get_texto(session, url):
+    resp = session.get(url)
+    resp.raise_for_status()
+    return resp.text
+
+def chamar_learning_center_init(session, csrf_token, link_curso, documento_curso=None):
+    """Chama o método 'init' para obter o HTML completo do curso.
+
+    `documento_curso` é a página do curso já lida por `html_extract.analisar`; sem ele, a página é carregada de novo.
+    """
     print("  ➡️  Carregando estrutura do curso (chamada init)...")
     try:
-        resp_curso_inicial = session.get(link_curso, timeout=60)
-        resp_curso_inicial.raise_for_status()
-        soup_curso = BeautifulSoup(resp_curso_inicial.text, 'html.parser')
-        div_principal = soup_curso.find("div", attrs={"wire:initial-data": True})
-        if not div_principal: return None
-        dados_raw = html_parser.unescape(div_principal['wire:initial-data'])
+        if documento_curso is None:
+            documento_curso = html_extract.analisar(_get_texto(session, link_curso))
+        if not documento_curso.initial_data: return None
+        dados_raw = html_parser.unescape(documento_curso.initial_data[0])
         dados_learning_center = json.loads(dados_raw)
-        payload = {"fingerprint": dados_learning_center['fingerprint'], "serverMemo": dados_learning_center['serverMemo'], "updates": [{"type": "callMethod", "payload": {"id": dados_learning_center['fingerprint']['id'], "method": "init", "params": []}}]}
-        headers = {"accept": "application/json", "content-type": "application/json", "x-csrf-token": csrf_token, "x-livewire": "true", "Referer": link_curso, "User-Agent": "Mozilla/5.0"}
-        url = "https://jornadadedados.alpaclass.com/livewire/message/v2.portal.learning-center"
-        resp = session.post(url, headers=headers, json=payload, timeout=60)
-        resp.raise_for_status()
-        print(f"  ✅ [INIT] Status: {resp.status_code}")
-        return resp.json().get('effects', {}).get('html', '')
+        texto = _post_livewire(session, "v2.portal.learning-center", csrf_token, link_curso, _payload_learning_center_init(dados_learning_center))
+        return json.loads(texto).get('effects', {}).get('html', '')
     except Exception as e:
         print(f"  ❌ Erro na chamada 'init': {e}")
         return None
 
 def chamar_course_module_card_e_pegar_aulas(session, csrf_token, dados_componente_card, link_curso):
-    """Chama a API do módulo e retorna uma lista de aulas com ID e status."""
-    payload = {"fingerprint": dados_componente_card['fingerprint'], "serverMemo": dados_componente_card['serverMemo'], "updates": [{"type": "callMethod", "payload": {"id": dados_componente_card['fingerprint']['id'], "method": "loadLessons", "params": []}}, {"type": "callMethod", "payload": {"id": dados_componente_card['fingerprint']['id'], "method": "$set", "params": ["expanded", True]}}]}
-    headers = {"accept": "application/json", "content-type": "application/json", "x-csrf-token": csrf_token, "x-livewire": "true", "Referer": link_curso, "User-Agent": "Mozilla/5.0"}
-    url = "https://jornadadedados.alpaclass.com/livewire/message/v2.portal.course-module-card"
+    """Chama a API do módulo e retorna uma lista de aulas com ID e status, ou None se a chamada falhar."""
     try:
-        resp = session.post(url, headers=headers, json=payload, timeout=60)
-        resp.raise_for_status()
-        html_resposta = resp.json().get('effects', {}).get('html', '')
-        return extrair_aulas_com_status(html_resposta)
+        texto = _post_livewire(session, "v2.portal.course-module-card", csrf_token, link_curso, _payload_course_module_card(dados_componente_card))
     except requests.exceptions.RequestException:
-        return []
+        return None
+    return analisar_resposta_modulo(texto)
 
 def buscar_detalhes_completos_aula(session, csrf_token, dados_lesson_component, link_curso, lesson_id):
     """Chama a API active-lesson-component para pegar todos os detalhes, incluindo o slug."""
     if not dados_lesson_component: return None
-    payload = {"fingerprint": dados_lesson_component['fingerprint'], "serverMemo": dados_lesson_component['serverMemo'], "updates": [{"type": "callMethod", "payload": {"id": dados_lesson_component['fingerprint']['id'], "method": "loadLesson", "params": [int(lesson_id)]}}]}
-    headers = {"accept": "application/json", "content-type": "application/json", "x-csrf-token": csrf_token, "x-livewire": "true", "Referer": link_curso, "User-Agent": "Mozilla/5.0"}
-    url = "https://jornadadedados.alpaclass.com/livewire/message/v2.portal.active-lesson-component"
     try:
-        resp = session.post(url, headers=headers, json=payload, timeout=60)
-        resp.raise_for_status()
-        js = resp.json()
-        for emit in js.get('effects', {}).get('emits', []):
-            if emit.get('event') == 'setActiveLesson':
-                return emit['params'][0]
+        texto = _post_livewire(session, "v2.portal.active-lesson-component", csrf_token, link_curso, _payload_active_lesson(dados_lesson_component, lesson_id))
+    except requests.exceptions.RequestException:
         return None
+    return analisar_resposta_aula(texto)
+
+# --- Estágio de Análise ---
+
+class EstagioDeAnalise:
+    """
+    Pool de processos que transforma as respostas cruas em dicionários simples (JSON, unescape e HTML).
+
+    As threads de I/O só buscam as respostas e as entregam aqui; como o trabalho é de CPU, ele
+    escala com os núcleos em vez de disputar o GIL com as threads de rede. No máximo
+    `max_pendentes` respostas esperam na fila: quando ela enche, `submit` bloqueia a thread de
+    I/O, o que segura novas requisições até a análise alcançar (backpressure).
+    Com `processos=0` a análise roda na própria thread que chamou `submit`.
+
+    Se o pool quebrar (um processo de análise morto pelo sistema, por exemplo), o erro fica em `falha`
+    e toda análise pendente ou nova passa a rodar nas threads de I/O, em vez de derrubar os cursos.
+    """
+    def __init__(self, processos=None, max_pendentes=None):
+        self.processos = PROCESSOS_DE_ANALISE if processos is None else processos
+        self.falha = None
+        self._pool = None
+        if self.processos:
+            self._pool = html_extract.pool_de_processos(self.processos)
+        self._vagas = threading.BoundedSemaphore(max_pendentes or max(1, self.processos) * 8)
+
+    def submit(self, funcao, *args):
+        if self._pool is None or self.falha is not None:
+            return _analisar_na_thread(funcao, *args)
+        self._vagas.acquire()
+        try:
+            future = self._pool.submit(funcao, *args)
+        except BrokenProcessPool as e:
+            self._vagas.release()
+            self.falha = self.falha or e
+            return _analisar_na_thread(funcao, *args)
+        except Exception:
+            self._vagas.release()
+            raise
+        future.add_done_callback(lambda _: self._vagas.release())
+        return _AnaliseNoPool(self, future, funcao, args)
+
+    def encerrar(self):
+        if self._pool is not None:
+            self._pool.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.encerrar()
+
+def _analisar_na_thread(funcao, *args):
+    future = Future()
+    try:
+        future.set_result(funcao(*args))
+    except Exception as e:
+        future.set_exception(e)
+    return future
+
+class _AnaliseNoPool:
+    """Resultado de uma análise enviada ao pool; se o pool quebrar antes de entregá-lo, a análise é refeita na thread que o pede."""
+    def __init__(self, estagio, future, funcao, args):
+        self._estagio = estagio
+        self._future = future
+        self._funcao = funcao
+        self._args = args
+
+    def result(self):
+        try:
+            return self._future.result()
+        except BrokenProcessPool as e:
+            self._estagio.falha = self._estagio.falha or e
+            return self._funcao(*self._args)
+
+def _buscar_para_analise(estagio, funcao_de_analise, funcao_de_busca, *args):
+    """Roda nas threads de I/O: busca a resposta crua e a enfileira no estágio de análise. None se a busca falhar."""
+    try:
+        texto = funcao_de_busca(*args)
     except requests.exceptions.RequestException:
         return None
+    return estagio.submit(funcao_de_analise, texto)
+
+def _resultado_analisado(future_busca):
+    future_analise = future_busca.result()
+    return future_analise.result() if future_analise is not None else None
 
 # --- Funções de Orquestração ---
 def raspar_pagina_de_conteudos(session, log_area):
@@ -122,111 +208,348 @@ def raspar_pagina_de_conteudos(session, log_area):
         log_area.text(f"  ❌ Falha ao carregar a página de conteúdos: {e}")
         return {}
 
-def raspar_curso(session, link_curso, log_area):
-    """Função que usa concorrência para buscar slugs e status de forma rápida."""
+def raspar_curso(session, link_curso, log_area, executor=None, aulas_conhecidas=None, baixar_detalhes=True, estagio=None):
+    """Função que usa concorrência para buscar slugs e status de forma rápida.
+
+    Todas as requisições HTTP do curso passam pelo `executor` recebido, que é compartilhado
+    entre os cursos em andamento e define o orçamento global de concorrência do scraping.
+    As threads do `executor` só fazem I/O: as respostas cruas seguem para o `estagio`
+    (um `EstagioDeAnalise`), que as converte em dicionários. Sem `estagio`, a análise roda
+    na própria thread de I/O.
+
+    Se `aulas_conhecidas` ({aula_id: (modulo_id, fingerprint)}) for informado, as aulas que
+    continuam no mesmo módulo com a mesma impressão digital não têm os detalhes baixados de
+    novo: entram apenas com o status em `curso_data["aulas_inalteradas"]`.
+
+    O status de todas as aulas listadas fica sempre em `curso_data["status"]`; com
+    `baixar_detalhes=False` apenas as chamadas 'init' e 'loadLessons' são feitas.
+    """
+    if executor is None:
+        with ThreadPoolExecutor(max_workers=MAX_REQUISICOES_SIMULTANEAS) as executor_local:
+            return raspar_curso(session, link_curso, log_area, executor_local, aulas_conhecidas, baixar_detalhes, estagio)
+    estagio = estagio or EstagioDeAnalise(processos=0)
+    aulas_conhecidas = aulas_conhecidas or {}
     try:
-        resp_curso_inicial = session.get(link_curso)
-        resp_curso_inicial.raise_for_status()
-        soup_curso = BeautifulSoup(resp_curso_inicial.text, 'html.parser')
-        csrf_token = soup_curso.find('meta', {'name': 'csrf-token'})['content']
-        
-        html_real_do_curso = chamar_learning_center_init(session, csrf_token, link_curso)
-        if not html_real_do_curso: return None
-        
-        soup_real = BeautifulSoup(html_real_do_curso, 'html.parser')
-        dados_dos_modulos = extrair_componentes_modulos(html_real_do_curso)
-        
-        dados_lesson_component = None
-        for div in soup_real.find_all("div", attrs={"wire:initial-data": True}):
-            dados = json.loads(html_parser.unescape(div['wire:initial-data']))
-            if dados.get('fingerprint', {}).get('name') == 'v2.portal.active-lesson-component':
-                dados_lesson_component = dados
-                break
+        texto_curso = executor.submit(_get_texto, session, link_curso).result()
+        csrf_token, dados_learning_center = estagio.submit(analisar_pagina_curso, texto_curso).result()
+        if csrf_token is None:
+            raise ValueError("meta 'csrf-token' não encontrada na página do curso")
+        if dados_learning_center is None: return None
+
+        print("  ➡️  Carregando estrutura do curso (chamada init)...")
+        estrutura = _resultado_analisado(executor.submit(
+            _buscar_para_analise, estagio, analisar_resposta_init,
+            _post_livewire, session, "v2.portal.learning-center", csrf_token, link_curso,
+            _payload_learning_center_init(dados_learning_center)
+        ))
+        if estrutura is None: return None
+        dados_dos_modulos, dados_lesson_component = estrutura
         
-        curso_data = {"aulas": []}
+        curso_data = {"aulas": [], "aulas_inalteradas": [], "modulos_com_falha": [], "status": []}
         if not dados_dos_modulos:
             log_area.text("  - Nenhum módulo encontrado nesta página.")
             return curso_data
 
         log_area.text(f"  - Encontrados {len(dados_dos_modulos)} módulos. Processando...")
-        for dados_modulo in dados_dos_modulos:
-            id_mod = dados_modulo.get('id_modulo')
-            if not id_mod: continue
-            
-            aulas_com_status = chamar_course_module_card_e_pegar_aulas(session, csrf_token, dados_modulo, link_curso)
-            if not aulas_com_status: continue
-
-            log_area.text(f"    - Módulo {id_mod}: Buscando detalhes de {len(aulas_com_status)} aulas em paralelo...")
-            
-            status_map = {aula['id']: aula['concluida'] for aula in aulas_com_status}
-            
-            with ThreadPoolExecutor(max_workers=15) as executor:
-                future_to_id = {executor.submit(buscar_detalhes_completos_aula, session, csrf_token, dados_lesson_component, link_curso, aula['id']): aula['id'] for aula in aulas_com_status}
-                for future in as_completed(future_to_id):
-                    detalhes_aula = future.result()
-                    if detalhes_aula:
-                        aula_id = detalhes_aula.get('id')
-                        detalhes_aula['concluida'] = status_map.get(aula_id, False)
-                        curso_data["aulas"].append(detalhes_aula)
+
+        # Todos os módulos são pedidos de uma vez; assim que a lista de um módulo chega,
+        # os detalhes das suas aulas já entram na fila, sem esperar pelos demais módulos.
+        future_to_indice = {
+            executor.submit(
+                _buscar_para_analise, estagio, analisar_resposta_modulo,
+                _post_livewire, session, "v2.portal.course-module-card", csrf_token, link_curso,
+                _payload_course_module_card(dados_modulo)
+            ): indice
+            for indice, dados_modulo in enumerate(dados_dos_modulos)
+        }
+        aulas_por_modulo = [[] for _ in dados_dos_modulos]
+        for future in as_completed(future_to_indice):
+            indice = future_to_indice[future]
+            aulas_do_modulo = _resultado_analisado(future)
+            id_mod = dados_dos_modulos[indice]['id_modulo']
+            if aulas_do_modulo is None:
+                curso_data["modulos_com_falha"].append(id_mod)
+                continue
+            if not aulas_do_modulo: continue
+
+            curso_data["status"].extend({'id': aula['id'], 'concluida': aula['concluida']} for aula in aulas_do_modulo)
+            if not baixar_detalhes: continue
+
+            aulas_a_baixar = []
+            for aula in aulas_do_modulo:
+                if aulas_conhecidas.get(aula['id']) == (id_mod, aula['fingerprint']):
+                    curso_data["aulas_inalteradas"].append({'id': aula['id'], 'concluida': aula['concluida']})
+                else:
+                    aulas_a_baixar.append(aula)
+            if not aulas_a_baixar or not dados_lesson_component: continue
+
+            log_area.text(f"    - Módulo {id_mod}: Buscando detalhes de {len(aulas_a_baixar)} aulas em paralelo...")
+            aulas_por_modulo[indice] = [
+                (aula, executor.submit(
+                    _buscar_para_analise, estagio, analisar_resposta_aula,
+                    _post_livewire, session, "v2.portal.active-lesson-component", csrf_token, link_curso,
+                    _payload_active_lesson(dados_lesson_component, aula['id'])
+                ))
+                for aula in aulas_a_baixar
+            ]
+
+        # Monta o resultado na ordem dos módulos e das aulas na página, independente da ordem de chegada.
+        for aulas_do_modulo in aulas_por_modulo:
+            for aula, future in aulas_do_modulo:
+                detalhes_aula = _resultado_analisado(future)
+                if detalhes_aula:
+                    detalhes_aula['concluida'] = aula['concluida']
+                    detalhes_aula['fingerprint'] = aula['fingerprint']
+                    detalhes_aula['baixada_em'] = time.time()
+                    curso_data["aulas"].append(detalhes_aula)
         return curso_data
     except Exception as e:
         log_area.text(f"  ❌ Erro geral ao raspar o curso {link_curso}: {e}")
         return None
 
-def run_full_scraper(session, log_area):
-    """Função principal que orquestra todo o scraping."""
+def montar_linhas_do_curso(nome_trilha, nome_curso, link_curso, dados_do_curso):
+    """Converte o resultado de `raspar_curso` nas linhas da tabela 'cursos'."""
+    linhas = []
+    if dados_do_curso and dados_do_curso.get("aulas"):
+        for aula in dados_do_curso["aulas"]:
+            slug_da_aula = aula.get('slug')
+            link_da_aula = f"{link_curso.split('?')[0]}?lessonSlug={slug_da_aula}" if slug_da_aula else None
+            linha = {
+                'trilha_nome': nome_trilha,
+                'curso_nome': nome_curso,
+                'curso_link': link_curso,
+                'modulo_id': aula.get('module_id'),
+                'modulo_nome': aula.get('module', {}).get('name'),
+                'aula_id': aula.get('id'),
+                'aula_nome': aula.get('name'),
+                'aula_slug': slug_da_aula,
+                'aula_link': link_da_aula,
+                'aula_concluida': aula.get('concluida', False),
+                'aula_sumario': aula.get('summary'),
+                'aula_conteudo_html': aula.get('html_content'),
+                'aula_fingerprint': aula.get('fingerprint'),
+                'aula_baixada_em': aula.get('baixada_em')
+            }
+            linhas.append(linha)
+    else:
+        linha = {
+            'trilha_nome': nome_trilha, 'curso_nome': nome_curso, 'curso_link': link_curso,
+            'modulo_id': None, 'modulo_nome': 'N/A', 'aula_id': None,
+            'aula_nome': 'N/A', 'aula_slug': None, 'aula_link': None,
+            'aula_concluida': None,
+            'aula_sumario': None,
+            'aula_conteudo_html': None,
+            'aula_fingerprint': None,
+            'aula_baixada_em': None
+        }
+        linhas.append(linha)
+    return linhas
+
+class LogDeCurso:
+    """Guarda as mensagens de um curso raspado em uma thread auxiliar.
+
+    Elementos do Streamlit só devem ser atualizados pela thread do script, então as
+    mensagens ficam aqui até a thread principal repassá-las ao `log_area`.
+    """
+    def __init__(self):
+        self.mensagens = []
+
+    def text(self, mensagem):
+        self.mensagens.append(mensagem)
+
+    def error(self, mensagem):
+        self.mensagens.append(mensagem)
+
+def _raspar_curso_em_thread(session, link_curso, executor, aulas_conhecidas, baixar_detalhes, estagio, ao_iniciar_curso=None):
+    if ao_iniciar_curso is not None:
+        ao_iniciar_curso(link_curso)
+    log_do_curso = LogDeCurso()
+    dados_do_curso = raspar_curso(session, link_curso, log_do_curso, executor, aulas_conhecidas, baixar_detalhes, estagio)
+    return dados_do_curso, log_do_curso.mensagens
+
+def _listar_cursos(session, log_area):
+    """Lê a página de conteúdos e devolve [(trilha, curso, link)] na ordem da página, ou None se não houver cursos."""
     trilhas_e_cursos = raspar_pagina_de_conteudos(session, log_area)
     if not trilhas_e_cursos:
         log_area.error("Nenhuma trilha ou curso encontrado. Encerrando.")
         return None
+    return [
+        (nome_trilha, nome_curso, link_curso)
+        for nome_trilha, cursos_da_trilha in trilhas_e_cursos.items()
+        for nome_curso, link_curso in cursos_da_trilha.items()
+    ]
+
+def _raspar_catalogo(session, log_area, cursos, max_cursos, max_requisicoes, aulas_conhecidas_por_curso=None, baixar_detalhes=True,
+                     processos_analise=None, ao_iniciar_curso=None, ao_concluir_curso=None, ao_progredir=None):
+    """Raspa os cursos [(trilha, curso, link)] e devolve [(trilha, curso, link, dados_do_curso)] na mesma ordem.
+
+    As respostas são analisadas em um `EstagioDeAnalise` com `processos_analise` processos
+    (padrão `PROCESSOS_DE_ANALISE`; 0 analisa nas próprias threads de I/O).
 
-    lista_de_aulas = []
-    total_cursos = sum(len(c) for c in trilhas_e_cursos.values())
+    `ao_iniciar_curso(link)` é chamado na thread do curso, antes da primeira requisição.
+    Com `ao_concluir_curso(trilha, curso, link, dados_do_curso)`, cada curso é entregue à thread
+    principal assim que termina e não fica guardado: a posição dele no resultado recebe o
+    retorno da função. `ao_progredir(cursos_processados, total_cursos, aulas_do_curso)` também roda na
+    thread principal, a cada curso terminado (para acompanhar a vazão da raspagem).
+    """
+    max_cursos = max_cursos or MAX_CURSOS_SIMULTANEOS
+    max_requisicoes = max_requisicoes or MAX_REQUISICOES_SIMULTANEAS
+    aulas_conhecidas_por_curso = aulas_conhecidas_por_curso or {}
+
+    total_cursos = len(cursos)
+    resultados = [None] * total_cursos
     cursos_processados = 0
 
-    log_area.text("\n--- ETAPA 2: Iniciando a raspagem de cada curso ---")
-    for nome_trilha, cursos in trilhas_e_cursos.items():
-        log_area.text(f"\nTrabalhando na Trilha: '{nome_trilha}'")
-        
-        for nome_curso, link_curso in cursos.items():
+    # Uma conexão por worker HTTP, reaproveitada (keep-alive) por todos os cursos e módulos
+    if getattr(session, 'max_conexoes', max_requisicoes) < max_requisicoes:
+        session.ajustar_pool(max_requisicoes)
+    estatisticas = getattr(session, 'estatisticas', None)
+    if estatisticas is not None:
+        estatisticas.zerar()
+
+    log_area.text(f"\n--- ETAPA 2: Iniciando a raspagem de {total_cursos} cursos ({max_cursos} em paralelo) ---")
+    falha_avisada = False
+    with EstagioDeAnalise(processos_analise) as estagio, \
+         ThreadPoolExecutor(max_workers=max_requisicoes) as executor_http, \
+         ThreadPoolExecutor(max_workers=max_cursos) as executor_cursos:
+        future_to_indice = {
+            executor_cursos.submit(
+                _raspar_curso_em_thread, session, link_curso, executor_http, aulas_conhecidas_por_curso.get(link_curso),
+                baixar_detalhes, estagio, ao_iniciar_curso
+            ): indice
+            for indice, (_, _, link_curso) in enumerate(cursos)
+        }
+        for future in as_completed(future_to_indice):
+            # Retirado do dicionário para o resultado do curso poder ser liberado depois de entregue
+            indice = future_to_indice.pop(future)
+            nome_trilha, nome_curso, link_curso = cursos[indice]
+            dados_do_curso, mensagens = future.result()
+            if estagio.falha is not None and not falha_avisada:
+                falha_avisada = True
+                log_area.warning(
+                    f"⚠️ O pool de processos de análise parou ({estagio.falha}); "
+                    "as respostas passam a ser analisadas nas threads de I/O, mais devagar."
+                )
+
             cursos_processados += 1
-            log_area.text(f"  ({cursos_processados}/{total_cursos}) Raspando o curso: '{nome_curso}'")
-            
-            dados_do_curso = raspar_curso(session, link_curso, log_area)
-            
-            if dados_do_curso and dados_do_curso.get("aulas"):
-                for aula in dados_do_curso["aulas"]:
-                    slug_da_aula = aula.get('slug')
-                    link_da_aula = f"{link_curso.split('?')[0]}?lessonSlug={slug_da_aula}" if slug_da_aula else None
-                    linha = {
-                        'trilha_nome': nome_trilha,
-                        'curso_nome': nome_curso,
-                        'curso_link': link_curso,
-                        'modulo_id': aula.get('module_id'),
-                        'modulo_nome': aula.get('module', {}).get('name'),
-                        'aula_id': aula.get('id'),
-                        'aula_nome': aula.get('name'),
-                        'aula_slug': slug_da_aula,
-                        'aula_link': link_da_aula,
-                        'aula_concluida': aula.get('concluida', False),
-                        'aula_sumario': aula.get('summary'),
-                        'aula_conteudo_html': aula.get('html_content')
-                    }
-                    lista_de_aulas.append(linha)
+            log_area.text(f"  ({cursos_processados}/{total_cursos}) Curso raspado: '{nome_curso}' (Trilha: '{nome_trilha}')")
+            for mensagem in mensagens:
+                log_area.text(mensagem)
+            if ao_progredir is not None:
+                ao_progredir(cursos_processados, total_cursos, len(dados_do_curso["status"]) if dados_do_curso else 0)
+
+            if ao_concluir_curso is not None:
+                resultados[indice] = ao_concluir_curso(nome_trilha, nome_curso, link_curso, dados_do_curso)
             else:
-                linha = {
-                    'trilha_nome': nome_trilha, 'curso_nome': nome_curso, 'curso_link': link_curso,
-                    'modulo_id': None, 'modulo_nome': 'N/A', 'aula_id': None,
-                    'aula_nome': 'N/A', 'aula_slug': None, 'aula_link': None,
-                    'aula_concluida': None,
-                    'aula_sumario': None,
-                    'aula_conteudo_html': None
-                }
-                lista_de_aulas.append(linha)
-
-            time.sleep(1)
-
-    if lista_de_aulas:
-        return pd.DataFrame(lista_de_aulas)
-    return pd.DataFrame()
+                resultados[indice] = (nome_trilha, nome_curso, link_curso, dados_do_curso)
+
+    if estatisticas is not None:
+        log_area.text(f"📶 Transporte HTTP: {estatisticas.resumo()}; {session.controlador.resumo()}.")
+    return resultados
+
+def run_full_scraper(session, log_area, max_cursos=None, max_requisicoes=None, retomar=True, ao_progredir=None):
+    """Função principal que orquestra todo o scraping.
+
+    Vários cursos são raspados ao mesmo tempo (`max_cursos`), mas todas as requisições HTTP
+    dividem um único pool de `max_requisicoes` threads.
+
+    Cada curso é gravado no banco assim que termina (tabela de carga + job 'concluido', ver
+    `database_manager.save_scraped_course`), então a memória não acumula o conteúdo de todas as
+    aulas e uma execução interrompida pode ser retomada: com `retomar=True`, os cursos já gravados
+    não são raspados de novo. Um curso que falha volta para 'pendente' até somar
+    `MAX_TENTATIVAS_POR_CURSO` tentativas. Quando nenhum curso fica pendente, a carga substitui a
+    tabela 'cursos' (na ordem da página de conteúdos).
+
+    Retorna {'cursos', 'ja_gravados', 'gravados', 'pendentes', 'aulas', 'publicado'}, ou None se a
+    página de conteúdos falhar.
+    """
+    cursos = _listar_cursos(session, log_area)
+    if cursos is None:
+        return None
+
+    ja_gravados = dbm.start_scrape_jobs(cursos, retomar)
+    if ja_gravados:
+        log_area.text(f"♻️ Retomando a raspagem anterior: {len(ja_gravados)} de {len(cursos)} cursos já estão gravados.")
+    cursos_a_raspar = [curso for curso in cursos if curso[2] not in ja_gravados]
+    contagem = {'gravados': 0, 'pendentes': 0, 'aulas': 0}
+
+    def gravar_curso(nome_trilha, nome_curso, link_curso, dados_do_curso):
+        status = 'concluido'
+        if dados_do_curso is None:
+            if not dbm.record_scrape_failure(link_curso, MAX_TENTATIVAS_POR_CURSO):
+                contagem['pendentes'] += 1
+                return None
+            status = 'falhou'
+        linhas = montar_linhas_do_curso(nome_trilha, nome_curso, link_curso, dados_do_curso)
+        dbm.save_scraped_course(link_curso, linhas, status, normalizador)
+        contagem['gravados'] += 1
+        contagem['aulas'] += sum(1 for linha in linhas if linha['aula_id'] is not None)
+        return None
 
+    with NormalizadorDeConteudo(dbm.DB_PATH) as normalizador:
+        if cursos_a_raspar:
+            _raspar_catalogo(
+                session, log_area, cursos_a_raspar, max_cursos, max_requisicoes,
+                ao_iniciar_curso=dbm.mark_scrape_job_running, ao_concluir_curso=gravar_curso, ao_progredir=ao_progredir
+            )
+    if normalizador.estatisticas['documentos']:
+        log_area.text(f"🧹 Conteúdo das aulas convertido em texto: {normalizador.resumo()}.")
+
+    publicado = False
+    if contagem['pendentes']:
+        log_area.text(f"⚠️ {contagem['pendentes']} cursos falharam e ficaram pendentes. Rode a raspagem de novo para retomá-los.")
+    else:
+        publicado = dbm.publish_scraped_courses() is not None
+    return {
+        'cursos': len(cursos), 'ja_gravados': len(ja_gravados), 'gravados': contagem['gravados'],
+        'pendentes': contagem['pendentes'], 'aulas': contagem['aulas'], 'publicado': publicado,
+    }
+
+def run_incremental_scraper(session, log_area, aulas_conhecidas, max_cursos=None, max_requisicoes=None, ao_progredir=None):
+    """Raspagem incremental: baixa os detalhes apenas das aulas novas ou alteradas.
+
+    `aulas_conhecidas` é o dicionário {curso_link: {aula_id: (modulo_id, fingerprint)}} devolvido
+    por `database_manager.load_lesson_fingerprints`. O resultado deve ser aplicado com
+    `database_manager.apply_incremental_scrape`, que também remove as aulas que sumiram: as que
+    não estão em 'listadas' (todas as aulas da lista 'loadLessons' dos cursos raspados). Uma aula
+    listada cujo detalhe não pôde ser baixado fica fora de 'novas' e mantém a linha que já tinha.
+    """
+    cursos = _listar_cursos(session, log_area)
+    if cursos is None:
+        return None
+    resultados = _raspar_catalogo(session, log_area, cursos, max_cursos, max_requisicoes, aulas_conhecidas, ao_progredir=ao_progredir)
+
+    linhas_novas, aulas_inalteradas, aulas_listadas, cursos_raspados, modulos_com_falha = [], [], [], [], []
+    for nome_trilha, nome_curso, link_curso, dados_do_curso in resultados:
+        # Curso com erro: o que já está no banco para ele é mantido como está
+        if dados_do_curso is None: continue
+        cursos_raspados.append(link_curso)
+        aulas_inalteradas.extend(dados_do_curso["aulas_inalteradas"])
+        aulas_listadas.extend(status['id'] for status in dados_do_curso["status"])
+        modulos_com_falha.extend(dados_do_curso["modulos_com_falha"])
+        # A linha de marcação só entra para curso sem nenhuma aula listada (nem módulo com falha)
+        if dados_do_curso["aulas"] or not (dados_do_curso["status"] or dados_do_curso["modulos_com_falha"]):
+            linhas_novas.extend(montar_linhas_do_curso(nome_trilha, nome_curso, link_curso, dados_do_curso))
+
+    aulas_baixadas = sum(1 for linha in linhas_novas if linha['aula_id'] is not None)
+    log_area.text(f"✅ Raspagem incremental: {aulas_baixadas} aulas novas ou alteradas, {len(aulas_inalteradas)} inalteradas.")
+    return {
+        'novas': pd.DataFrame(linhas_novas),
+        'inalteradas': aulas_inalteradas,
+        'listadas': aulas_listadas,
+        'cursos_raspados': cursos_raspados,
+        'modulos_com_falha': modulos_com_falha,
+        'links_catalogo': [link_curso for _, _, link_curso, _ in resultados],
+    }
+
+def raspar_status_das_aulas(session, log_area, max_cursos=None, max_requisicoes=None, ao_progredir=None):
+    """Busca apenas o status de conclusão das aulas, sem baixar o conteúdo.
+
+    Usa somente as chamadas 'init' e 'loadLessons' de cada curso e devolve uma lista de
+    {'id', 'concluida'} com todas as aulas listadas, ou None se a página de conteúdos falhar.
+    """
+    cursos = _listar_cursos(session, log_area)
+    if cursos is None:
+        return None
+    resultados = _raspar_catalogo(session, log_area, cursos, max_cursos, max_requisicoes, baixar_detalhes=False, ao_progredir=ao_progredir)
+    return [status for _, _, _, dados_do_curso in resultados if dados_do_curso for status in dados_do_curso["status"]]
@@ -2,36 +2,63 @@
 
 import streamlit as st
 import pandas as pd
+import io
 import time
-from modules.authenticator import autenticar_jornadadedados
-from modules.scraper import run_full_scraper
-from modules.data_joiner import run_joiner
+from datetime import datetime
+from modules.data_joiner import COLUNAS_DO_PLANO_COM_LINKS
+from modules.job_runner import iniciar_job
 from modules import database_manager as dbm
+from modules.aprendiz import aprendiz_atual, entrar, sair
 
 st.set_page_config(page_title="Scraper", layout="wide")
 
 st.title("🚀 Scraper e Junção de Dados")
 st.markdown("Siga os passos abaixo para gerar seu plano de estudos com links.")
+usuario = aprendiz_atual()
+
+# --- CONTA ---
+# O plano, o progresso e os jobs são da conta autenticada aqui (ver `modules.aprendiz`)
+if usuario is None:
+    st.info("Entre com a sua conta da plataforma para começar.")
+    with st.form("login_form"):
+        email = st.text_input("Seu E-mail da Plataforma", key="email")
+        senha = st.text_input("Sua Senha da Plataforma", type="password", key="senha")
+        if st.form_submit_button("Entrar"):
+            if not email or not senha:
+                st.error("Por favor, preencha o e-mail e a senha.")
+            else:
+                with st.spinner("Autenticando..."):
+                    usuario = entrar(email, senha)
+                if usuario is None:
+                    st.error("Falha na autenticação! Verifique suas credenciais.")
+                else:
+                    st.rerun()
+    st.stop()
+col_conta, col_sair = st.columns([4, 1])
+col_conta.success(f"Conectado como **{usuario}**.")
+col_sair.button("Sair", on_click=sair)
 
 # --- Inicialização do Session State ---
-# Guarda o estado da UI e o DataFrame temporário do upload
-if 'scraping_done' not in st.session_state:
-    st.session_state.scraping_done = dbm.table_exists_and_has_data('cursos')
-if 'plan_uploaded' not in st.session_state:
-    st.session_state.plan_uploaded = dbm.table_exists_and_has_data('plano_estudos')
+# Guarda o estado da UI e o arquivo do upload (com uma prévia das primeiras linhas)
+# O catálogo pode ter sido raspado por um job em segundo plano (ou por outro aprendiz): é conferido a cada execução
+st.session_state.scraping_done = dbm.table_exists_and_has_data('cursos')
+# O plano é do aprendiz da sessão, então é conferido a cada execução
+st.session_state.plan_uploaded = dbm.get_progress_summary(usuario=usuario)['total_aulas'] > 0
 if 'df_para_upload' not in st.session_state:
     st.session_state.df_para_upload = None
+    st.session_state.arquivo_para_upload = None
 
 # --- PASSO 0: UPLOAD E CONFIRMAÇÃO DO PLANO ---
 st.info("**Passo 0:** Carregue seu `plano_de_estudos.csv` para iniciar.")
 
 uploaded_file = st.file_uploader("Escolha seu plano de estudos (CSV)", type="csv")
 
-# Se um arquivo for carregado, ele é lido e guardado temporariamente no session_state
+# Se um arquivo for carregado, ele é guardado temporariamente no session_state
 if uploaded_file is not None:
     try:
-        # Lê o arquivo e armazena na memória da sessão para a etapa de confirmação
-        st.session_state.df_para_upload = pd.read_csv(uploaded_file)
+        # Só a prévia é lida agora; o arquivo inteiro é lido em lotes pelo `dbm.merge_plan` na confirmação
+        st.session_state.df_para_upload = pd.read_csv(uploaded_file, nrows=5)
+        st.session_state.arquivo_para_upload = uploaded_file.getvalue()
     except Exception as e:
         st.error(f"Ocorreu um erro ao ler o arquivo CSV: {e}")
         st.session_state.df_para_upload = None # Limpa em caso de erro
@@ -40,91 +67,194 @@ if uploaded_file is not None:
 if st.session_state.df_para_upload is not None:
     st.markdown("#### Pré-visualização do seu Plano")
     st.markdown("Confira se os dados abaixo estão corretos antes de carregar no sistema.")
-    st.dataframe(st.session_state.df_para_upload.head())
+    st.dataframe(st.session_state.df_para_upload)
 
     if st.button("✅ Inserir no Banco de Dados"):
         with st.spinner("Salvando no banco de dados..."):
-            df_para_salvar = st.session_state.df_para_upload.copy()
-            
-            # Adiciona colunas que o sistema usará
-            df_para_salvar['aula_link'] = None
-            df_para_salvar['aula_concluida'] = False # Inicia todas as aulas como não concluídas
+            # Itens novos entram como não concluídos; os que já estavam no plano mantêm link e progresso
+            contagem = dbm.merge_plan(io.BytesIO(st.session_state.arquivo_para_upload), usuario)
 
-            # Salva no banco de dados
-            dbm.save_df_to_db(df_para_salvar, 'plano_estudos')
-
-            # Atualiza o estado da UI e limpa o DataFrame temporário
+        if contagem is None:
+            st.error("Não foi possível carregar o plano. Confira se o CSV tem as colunas 'Trilha' e 'Módulo'.")
+        else:
+            # Atualiza o estado da UI e limpa o arquivo temporário
             st.session_state.plan_uploaded = True
             st.session_state.df_para_upload = None
-            
-            st.success("Seu plano foi registrado com sucesso no banco de dados!")
+            st.session_state.arquivo_para_upload = None
+
+            st.success(
+                f"Seu plano foi registrado com sucesso no banco de dados! {contagem['inseridas']} itens novos, "
+                f"{contagem['atualizadas']} atualizados, {contagem['removidas']} removidos e {contagem['inalteradas']} inalterados."
+            )
             time.sleep(2) # Pausa para ver os balões :)
             st.rerun()
 
 st.divider()
 
-# --- PASSO 1: SCRAPING (sem alterações) ---
-st.info("**Passo 1:** Faça o scraping dos dados da plataforma. Isso pode levar vários minutos.")
-with st.form("login_form"):
-    email = st.text_input("Seu E-mail da Plataforma", key="email")
-    senha = st.text_input("Sua Senha da Plataforma", type="password", key="senha")
-    submitted = st.form_submit_button("Fazer Scraping Agora")
-
-    if submitted:
-        if not email or not senha:
-            st.error("Por favor, preencha o e-mail e a senha.")
+# --- PASSO 1: SCRAPING ---
+# A raspagem, a sincronização e a junção rodam como jobs em segundo plano (ver `modules.job_runner`): a página só
+# os dispara e acompanha o andamento pelo banco, então recarregá-la não interrompe nada.
+INTERVALO_ATUALIZACAO = 2   # segundos entre as consultas ao job em andamento
+
+NOMES_DOS_JOBS = {'raspagem': "Raspagem", 'sincronizacao': "Sincronização do progresso", 'juncao': "Junção"}
+
+def disparar(tipo, parametros=None, credenciais=None):
+    job, criado = iniciar_job(tipo, usuario, parametros, credenciais)
+    if job is None:
+        st.error("Não foi possível iniciar o job. Verifique o log do servidor.")
+    elif not criado and job['status'] in dbm.JOB_STATUS_ATIVOS:
+        st.warning(f"Já existe um job de {NOMES_DOS_JOBS[tipo].lower()} em andamento; acompanhe-o abaixo.")
+    elif not criado:
+        st.error(job['erro'])
+
+def formatar_duracao(segundos):
+    minutos, segundos = divmod(int(segundos), 60)
+    return f"{minutos // 60}h{minutos % 60:02d}min" if minutos >= 60 else f"{minutos}min{segundos:02d}s"
+
+def mostrar_resultado(job):
+    resultado = job['resultado'] or {}
+    for aviso in resultado.get('avisos', []):
+        st.warning(aviso)
+    if job['tipo'] == 'raspagem' and resultado.get('incremental'):
+        st.success(
+            f"Scraping incremental finalizado! {resultado['gravadas']} aulas gravadas, "
+            f"{resultado['inalteradas']} inalteradas e {resultado['removidas']} removidas."
+        )
+    elif job['tipo'] == 'raspagem' and resultado.get('publicado'):
+        st.success(f"Scraping finalizado! {resultado['aulas']} aulas salvas na tabela 'cursos' do banco de dados.")
+        st.dataframe(dbm.load_table_to_df('cursos', limite=5, colunas=dbm.COLUNAS_LISTAGEM))
+    elif job['tipo'] == 'raspagem':
+        st.warning(
+            f"{resultado['pendentes']} cursos ficaram pendentes. O que já foi raspado está salvo: "
+            "clique em 'Fazer Scraping Agora' de novo para retomar a partir deles."
+        )
+    elif job['tipo'] == 'sincronizacao':
+        st.success("Progresso sincronizado com a plataforma!")
+    else:
+        st.success("Processo finalizado! Seu plano com links foi salvo no banco de dados.")
+        resultado_df = dbm.load_plan(usuario)[COLUNAS_DO_PLANO_COM_LINKS]
+        st.dataframe(resultado_df.head(10))
+        csv_para_download = resultado_df.to_csv(index=False).encode('utf-8-sig')
+        st.download_button(
+            label="Baixar CSV com Links",
+            data=csv_para_download,
+            file_name="plano_de_estudos_com_links.csv",
+            mime='text/csv',
+        )
+
+def painel_do_job(tipo, ativo_ao_desenhar):
+    """Estado, vazão, tempo restante e log do último job do `tipo`; enquanto ele roda, é redesenhado sozinho."""
+    job = dbm.latest_job(tipo, None if tipo == 'raspagem' else usuario)
+    if job is None:
+        return
+    ativo = job['status'] in dbm.JOB_STATUS_ATIVOS
+    if ativo_ao_desenhar and not ativo:
+        # O job acabou: as gerações gravadas por ele são relidas e a página inteira é refeita para liberar os
+        # botões e mostrar o resultado
+        dbm.refresh_generations()
+        st.rerun()
+    nome = NOMES_DOS_JOBS[tipo]
+    if ativo:
+        decorrido = time.time() - (job['iniciado_em'] or job['criado_em'])
+        if job['total']:
+            texto = f"{nome}: {job['feitos']} de {job['total']} cursos"
+            if job['feitos']:
+                restante = decorrido / job['feitos'] * (job['total'] - job['feitos'])
+                texto += f" · {job['aulas'] / decorrido:.1f} aulas/s · faltam ~{formatar_duracao(restante)}"
+            st.progress(job['feitos'] / job['total'], text=texto)
         else:
-            log_container = st.expander("Ver Log de Atividade", expanded=True)
-            with log_container:
-                # Criamos um container para o log para poder limpar depois se necessário
-                log_area = st.empty()
-            
-            with st.spinner("Autenticando e iniciando a raspagem... Por favor, aguarde."):
-                log_area.text("Iniciando autenticação...")
-                session = autenticar_jornadadedados(email, senha)
-                
-                if not session:
-                    st.error("Falha na autenticação! Verifique suas credenciais.")
-                else:
-                    st.success("Autenticação bem-sucedida!")
-                    df_raspado = run_full_scraper(session, log_area)
-                    
-                    if df_raspado is not None and not df_raspado.empty:
-                        dbm.save_df_to_db(df_raspado, 'cursos')
-                        st.success("Scraping finalizado! Dados salvos na tabela 'cursos' do banco de dados.")
-                        st.dataframe(df_raspado.head())
-                        st.session_state.scraping_done = True
-                        st.rerun()
-                    else:
-                        st.error("A raspagem não retornou nenhum dado. Verifique o log de atividade.")
+            st.progress(0, text=f"{nome}: {'na fila' if job['status'] == 'na_fila' else 'preparando'}... ({formatar_duracao(decorrido)})")
+        st.button(
+            "⏹️ Cancelar", key=f"cancelar_{tipo}", disabled=bool(job['cancelar']),
+            on_click=dbm.request_job_cancel, args=(job['id'],)
+        )
+    elif job['status'] == 'concluido':
+        mostrar_resultado(job)
+    elif job['status'] == 'cancelado':
+        st.warning(f"{nome} cancelada.")
+    else:
+        st.error(f"{nome} falhou: {job['erro']}")
+    eventos = dbm.get_job_events(job['id'])
+    if eventos:
+        with st.expander("Ver Log de Atividade", expanded=ativo):
+            st.text("\n".join(texto for _, _, texto in eventos))
+
+def acompanhar(tipo):
+    """Desenha o painel do job; se houver um ativo, como fragmento que se atualiza a cada INTERVALO_ATUALIZACAO segundos."""
+    job = dbm.latest_job(tipo, None if tipo == 'raspagem' else usuario)
+    ativo = job is not None and job['status'] in dbm.JOB_STATUS_ATIVOS
+    st.fragment(painel_do_job, run_every=INTERVALO_ATUALIZACAO if ativo else None)(tipo, ativo)
+    return ativo
+
+st.info("**Passo 1:** Faça o scraping dos dados da plataforma. Isso pode levar vários minutos.")
+meta = dbm.get_meta()
+if meta.get('ultima_raspagem'):
+    aulas_por_trilha = dbm.get_trilha_lesson_counts()
+    st.caption(
+        f"Última raspagem em {datetime.fromtimestamp(meta['ultima_raspagem']):%d/%m/%Y %H:%M}: "
+        f"{sum(aulas_por_trilha.values())} aulas em {len(aulas_por_trilha)} trilhas. O catálogo é compartilhado por "
+        "todos os aprendizes: quem já tem o conteúdo raspado só precisa sincronizar o próprio progresso."
+    )
+with st.form("scraping_form"):
+    incremental = st.checkbox(
+        "Modo incremental (baixa apenas aulas novas ou alteradas)",
+        value=st.session_state.scraping_done,
+        help="Reaproveita o conteúdo já salvo e busca os detalhes só das aulas que mudaram. Aulas removidas da plataforma são apagadas."
+    )
+    jobs_da_raspagem = dbm.scrape_jobs_summary()
+    retomar = True
+    if jobs_da_raspagem:
+        retomar = st.checkbox(
+            f"Retomar a raspagem completa interrompida ({jobs_da_raspagem.get('concluido', 0)} de {sum(jobs_da_raspagem.values())} cursos já gravados)",
+            value=True,
+            help="Os cursos já gravados não são raspados de novo. Desmarque para recomeçar do zero."
+        )
+    with st.expander("Cache das respostas da plataforma"):
+        usar_cache = st.checkbox(
+            "Guardar as respostas em cache local",
+            value=False,
+            help="As respostas ficam em 'dados/cache_http', separadas por conta. Online, só o conteúdo das aulas é "
+                 "reaproveitado, e só na raspagem completa; páginas, status e a sincronização vão sempre à plataforma."
+        )
+        offline = st.checkbox(
+            "Reprocessar offline a partir do cache",
+            help="Refaz a extração e a carga no banco só com as respostas já guardadas para a sua conta, sem acessar a plataforma."
+        )
+    with st.expander("Limite de requisições"):
+        taxa_maxima = st.number_input(
+            "Máximo de requisições por segundo (0 = sem limite)",
+            min_value=0.0, value=0.0, step=1.0,
+            help="Teto fixo de vazão para a raspagem e a sincronização, além do controle adaptativo, que já "
+                 "reduz a concorrência quando a plataforma fica lenta ou recusa requisições."
+        )
+    col_scraping, col_progresso = st.columns(2)
+    submitted = col_scraping.form_submit_button("Fazer Scraping Agora")
+    sync_submitted = col_progresso.form_submit_button(
+        "Sincronizar Apenas Progresso",
+        disabled=not st.session_state.scraping_done,
+        help="Atualiza só o status de conclusão das aulas, sem baixar o conteúdo de novo."
+    )
+
+    if submitted or sync_submitted:
+        parametros = {'usar_cache': usar_cache, 'offline': offline, 'taxa_maxima': taxa_maxima or None}
+        if submitted:
+            parametros.update(incremental=incremental, retomar=retomar)
+        disparar('raspagem' if submitted else 'sincronizacao', parametros, st.session_state.credenciais)
+
+raspagem_ativa = acompanhar('raspagem')
+acompanhar('sincronizacao')
 
 st.divider()
 
-# --- PASSO 2: JUNÇÃO DE DADOS (sem alterações) ---
+# --- PASSO 2: JUNÇÃO DE DADOS ---
 st.info("**Passo 2:** Após o scraping, gere os links no seu plano de estudos.")
 
-join_disabled = not (st.session_state.scraping_done and st.session_state.plan_uploaded)
+join_disabled = not (st.session_state.scraping_done and st.session_state.plan_uploaded) or raspagem_ativa
 
 if st.button("Gerar Links no Plano de Estudos", disabled=join_disabled):
-    with st.spinner("Iniciando a correspondência difusa..."):
-        join_log_area = st.expander("Log da Junção", expanded=True).empty()
-        
-        resultado_df = run_joiner(join_log_area)
-
-        if resultado_df is not None:
-            st.success("Processo finalizado! Seu plano com links foi salvo no banco de dados.")
-            st.dataframe(resultado_df.head(10))
-            
-            csv_para_download = resultado_df.to_csv(index=False).encode('utf-8-sig')
-            
-            st.download_button(
-                label="Baixar CSV com Links",
-                data=csv_para_download,
-                file_name="plano_de_estudos_com_links.csv",
-                mime='text/csv',
-            )
-else:
-    if not st.session_state.scraping_done:
-        st.warning("O botão 'Gerar Links' será habilitado após o scraping ser concluído.")
-    if not st.session_state.plan_uploaded:
-        st.warning("Carregue e confirme seu plano de estudos no Passo 0 para habilitar a junção.")
\ No newline at end of file
+    disparar('juncao')
+if not st.session_state.scraping_done:
+    st.warning("O botão 'Gerar Links' será habilitado após o scraping ser concluído.")
+if not st.session_state.plan_uploaded:
+    st.warning("Carregue e confirme seu plano de estudos no Passo 0 para habilitar a junção.")
+acompanhar('juncao')
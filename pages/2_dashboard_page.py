@@ -3,32 +3,73 @@
 import streamlit as st
 import pandas as pd
 from modules import database_manager as dbm
+from modules.aprendiz import exigir_aprendiz
 
 st.set_page_config(page_title="Plano de Estudos", layout="wide")
 
 st.title("📊 Dashboard do Plano de Estudos")
+usuario = exigir_aprendiz()
 
 # Inicializa o estado do filtro no session_state
 if 'mostrar_concluidos' not in st.session_state:
     st.session_state.mostrar_concluidos = False
 
-def carregar_plano():
-    df = dbm.load_table_to_df('plano_estudos')
+if 'versao_editor' not in st.session_state:
+    st.session_state.versao_editor = 0
+
+def texto_status(concluida):
+    return "✅ Concluído" if concluida else "🕒 Pendente"
+
+def carregar_plano(usuario):
+    df = dbm.load_plan(usuario)
     if not df.empty and 'aula_concluida' in df.columns:
         df['aula_concluida'] = df['aula_concluida'].fillna(False).astype(bool)
         df['Carga Horária (h)'] = pd.to_numeric(df['Carga Horária (h)'], errors='coerce').fillna(0)
-        df['Status'] = df['aula_concluida'].apply(lambda x: "✅ Concluído" if x else "🕒 Pendente")
+        df['Status'] = df['aula_concluida'].apply(texto_status)
+        # Indexado pelo id do item, para as edições serem aplicadas direto nas linhas certas
+        df.index = df['id'].values
     return df
 
-df_plano = carregar_plano()
+def plano_em_memoria(usuario):
+    """Plano guardado na sessão; só é recarregado do banco quando outra escrita (junção, sincronização...) o altera."""
+    geracao = (usuario, dbm.data_generation('plano_estudos'))
+    if st.session_state.get('plano_geracao') != geracao or 'plano' not in st.session_state:
+        st.session_state.plano = carregar_plano(usuario)
+        st.session_state.plano_geracao = geracao
+    return st.session_state.plano
+
+def aplicar_edicoes(chave_editor, ids_exibidos, usuario):
+    """
+    Grava de uma vez as caixas marcadas/desmarcadas no editor e corrige o plano em memória, sem recarregá-lo.
+    Se a gravação falhar, o editor fica como está (com as marcações do usuário) para ele tentar de novo.
+    """
+    edicoes = st.session_state[chave_editor]['edited_rows']
+    mudancas = {
+        ids_exibidos[int(posicao)]: bool(valores['aula_concluida'])
+        for posicao, valores in edicoes.items() if 'aula_concluida' in valores
+    }
+    if mudancas:
+        if dbm.update_status_many(list(mudancas), list(mudancas.values()), usuario) is None:
+            st.error("Não foi possível salvar o status das aulas. As marcações continuam no editor; tente de novo.")
+            return
+        plano = st.session_state.plano
+        for item_id, concluida in mudancas.items():
+            plano.at[item_id, 'aula_concluida'] = concluida
+            plano.at[item_id, 'Status'] = texto_status(concluida)
+        st.session_state.plano_geracao = (usuario, dbm.data_generation('plano_estudos'))
+    # Uma nova chave descarta o estado de edição do widget, que passa a refletir o plano corrigido
+    st.session_state.versao_editor += 1
+
+# As métricas vêm agregadas do banco; o plano completo só é carregado para a tabela de edição
+resumo = dbm.get_progress_summary(usuario=usuario)
 
-if df_plano.empty:
+if resumo['total_aulas'] == 0:
     st.warning("Ainda não há um plano de estudos no banco de dados.")
     st.info("Por favor, vá para a página 'Scraper e Junção' e carregue seu arquivo .csv.")
 else:
     # --- MUDANÇA AQUI: Adiciona o novo filtro de Trilha na barra lateral ---
     st.sidebar.header("🔎 Filtros do Dashboard")
-    trilhas_disponiveis = sorted(df_plano['Trilha'].dropna().unique().tolist())
+    trilhas_disponiveis = [t['Trilha'] for t in resumo['trilhas']]
     select_all = st.sidebar.checkbox("Selecionar Todas as Trilhas", value=True, key="select_all_trilhas_dash")
     
     default_selection = trilhas_disponiveis if select_all else []
@@ -39,13 +80,13 @@ else:
         key="multiselect_trilhas_dash"
     )
 
-    # --- Métricas e Progresso (sem alterações) ---
+    # --- Métricas e Progresso ---
     st.markdown("### Métricas Gerais")
-    total_aulas = len(df_plano)
-    aulas_concluidas = int(df_plano['aula_concluida'].sum())
-    aulas_pendentes = total_aulas - aulas_concluidas
-    progresso_percentual = (aulas_concluidas / total_aulas) * 100 if total_aulas > 0 else 0
-    horas_restantes = df_plano[~df_plano['aula_concluida']]['Carga Horária (h)'].sum()
+    total_aulas = resumo['total_aulas']
+    aulas_concluidas = resumo['aulas_concluidas']
+    aulas_pendentes = resumo['aulas_pendentes']
+    progresso_percentual = resumo['progresso_percentual']
+    horas_restantes = resumo['horas_restantes']
     col1, col2, col3 = st.columns(3)
     col1.metric("Aulas Concluídas", f"{aulas_concluidas}", f"de {total_aulas} aulas")
     col2.metric("Aulas Pendentes", f"{aulas_pendentes}")
@@ -55,10 +96,7 @@ else:
     st.divider()
     st.markdown("### Progresso por Trilha")
     # Filtra o progresso para mostrar apenas as trilhas selecionadas
-    progresso_trilha_filtrado = df_plano[df_plano['Trilha'].isin(trilhas_selecionadas)]
-    progresso_trilha = progresso_trilha_filtrado.groupby('Trilha').agg(total_aulas=('Módulo', 'count'), aulas_concluidas=('aula_concluida', 'sum')).reset_index()
-    progresso_trilha['progresso_%'] = progresso_trilha.apply(lambda row: (row['aulas_concluidas'] / row['total_aulas'] * 100) if row['total_aulas'] > 0 else 0, axis=1).round(1)
-    for index, row in progresso_trilha.iterrows():
+    for row in dbm.get_progress_summary(trilhas_selecionadas, usuario)['trilhas']:
         st.markdown(f"**{row['Trilha']}**")
         st.progress(row['progresso_%'] / 100, text=f"{row['progresso_%']}% concluído ({int(row['aulas_concluidas'])} de {int(row['total_aulas'])} aulas)")
     st.divider()
@@ -67,7 +105,7 @@ else:
     st.toggle("Mostrar aulas concluídas", key="mostrar_concluidos")
 
     # --- MUDANÇA AQUI: A lógica de filtro agora inclui as trilhas selecionadas ---
-    df_para_exibir = df_plano.copy()
+    df_para_exibir = plano_em_memoria(usuario)
 
     # 1. Filtro de trilhas selecionadas na barra lateral
     if trilhas_selecionadas:
@@ -80,10 +118,8 @@ else:
     if not st.session_state.mostrar_concluidos:
         df_para_exibir = df_para_exibir[df_para_exibir['aula_concluida'] == False]
     
-    if 'plano_original' not in st.session_state:
-        st.session_state.plano_original = df_plano.copy()
-
-    df_editado = st.data_editor(
+    chave_editor = f"editor_plano_{st.session_state.versao_editor}"
+    st.data_editor(
         df_para_exibir,
         column_config={
             "id": None, "Status": st.column_config.TextColumn("Status", width="medium"),
@@ -101,19 +137,7 @@ else:
         ],
         hide_index=True,
         use_container_width=True,
-        key="editor_plano"
-    )
-
-    # Lógica de detecção de mudanças (sem alterações)
-    df_original_exibido = st.session_state.plano_original.loc[df_editado.index]
-    if not df_original_exibido.equals(df_editado):
-        mudancas = df_original_exibido['aula_concluida'] != df_editado['aula_concluida']
-        linhas_alteradas = df_editado[mudancas]
-        
-        for index, row in linhas_alteradas.iterrows():
-            item_id = row['id']
-            novo_status = row['aula_concluida']
-            dbm.update_aula_status(item_id, novo_status)
-
-        st.session_state.plano_original = carregar_plano().copy()
-        st.rerun()
\ No newline at end of file
+        key=chave_editor,
+        on_change=aplicar_edicoes,
+        args=(chave_editor, df_para_exibir.index.tolist(), usuario)
+    )
\ No newline at end of file
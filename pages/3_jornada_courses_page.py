@@ -3,28 +3,44 @@
 import streamlit as st
 import pandas as pd
 from modules import database_manager as dbm
+from modules.aprendiz import aprendiz_atual
 
 st.set_page_config(page_title="Cursos da Jornada", layout="wide")
     
 st.title("📚 Explorador de Cursos da Jornada")
 st.markdown("Pesquise por todo o conteúdo que foi extraído da plataforma.")
+usuario = aprendiz_atual()
 
 if 'texto_busca' not in st.session_state:
     st.session_state.texto_busca = ""
 
-@st.cache_data
-def load_data():
-    """Carrega os dados completos dos cursos do DB, usando cache para performance."""
-    df = dbm.load_table_to_df('cursos')
-    for col in ['aula_sumario', 'aula_conteudo_html', 'curso_nome', 'modulo_nome', 'aula_nome']:
-        if col not in df.columns:
-            df[col] = ''
-        df[col] = df[col].fillna('')
-    return df
+TAMANHOS_DE_PAGINA = [25, 50, 100, 200]
 
-df_cursos_todos = load_data()
+if 'explorer_chaves' not in st.session_state:
+    # Chave de início de cada página já alcançada ({pagina: chave}), para os filtros de 'explorer_filtros'.
+    # As páginas são percorridas por chave (ver `dbm.list_lessons_page`): só se avança para a seguinte à vista,
+    # cuja chave é a última linha da página atual, ou se volta para uma já vista.
+    st.session_state.explorer_chaves = {0: None}
+    st.session_state.explorer_filtros = None
 
-if df_cursos_todos.empty:
+def mudar_pagina(passo):
+    st.session_state.explorer_pagina += passo
+
+# O sumário e o conteúdo só são buscados (`dbm.get_lesson_body`) quando a janela da aula é aberta
+@st.dialog("Sumário da Aula", width="large")
+def mostrar_sumario(aula_id, aula_nome):
+    corpo = dbm.get_lesson_body(aula_id)
+    st.subheader(aula_nome)
+    st.text(corpo[0] if corpo else '')
+
+@st.dialog("Conteúdo Completo", width="large")
+def mostrar_conteudo(aula_id, aula_nome):
+    corpo = dbm.get_lesson_body(aula_id)
+    st.subheader(aula_nome)
+    # O HTML da aula vem como a plataforma o publica; st.html o sanitiza antes de exibir
+    st.html(corpo[1] if corpo and corpo[1] else '')
+
+if not dbm.table_exists_and_has_data('cursos'):
     st.warning("Os dados dos cursos ainda não foram extraídos.")
     st.info("Por favor, vá para a página 'Scraper e Junção' e execute o passo de scraping primeiro.")
 else:
@@ -37,7 +53,7 @@ else:
     
     # --- FILTROS NA BARRA LATERAL ---
     st.sidebar.header("🔎 Filtros")
-    trilhas_disponiveis = sorted(df_cursos_todos['trilha_nome'].dropna().unique().tolist())
+    trilhas_disponiveis = sorted(t for t in dbm.get_trilha_lesson_counts() if t is not None)
     select_all = st.sidebar.checkbox("Selecionar Todas as Trilhas", value=True, key="select_all_trilhas")
     
     default_selection = trilhas_disponiveis if select_all else []
@@ -46,36 +62,64 @@ else:
         options=trilhas_disponiveis,
         default=default_selection
     )
+    tamanho_pagina = st.sidebar.selectbox(
+        "Aulas por página:", TAMANHOS_DE_PAGINA, index=TAMANHOS_DE_PAGINA.index(dbm.TAMANHO_PAGINA_PADRAO)
+    )
 
     st.divider()
 
     # --- LÓGICA DE BUSCA E FILTRO ---
-    df_para_exibir = pd.DataFrame()
+    # Só a página atual sai do banco; filtros e busca são aplicados na consulta
+    busca = st.session_state.texto_busca
+    filtros = (tuple(trilhas_selecionadas), busca, tamanho_pagina, dbm.data_generation('cursos'))
+    if st.session_state.explorer_filtros != filtros:
+        st.session_state.explorer_filtros = filtros
+        st.session_state.explorer_chaves = {0: None}
+        st.session_state.explorer_pagina = 0
 
-    if st.session_state.texto_busca:
-        df_resultados_busca = dbm.search_courses(st.session_state.texto_busca)
-        
-        if not df_resultados_busca.empty:
-            df_para_exibir = df_resultados_busca[df_resultados_busca['trilha_nome'].isin(trilhas_selecionadas)].copy()
+    contagem = dbm.count_lessons(trilhas_selecionadas, busca)
+    total_paginas = max(1, -(-contagem['total'] // tamanho_pagina))
+    # Só páginas cuja chave já é conhecida
+    pagina = min(st.session_state.get('explorer_pagina', 0), total_paginas - 1, max(st.session_state.explorer_chaves))
+    st.session_state.explorer_pagina = pagina
+    chave = st.session_state.explorer_chaves[pagina]
+
+    # --- EXIBIÇÃO DOS DADOS ---
+    col_info, col_anterior, col_proxima = st.columns((4, 1, 1))
+    col_info.markdown(f"**Exibindo {contagem['total']} aulas encontradas:**")
+    col_anterior.button("◀ Anterior", disabled=pagina == 0, on_click=mudar_pagina, args=(-1,))
 
+    if busca:
+        # Busca: os melhores resultados da página, com trechos destacados (e repetidos vêm do cache do dbm)
+        df_para_exibir = dbm.search_courses(busca, trilhas_selecionadas, tamanho_pagina, chave)
+        if df_para_exibir.empty and dbm.USAR_INDICE_TRIGRAMAS:
+            # Nenhuma palavra começa com o termo: procura o trecho no meio dos nomes
+            df_para_exibir = dbm.search_substring(busca, trilhas_selecionadas, tamanho_pagina)
             if not df_para_exibir.empty:
-                min_rank = df_para_exibir['rank'].min()
-                max_rank = df_para_exibir['rank'].max()
-                
-                if max_rank == min_rank:
-                    df_para_exibir['score'] = 100
-                else:
-                    df_para_exibir['score'] = ((df_para_exibir['rank'] - max_rank) / (min_rank - max_rank) * 100).astype(int)
+                st.info(f"Nenhuma palavra começa com \"{busca}\"; exibindo as aulas cujo nome contém esse trecho.")
     else:
-        df_para_exibir = df_cursos_todos[df_cursos_todos['trilha_nome'].isin(trilhas_selecionadas)]
-
-    # --- EXIBIÇÃO DOS DADOS ---
-    st.markdown(f"**Exibindo {len(df_para_exibir)} aulas encontradas:**")
+        df_para_exibir = dbm.list_lessons_page(trilhas_selecionadas, None, chave, tamanho_pagina)
+    if not df_para_exibir.empty:
+        ultima = df_para_exibir.iloc[-1]
+        if not busca:
+            st.session_state.explorer_chaves[pagina + 1] = int(ultima['aula_id'])
+        elif pd.notna(ultima['rank']):
+            st.session_state.explorer_chaves[pagina + 1] = (float(ultima['rank']), int(ultima['aula_id']))
+        if busca and contagem['total']:
+            min_rank, max_rank = contagem['rank_min'], contagem['rank_max']
+            if max_rank == min_rank:
+                df_para_exibir['score'] = 100
+            else:
+                df_para_exibir['score'] = ((df_para_exibir['rank'] - max_rank) / (min_rank - max_rank) * 100).astype(int)
+    col_proxima.button(
+        "Próxima ▶", disabled=pagina + 1 >= total_paginas or pagina + 1 not in st.session_state.explorer_chaves,
+        on_click=mudar_pagina, args=(1,)
+    )
     
     # <--- MUDANÇA AQUI: Ajustamos a largura das colunas e adicionamos a "Trilha"
     col_header_spec = (1, 3, 3, 3, 4, 1, 2) 
     headers = ["Feita", "Trilha", "Curso", "Módulo", "Aula", "Link", "Detalhes"]
-    if st.session_state.texto_busca:
+    if busca:
         col_header_spec += (1.5,)
         headers.append("Relevância")
 
@@ -84,30 +128,36 @@ else:
         col.markdown(f"**{header}**")
     st.divider()
 
+    # A listagem é a mesma para todos; o progresso do aprendiz vem à parte, só para as aulas da página
+    progresso = dbm.get_lesson_progress(df_para_exibir['aula_id'].tolist(), usuario)
+
     for index, row in df_para_exibir.iterrows():
         cols = st.columns(col_header_spec)
         
         # <--- MUDANÇA AQUI: Adicionamos a exibição da Trilha e reordenamos os índices
-        cols[0].checkbox("", value=row.get('aula_concluida', False), key=f"check_{row.get('aula_id', index)}", label_visibility="collapsed")
-        cols[1].markdown(row['trilha_nome'])
-        cols[2].markdown(row['curso_nome'])
-        cols[3].markdown(row['modulo_nome'])
-        cols[4].markdown(row['aula_nome'])
+        cols[0].checkbox("", value=progresso.get(row['aula_id'], False), key=f"check_{usuario}_{row.get('aula_id', index)}", label_visibility="collapsed")
+        cols[1].markdown(row['trilha_nome'] or '')
+        cols[2].markdown(row['curso_nome'] or '')
+        cols[3].markdown(row['modulo_nome'] or '')
+        if busca:
+            cols[4].markdown(row['aula_nome_destacado'] or '')
+            if row['trecho']:
+                cols[4].caption(row['trecho'])
+        else:
+            cols[4].markdown(row['aula_nome'] or '')
         if pd.notna(row['aula_link']):
             cols[5].link_button("▶️", row['aula_link'], help="Abrir a aula na plataforma")
         with cols[6]:
             sub_col1, sub_col2 = st.columns(2)
-            if pd.notna(row['aula_sumario']) and row['aula_sumario'].strip():
-                with sub_col1.popover("📝", help="Ver o sumário da aula"):
-                    st.subheader("Sumário da Aula")
-                    st.text(row['aula_sumario'])
-            if pd.notna(row['aula_conteudo_html']) and row['aula_conteudo_html'].strip():
-                with sub_col2.popover("📖", help="Ver o conteúdo da aula"):
-                    st.subheader("Conteúdo Completo")
-                    st.markdown(row['aula_conteudo_html'])
+            if row['tem_sumario'] and sub_col1.button("📝", key=f"sumario_{row['aula_id']}", help="Ver o sumário da aula"):
+                mostrar_sumario(row['aula_id'], row['aula_nome'] or '')
+            if row['tem_conteudo_html'] and sub_col2.button("📖", key=f"conteudo_{row['aula_id']}", help="Ver o conteúdo da aula"):
+                mostrar_conteudo(row['aula_id'], row['aula_nome'] or '')
         
         # O índice da relevância muda para 7 por causa da nova coluna
-        if st.session_state.texto_busca and 'score' in row and pd.notna(row['score']):
+        if busca and 'score' in row and pd.notna(row['score']):
             rank_bruto = f"{row['rank']:.2f}"
             cols[7].progress(int(row['score']), text=f"{int(row['score'])}%")
-            cols[7].caption(f"Rank: {rank_bruto}", help="Pontuação de relevância do FTS5. Quanto menor o número, mais relevante.")
\ No newline at end of file
+            cols[7].caption(f"Rank: {rank_bruto}", help="Pontuação de relevância do FTS5 (bm25, com mais peso para o nome da aula). Quanto menor o número, mais relevante.")
+
+    st.caption(f"Página {pagina + 1} de {total_paginas}")
@@ -0,0 +1,22 @@
+# tests/conftest.py
+
+import os
+import sys
+import pytest
+
+# O projeto não é um pacote instalável: os testes importam `modules` a partir da raiz do repositório
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modules import database_manager as dbm
+from modules.db_connection import fechar_conexoes
+
+@pytest.fixture
+def banco(tmp_path, monkeypatch):
+    """Banco novo e vazio para cada teste, com as tabelas criadas."""
+    fechar_conexoes()
+    monkeypatch.setattr(dbm, 'DB_PATH', str(tmp_path / 'jornada_data.db'))
+    dbm.refresh_generations()
+    dbm.init_db()
+    yield dbm
+    fechar_conexoes()
+    dbm.refresh_generations()
@@ -0,0 +1,126 @@
+# tests/test_data_joiner.py
+
+import random
+import pandas as pd
+import pytest
+from rapidfuzz import fuzz as rf_fuzz
+from modules import data_joiner as dj
+
+PALAVRAS = [
+    'python', 'sql', 'dados', 'engenharia', 'analise', 'estatistica', 'modelagem', 'pipeline', 'spark', 'airflow',
+    'cloud', 'docker', 'git', 'pandas', 'streamlit', 'dashboard', 'introducao', 'avancado', 'projeto', 'carreira',
+    'regressao', 'classificacao', 'visualizacao', 'api', 'testes', 'deploy', 'etl', 'warehouse', 'lakehouse', 'dbt',
+]
+
+def _nome(aleatorio, minimo=1, maximo=4):
+    return ' '.join(aleatorio.sample(PALAVRAS, aleatorio.randint(minimo, maximo))).title()
+
+def _com_ruido(aleatorio, texto):
+    """Troca, apaga ou duplica alguns caracteres, como nos nomes digitados à mão no plano."""
+    letras = list(texto)
+    for _ in range(aleatorio.randint(0, 3)):
+        if not letras:
+            break
+        posicao = aleatorio.randrange(len(letras))
+        operacao = aleatorio.choice(('trocar', 'apagar', 'duplicar'))
+        if operacao == 'trocar':
+            letras[posicao] = aleatorio.choice('abcdefghijklmnopqrstuvwxyz ')
+        elif operacao == 'apagar':
+            del letras[posicao]
+        else:
+            letras.insert(posicao, letras[posicao])
+    return ''.join(letras)
+
+@pytest.fixture(scope='module')
+def catalogo_e_plano():
+    aleatorio = random.Random(7)
+    linhas = []
+    for t in range(6):
+        trilha = f'Trilha {_nome(aleatorio, 1, 2)}'
+        for c in range(8):
+            curso = _nome(aleatorio)
+            for m in range(3):
+                linhas.append({
+                    'trilha_nome': trilha, 'curso_nome': curso, 'modulo_nome': _nome(aleatorio),
+                    'aula_link': f'https://exemplo/{t}/{c}/{m}', 'aula_concluida': aleatorio.random() < 0.3,
+                })
+    df_scraper = pd.DataFrame(linhas)
+    plano = []
+    for _ in range(300):
+        linha = linhas[aleatorio.randrange(len(linhas))]
+        modulo = aleatorio.choice([linha['modulo_nome'], linha['curso_nome'], _nome(aleatorio)])
+        plano.append({'Trilha': _com_ruido(aleatorio, linha['trilha_nome']), 'Módulo': _com_ruido(aleatorio, modulo)})
+    return df_scraper, pd.DataFrame(plano)
+
+def test_bloqueio_nao_perde_opcoes(catalogo_e_plano):
+    contagem = dj.conferir_bloqueio(*catalogo_e_plano)
+    assert contagem['consultas'] > 0
+    assert contagem['perdidas'] == 0
+    # O bloqueio só vale a pena se de fato descartar opções
+    assert contagem['avaliadas'] < contagem['opcoes']
+
+@pytest.mark.parametrize('nota_minima', [dj.NOTA_MINIMA_TRILHA, dj.NOTA_MINIMA_OPCAO, 50.0])
+def test_escolha_bloqueada_igual_a_completa(catalogo_e_plano, nota_minima):
+    df_scraper, df_plano = catalogo_e_plano
+    opcoes = [dj._processar_opcao(dj.clean_text(nome)) for nome in df_scraper['modulo_nome'].unique()]
+    consultas = [dj._processar_consulta(dj.clean_text(nome)) for nome in df_plano['Módulo']]
+    bloqueio = dj.IndiceDeBloqueio(opcoes)
+    melhores, notas = dj._melhores_opcoes(consultas, opcoes)
+    melhores_bloqueadas, notas_bloqueadas = dj._melhores_opcoes_bloqueadas(consultas, opcoes, bloqueio, nota_minima)
+    for consulta, melhor, nota, melhor_bloqueada, nota_bloqueada in zip(
+        consultas, melhores, notas, melhores_bloqueadas, notas_bloqueadas
+    ):
+        if melhor_bloqueada is None:
+            # Nada passou da nota mínima: na avaliação completa também não
+            assert rf_fuzz.token_set_ratio(consulta, opcoes[melhor]) < nota_minima
+        else:
+            assert (melhor_bloqueada, nota_bloqueada) == (melhor, nota)
+
+def test_consulta_vazia_nao_tem_candidatas():
+    assert dj.IndiceDeBloqueio(['python sql', 'dados']).candidatas('', dj.NOTA_MINIMA_OPCAO) == []
+
+# --- Correspondência em lote x linha a linha ---
+
+def _casar_linha_a_linha(df_scraper, df_plano):
+    """Como o `run_joiner` fazia antes do índice: `encontrar_melhor_match` em cada linha do plano."""
+    scraper_trilhas = {
+        dj.clean_text(trilha): df_scraper[df_scraper['trilha_nome'] == trilha] for trilha in df_scraper['trilha_nome'].unique()
+    }
+    return [tuple(dj.encontrar_melhor_match(linha, df_scraper, scraper_trilhas)) for _, linha in df_plano.iterrows()]
+
+def _casar_em_lote(df_scraper, df_plano):
+    return dj.IndiceDeCorrespondencia(df_scraper).casar(df_plano['Trilha'].tolist(), df_plano['Módulo'].tolist())
+
+def test_casar_igual_ao_linha_a_linha(catalogo_e_plano):
+    df_scraper, df_plano = catalogo_e_plano
+    esperado = _casar_linha_a_linha(df_scraper, df_plano)
+    assert _casar_em_lote(df_scraper, df_plano) == esperado
+    # O plano com ruído precisa exercitar os dois lados: linhas casadas e linhas sem correspondência
+    assert any(link is not None for link, _ in esperado) and any(link is None for link, _ in esperado)
+
+def _aula(trilha, curso, modulo, link, concluida=False):
+    return {'trilha_nome': trilha, 'curso_nome': curso, 'modulo_nome': modulo, 'aula_link': link, 'aula_concluida': concluida}
+
+# Uma palavra só de cada lado e nenhuma em comum: o token_set_ratio é 200 * LCS / (l1 + l2), o que permite montar
+# notas exatas nas bordas dos limites (79,5 arredonda para 80; 65,5 para 66)
+CATALOGO_DE_BORDAS = pd.DataFrame([
+    _aula('X' * 200, 'Qqqq', 'Z' * 200, 'https://exemplo/z', True),
+    _aula('Python', 'Pandas', 'Numpy', 'https://exemplo/curso-pandas'),
+    _aula('Python', 'Pandas Basico', 'Pandas', 'https://exemplo/modulo-pandas'),
+    _aula('Python', 'Dados', 'Sql Joins', 'https://exemplo/sql-joins'),
+    _aula('Python', 'Dados', 'Sql Window', 'https://exemplo/sql-window'),
+])
+
+@pytest.mark.parametrize('trilha, modulo, link', [
+    ('x' * 159 + 'y' * 41, 'Z' * 200, 'https://exemplo/z'),                   # trilha com 79,5: casa
+    ('x' * 158 + 'y' * 42, 'Z' * 200, None),                                  # trilha com 79,0: não casa
+    ('X' * 200, 'z' * 131 + 'w' * 69, 'https://exemplo/z'),                   # módulo com 65,5: casa
+    ('X' * 200, 'z' * 130 + 'w' * 70, None),                                  # módulo com 65,0: não casa
+    ('Python', 'Pandas', 'https://exemplo/modulo-pandas'),                    # módulo e curso empatados: fica o módulo
+    ('Python', 'Sql', 'https://exemplo/sql-joins'),                           # opções empatadas: fica a primeira
+])
+def test_casar_nas_bordas_e_empates(trilha, modulo, link):
+    df_plano = pd.DataFrame({'Trilha': [trilha], 'Módulo': [modulo]})
+    resultado = _casar_em_lote(CATALOGO_DE_BORDAS, df_plano)
+    assert resultado == _casar_linha_a_linha(CATALOGO_DE_BORDAS, df_plano)
+    assert resultado[0][0] == link
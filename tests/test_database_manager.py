@@ -0,0 +1,181 @@
+# tests/test_database_manager.py
+
+import io
+import pandas as pd
+from modules.database_manager import normalize_user, USUARIO_PADRAO, _consulta_fts
+
+def _plano(linhas):
+    return pd.DataFrame(linhas, columns=['Trilha', 'Módulo', 'Carga Horária (h)', 'Dias Necessários', 'Objetivo'])
+
+PLANO = _plano([
+    ('Python', 'Introdução', 2, '1', 'Base'),
+    ('Python', 'Funções', 3, '2', 'Base'),
+    ('SQL', 'Joins', 1.5, '1', 'Consultas'),
+    ('SQL', 'Joins', 1.5, '1', 'Consultas'),     # itens repetidos são itens distintos
+    ('SQL', None, 4, '3', 'Projeto'),
+])
+
+# --- Carga do plano (merge_plan) ---
+
+def test_merge_plan_insere_tudo_na_primeira_carga(banco):
+    assert banco.merge_plan(PLANO) == {'inseridas': 5, 'atualizadas': 0, 'removidas': 0, 'inalteradas': 0}
+    plano = banco.load_plan()
+    assert len(plano) == 5
+    assert not plano['aula_concluida'].astype(bool).any()
+
+def test_merge_plan_aceita_csv_e_ignora_colunas_extras(banco):
+    csv = PLANO.assign(Extra=1).to_csv(index=False).encode('utf-8')
+    assert banco.merge_plan(io.BytesIO(csv), tamanho_lote=2)['inseridas'] == 5
+    assert list(banco.load_plan()['Trilha']) == list(PLANO['Trilha'])
+
+def test_merge_plan_repetido_nao_muda_nada(banco):
+    banco.merge_plan(PLANO)
+    ids = banco.load_plan()['id'].tolist()
+    assert banco.merge_plan(PLANO) == {'inseridas': 0, 'atualizadas': 0, 'removidas': 0, 'inalteradas': 5}
+    assert banco.load_plan()['id'].tolist() == ids
+
+def test_merge_plan_mantem_id_link_e_progresso(banco):
+    banco.merge_plan(PLANO)
+    plano = banco.load_plan()
+    ids = plano['id'].tolist()
+    banco.update_plan_links([(ids[1], 'https://exemplo/funcoes', True)])
+
+    novo = PLANO.drop(index=[0]).copy()                     # sai 'Introdução'
+    novo.loc[1, 'Objetivo'] = 'Base revisada'               # 'Funções' muda só o objetivo
+    novo = pd.concat([novo, _plano([('Dados', 'Pandas', 2, '1', 'Novo')])], ignore_index=True)
+    assert banco.merge_plan(novo) == {'inseridas': 1, 'atualizadas': 1, 'removidas': 1, 'inalteradas': 3}
+
+    plano = banco.load_plan().set_index('id')
+    assert ids[0] not in plano.index
+    funcoes = plano.loc[ids[1]]
+    assert (funcoes['Objetivo'], funcoes['aula_link'], bool(funcoes['aula_concluida'])) == (
+        'Base revisada', 'https://exemplo/funcoes', True
+    )
+    assert banco.get_progress_summary()['total_aulas'] == 5
+
+def test_merge_plan_sem_colunas_obrigatorias_falha_sem_alterar(banco):
+    banco.merge_plan(PLANO)
+    assert banco.merge_plan(pd.DataFrame({'Trilha': ['x']})) is None
+    assert len(banco.load_plan()) == 5
+
+def test_resumo_do_plano_acompanha_as_escritas(banco):
+    banco.merge_plan(PLANO)
+    ids = banco.load_plan()['id'].tolist()
+    banco.update_status_many(ids[:2], [True, True])
+    resumo = banco.get_progress_summary()
+    with banco._transacao() as cursor:
+        banco._reconstruir_plano_resumo(cursor)
+    assert banco.get_progress_summary() == resumo
+    assert resumo['aulas_concluidas'] == 2
+
+# --- Vários aprendizes ---
+
+ANA, BIA = 'ana@exemplo.com', 'bia@exemplo.com'
+
+def _catalogo(banco):
+    linhas = [
+        {'trilha_nome': 'Python', 'curso_nome': 'Python', 'curso_link': 'https://exemplo/python', 'modulo_id': 1,
+         'modulo_nome': modulo, 'aula_id': aula_id, 'aula_nome': f'Aula {aula_id}', 'aula_link': f'https://exemplo/aula/{aula_id}',
+         'aula_concluida': False, 'aula_conteudo_html': '<p>texto</p>'}
+        for aula_id, modulo in ((1, 'Introdução'), (2, 'Funções'))
+    ]
+    assert banco.save_df_to_db(pd.DataFrame(linhas), 'cursos')
+
+def test_normalize_user():
+    assert normalize_user('  Ana@Exemplo.COM ') == ANA
+    assert normalize_user(None) == normalize_user('') == USUARIO_PADRAO
+
+def test_planos_e_progresso_separados_por_aprendiz(banco):
+    _catalogo(banco)
+    banco.merge_plan(PLANO, ANA)
+    banco.merge_plan(PLANO.head(2), BIA)
+    assert (len(banco.load_plan(ANA)), len(banco.load_plan(BIA)), len(banco.load_plan())) == (5, 2, 0)
+
+    banco.update_lesson_progress_many([{'id': 1, 'concluida': True}, {'id': 2, 'concluida': False}], ANA)
+    banco.update_lesson_progress_many([{'id': 2, 'concluida': True}], BIA)
+    assert banco.get_lesson_progress([1, 2], ANA) == {1: True, 2: False}
+    assert banco.get_lesson_progress([1, 2], BIA) == {2: True}
+    assert banco.load_progress_by_link(BIA) == {'https://exemplo/aula/2': True}
+
+    # Um aprendiz não altera itens do plano de outro, mesmo sabendo o id
+    id_da_bia = int(banco.load_plan(BIA)['id'].iloc[0])
+    banco.update_aula_status(id_da_bia, True, ANA)
+    banco.update_status_many([id_da_bia], [True], ANA)
+    assert not banco.load_plan(BIA)['aula_concluida'].astype(bool).any()
+    assert banco.get_progress_summary(usuario=BIA)['aulas_concluidas'] == 0
+
+    # Recarregar o plano de um não mexe no do outro
+    banco.merge_plan(PLANO.head(1), ANA)
+    assert (len(banco.load_plan(ANA)), len(banco.load_plan(BIA))) == (1, 2)
+    assert banco.get_progress_summary(usuario=BIA)['total_aulas'] == 2
+
+def test_progresso_chega_ao_plano_pelo_link(banco):
+    _catalogo(banco)
+    banco.merge_plan(PLANO.head(2), ANA)
+    banco.merge_plan(PLANO.head(2), BIA)
+    for usuario in (ANA, BIA):
+        ids = banco.load_plan(usuario)['id'].tolist()
+        banco.update_plan_links([(ids[0], 'https://exemplo/aula/1', False), (ids[1], 'https://exemplo/aula/2', False)], usuario)
+    banco.update_lesson_progress_many([{'id': 1, 'concluida': True}], ANA)
+    assert banco.update_plan_status_from_progress(ANA) == 1
+    assert banco.update_plan_status_from_progress(BIA) == 0
+    assert banco.get_progress_summary(usuario=ANA)['aulas_concluidas'] == 1
+    assert banco.get_progress_summary(usuario=BIA)['aulas_concluidas'] == 0
+
+def test_primeiro_aprendiz_assume_o_plano_local(banco):
+    banco.merge_plan(PLANO)
+    assert banco.claim_default_user(ANA) == 5
+    assert banco.claim_default_user(BIA) == 0
+    assert (len(banco.load_plan()), len(banco.load_plan(ANA)), len(banco.load_plan(BIA))) == (0, 5, 0)
+    assert banco.get_progress_summary(usuario=ANA)['total_aulas'] == 5
+
+# --- Busca ---
+
+def test_consulta_fts_tira_toda_a_pontuacao():
+    # Mais de 32 caracteres a remover: todos saem, não só os primeiros
+    consulta = '!!! "Regressão" (linear) -- ' + '?*:^' * 12 + ' pandas.dados; SQL+joins'
+    assert _consulta_fts(consulta) == 'regressao* linear* pandasdados* sqljoins*'
+    assert _consulta_fts('"*()-:^' * 10) is None
+
+def test_busca_com_pontuacao_nao_quebra_o_fts(banco):
+    _catalogo(banco)
+    resultado = banco.search_courses('"funções" ' + '*:(){}^' * 10)
+    assert resultado['aula_id'].tolist() == [2]
+
+# --- Raspagem incremental ---
+
+class _Log:
+    def text(self, mensagem): pass
+    def error(self, mensagem): pass
+
+def _aula(aula_id, modulo_id=1):
+    return {'id': aula_id, 'module_id': modulo_id, 'module': {'name': 'Introdução'}, 'name': f'Aula {aula_id} nova',
+            'slug': f'aula-{aula_id}', 'summary': None, 'html_content': '<p>novo</p>', 'concluida': False,
+            'fingerprint': 'f2', 'baixada_em': 1.0}
+
+def _raspagem_incremental(monkeypatch, dados_do_curso):
+    from modules import scraper
+    link = 'https://exemplo/python'
+    monkeypatch.setattr(scraper, '_listar_cursos', lambda session, log_area: [('Python', 'Python', link)])
+    monkeypatch.setattr(scraper, '_raspar_catalogo', lambda *args, **kwargs: [('Python', 'Python', link, dados_do_curso)])
+    return scraper.run_incremental_scraper(None, _Log(), {})
+
+def test_incremental_mantem_aula_listada_cujo_detalhe_falhou(banco, monkeypatch):
+    _catalogo(banco)
+    # As duas aulas continuam listadas; o detalhe da 1 (vencida ou alterada) falhou e só o da 2 chegou
+    resultado = _raspagem_incremental(monkeypatch, {
+        'aulas': [_aula(2)], 'aulas_inalteradas': [], 'modulos_com_falha': [],
+        'status': [{'id': 1, 'concluida': True}, {'id': 2, 'concluida': False}],
+    })
+    assert banco.apply_incremental_scrape(resultado) == {'gravadas': 1, 'inalteradas': 0, 'removidas': 0}
+    aulas = dict(banco._conexao().execute("SELECT aula_id, aula_nome FROM cursos ORDER BY aula_id").fetchall())
+    assert aulas == {1: 'Aula 1', 2: 'Aula 2 nova'}
+
+def test_incremental_remove_aula_que_saiu_da_lista(banco, monkeypatch):
+    _catalogo(banco)
+    resultado = _raspagem_incremental(monkeypatch, {
+        'aulas': [], 'aulas_inalteradas': [{'id': 2, 'concluida': True}], 'modulos_com_falha': [],
+        'status': [{'id': 2, 'concluida': True}],
+    })
+    assert banco.apply_incremental_scrape(resultado) == {'gravadas': 0, 'inalteradas': 1, 'removidas': 1}
+    assert banco._conexao().execute("SELECT aula_id, aula_concluida FROM cursos").fetchall() == [(2, 1)]
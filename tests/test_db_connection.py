@@ -0,0 +1,78 @@
+# tests/test_db_connection.py
+
+import threading
+import pytest
+from modules import db_connection
+from modules.db_connection import conexao, transacao, fechar_conexoes
+
+@pytest.fixture
+def caminho(tmp_path):
+    fechar_conexoes()
+    caminho = str(tmp_path / 'teste.db')
+    conexao(caminho).execute("CREATE TABLE t (valor INTEGER)")
+    yield caminho
+    fechar_conexoes()
+
+def _valores(caminho):
+    return [linha[0] for linha in conexao(caminho).execute("SELECT valor FROM t ORDER BY valor")]
+
+def test_transacao_grava_no_commit(caminho):
+    with transacao(caminho) as cursor:
+        cursor.execute("INSERT INTO t VALUES (1)")
+        assert conexao(caminho).in_transaction
+    assert not conexao(caminho).in_transaction
+    assert _valores(caminho) == [1]
+
+def test_transacao_desfeita_por_excecao(caminho):
+    with pytest.raises(RuntimeError):
+        with transacao(caminho) as cursor:
+            cursor.execute("INSERT INTO t VALUES (1)")
+            raise RuntimeError
+    assert _valores(caminho) == []
+    assert not conexao(caminho).in_transaction
+
+def test_transacao_interna_desfeita_nao_desfaz_a_externa(caminho):
+    with transacao(caminho) as cursor:
+        cursor.execute("INSERT INTO t VALUES (1)")
+        with pytest.raises(RuntimeError):
+            with transacao(caminho) as interno:
+                interno.execute("INSERT INTO t VALUES (2)")
+                raise RuntimeError
+        with transacao(caminho) as interno:
+            interno.execute("INSERT INTO t VALUES (3)")
+        # A interna não faz COMMIT: a externa continua aberta
+        assert conexao(caminho).in_transaction
+    assert _valores(caminho) == [1, 3]
+
+def test_falha_na_externa_desfaz_as_internas(caminho):
+    with pytest.raises(RuntimeError):
+        with transacao(caminho) as cursor:
+            with transacao(caminho) as interno:
+                interno.execute("INSERT INTO t VALUES (1)")
+            cursor.execute("INSERT INTO t VALUES (2)")
+            raise RuntimeError
+    assert _valores(caminho) == []
+
+def test_conexao_da_thread_volta_ao_pool(caminho):
+    usadas = []
+    def usar():
+        usadas.append(conexao(caminho))
+        assert conexao(caminho) is usadas[-1]    # a mesma enquanto a thread vive
+    for _ in range(3):
+        thread = threading.Thread(target=usar)
+        thread.start()
+        thread.join()
+    # Threads em sequência reaproveitam a mesma conexão, sem reabrir nem reaplicar os PRAGMAs
+    assert usadas[0] is usadas[1] is usadas[2]
+    assert usadas[0] in db_connection._ociosas[caminho]
+
+def test_thread_que_termina_no_meio_da_transacao_nao_deixa_lock(caminho):
+    def abandonar():
+        conexao(caminho).execute("BEGIN IMMEDIATE")
+        conexao(caminho).execute("INSERT INTO t VALUES (1)")
+    thread = threading.Thread(target=abandonar)
+    thread.start()
+    thread.join()
+    with transacao(caminho) as cursor:
+        cursor.execute("INSERT INTO t VALUES (2)")
+    assert _valores(caminho) == [2]
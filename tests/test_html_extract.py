@@ -0,0 +1,48 @@
+# tests/test_html_extract.py
+
+import json
+from html import escape
+import pytest
+from modules import html_extract
+
+def _initial_data(nome, **extra):
+    return escape(json.dumps({'fingerprint': {'name': nome}, 'serverMemo': {'dataMeta': {}}, **extra}), quote=True)
+
+DOCUMENTOS = [
+    # Página de curso: csrf-token e o componente learning-center
+    f'''<html><head><meta name="csrf-token" content="tok123"><meta name="csrf-token" content="outro"></head>
+    <body><div wire:id="a" wire:initial-data="{_initial_data('v2.portal.learning-center')}"><p>Curso</p></div></body></html>''',
+    # Lista de aulas de um módulo, com entidades, comentários, scripts e tags mal fechadas
+    '''<ul>
+      <li wire:key="lesson.10" x-data="{ finished: true }"><span>Aula&nbsp;1 &amp; introdução</span> <small>10 min</small></li>
+      <li wire:key="lesson.11" x-data="{finished:false}">Aula 2<!-- rascunho --><script>var x = "não conta";</script> fim</li>
+      <li wire:key="lesson.12">Aula &#233;3 <b>negrito <i>itálico</b> solto</li>
+      <li wire:key="module.5">Não é aula</li>
+      <li wire:key="lesson.13" x-data="{ finished: true }"><p>Aula 4<br>quebra</p><li wire:key="lesson.14">aninhada</li></li>
+    </ul>''',
+    # Item sem fechamento no fim do documento e atributos sem valor
+    '<div wire:initial-data="{}" hidden><ul><li wire:key="lesson.20" x-data>Última aula sem fechar',
+    # Documento sem nada de interesse
+    '<p>Nada aqui &copy; 2024</p>',
+]
+
+@pytest.mark.parametrize('html', DOCUMENTOS)
+def test_extrator_streaming_equivale_ao_beautifulsoup(html):
+    referencia = html_extract.EXTRATORES['beautifulsoup'].analisar(html).como_tupla()
+    assert html_extract.EXTRATORES['streaming'].analisar(html).como_tupla() == referencia
+
+def test_benchmark_nao_encontra_divergencias():
+    _, divergentes = html_extract.benchmark(DOCUMENTOS, repeticoes=1)
+    assert divergentes == []
+
+def test_aulas_com_status():
+    aulas = html_extract.aulas_com_status(html_extract.analisar(DOCUMENTOS[1]).itens_aula)
+    assert [(aula['id'], aula['concluida']) for aula in aulas] == [
+        (10, True), (11, False), (12, False), (13, True), (14, False)
+    ]
+    assert len({aula['fingerprint'] for aula in aulas}) == len(aulas)
+
+def test_analisar_pagina_curso():
+    csrf_token, dados = html_extract.analisar_pagina_curso(DOCUMENTOS[0])
+    assert csrf_token == 'tok123'
+    assert dados['fingerprint']['name'] == 'v2.portal.learning-center'
@@ -0,0 +1,85 @@
+# tests/test_http_cache.py
+
+import pytest
+import requests
+from modules.http_cache import CacheHTTP, SessaoComCache, chave_get, chave_livewire
+
+URL_LIVEWIRE = 'https://exemplo/livewire/message/v2.portal.active-lesson-component'
+
+def _payload(metodo, parametro=1, id_renderizacao='abc'):
+    return {
+        'fingerprint': {'id': id_renderizacao, 'name': 'v2.portal.active-lesson-component', 'path': 's/curso', 'locale': 'pt'},
+        'serverMemo': {'dataMeta': {'models': {'course': {'id': 7}}}},
+        'updates': [{'type': 'callMethod', 'payload': {'method': metodo, 'params': [parametro]}}],
+    }
+
+class SessaoFalsa:
+    """Conta as requisições que chegariam à plataforma; cada resposta é diferente da anterior."""
+    def __init__(self):
+        self.requisicoes = 0
+
+    def _responder(self, url, **kwargs):
+        self.requisicoes += 1
+        resposta = requests.Response()
+        resposta.status_code = 200
+        resposta._content = f'{url} #{self.requisicoes}'.encode('utf-8')
+        return resposta
+
+    get = post = _responder
+
+@pytest.fixture
+def cache(tmp_path):
+    return CacheHTTP(str(tmp_path / 'cache_http'))
+
+def test_chaves_levam_o_escopo():
+    assert chave_get('https://exemplo/s/conteudos', 'ana') != chave_get('https://exemplo/s/conteudos', 'bia')
+    assert chave_livewire(URL_LIVEWIRE, _payload('loadLesson'), 'ana') != chave_livewire(URL_LIVEWIRE, _payload('loadLesson'), 'bia')
+
+def test_chave_livewire_ignora_o_id_da_renderizacao():
+    assert chave_livewire(URL_LIVEWIRE, _payload('loadLesson', id_renderizacao='x')) == \
+        chave_livewire(URL_LIVEWIRE, _payload('loadLesson', id_renderizacao='y'))
+    assert chave_livewire(URL_LIVEWIRE, _payload('loadLesson', 1)) != chave_livewire(URL_LIVEWIRE, _payload('loadLesson', 2))
+
+def test_online_so_reaproveita_o_conteudo_das_aulas(cache):
+    sessao = SessaoComCache(SessaoFalsa(), cache, escopo='ana')
+    for _ in range(2):
+        sessao.get('https://exemplo/s/conteudos')
+        sessao.post(URL_LIVEWIRE, json=_payload('loadLessons'))
+        sessao.post(URL_LIVEWIRE, json=_payload('loadLesson'))
+    # Página e 'loadLessons' vão sempre à plataforma; o 'loadLesson' repetido vem do cache
+    assert sessao.session.requisicoes == 5
+    assert sessao.acertos == 1
+
+def test_sem_reaproveitar_tudo_vai_a_plataforma(cache):
+    SessaoComCache(SessaoFalsa(), cache, escopo='ana').post(URL_LIVEWIRE, json=_payload('loadLesson'))
+    sessao = SessaoComCache(SessaoFalsa(), cache, escopo='ana', reaproveitar=frozenset())
+    sessao.post(URL_LIVEWIRE, json=_payload('loadLesson'))
+    assert (sessao.session.requisicoes, sessao.acertos) == (1, 0)
+
+def test_cache_nao_passa_de_uma_conta_para_outra(cache):
+    SessaoComCache(SessaoFalsa(), cache, escopo='ana').post(URL_LIVEWIRE, json=_payload('loadLesson'))
+    sessao_da_bia = SessaoComCache(SessaoFalsa(), cache, escopo='bia')
+    sessao_da_bia.post(URL_LIVEWIRE, json=_payload('loadLesson'))
+    assert sessao_da_bia.session.requisicoes == 1
+
+def test_offline_repete_as_respostas_gravadas_da_conta(cache):
+    online = SessaoComCache(SessaoFalsa(), cache, escopo='ana')
+    pagina = online.get('https://exemplo/s/conteudos').content
+    modulo = online.post(URL_LIVEWIRE, json=_payload('loadLessons')).content
+
+    offline = SessaoComCache(SessaoFalsa(), cache, offline=True, escopo='ana')
+    assert offline.get('https://exemplo/s/conteudos').content == pagina
+    assert offline.post(URL_LIVEWIRE, json=_payload('loadLessons')).content == modulo
+    assert offline.session.requisicoes == 0
+    with pytest.raises(requests.exceptions.ConnectionError):
+        SessaoComCache(SessaoFalsa(), cache, offline=True, escopo='bia').get('https://exemplo/s/conteudos')
+
+def test_respostas_de_erro_nao_sao_gravadas(cache):
+    class SessaoComErro(SessaoFalsa):
+        def _responder(self, url, **kwargs):
+            resposta = super()._responder(url, **kwargs)
+            resposta.status_code = 500
+            return resposta
+        get = post = _responder
+    SessaoComCache(SessaoComErro(), cache, escopo='ana').get('https://exemplo/s/conteudos')
+    assert cache.tamanho_total() == 0